@@ -1,19 +1,23 @@
+import hmac
+import os
 from datetime import datetime, timedelta
 from typing import Optional
 
 import bcrypt
 from jose import JWTError, jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 
-from database import get_db
+from database import get_db, set_shard
 from models import User
 
 # ── Configuration ────────────────────────────────────────
 SECRET_KEY = "fittrack-ai-secret-key-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_HOURS = 24 * 7  # 7 days
+# Shared secret for operator endpoints (/api/admin); unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
 
 # ── Bearer token scheme ──────────────────────────────────
 security = HTTPBearer()
@@ -75,4 +79,16 @@ def get_current_user(
             detail="User not found",
         )
 
+    set_shard(db, user.id)
     return user
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """FastAPI dependency for operator endpoints: the X-Admin-Token header must match ADMIN_TOKEN."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin token required",
+        )
@@ -0,0 +1,303 @@
+"""Key/value cache with pluggable backends, shared across worker processes when configured.
+
+CACHE_BACKEND selects the store:
+    memory   in-process LRU (default; each worker has its own copy)
+    sqlite   a SQLite file shared by every process on the host (CACHE_SQLITE_PATH)
+    redis    any Redis-protocol server (CACHE_REDIS_URL); `scripts/fake_redis.py` is a local stand-in
+
+Every entry lives in a namespace ("goals", "google_tokens", ...) and may
+have a TTL in seconds. `clear(namespace)` drops a whole namespace.
+Values must be JSON-serializable. Hit/miss counts are kept per process
+and namespace (`stats()`). If a shared store is unreachable, reads miss
+and writes are skipped (with a warning) rather than failing the request.
+"""
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Optional
+from urllib.parse import urlparse
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "50000"))
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", "./cache.db")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://127.0.0.1:6379/0")
+
+logger = logging.getLogger(__name__)
+
+
+class CacheError(Exception):
+    """The cache server rejected a command."""
+
+
+# Failures that degrade to a cache miss instead of an error
+_BACKEND_ERRORS = (OSError, sqlite3.Error, CacheError)
+
+
+class Cache(ABC):
+    """Backend interface plus the shared hit/miss bookkeeping."""
+
+    def __init__(self):
+        self._counts: dict[str, list[int]] = {}  # namespace -> [hits, misses]
+        self._counts_lock = threading.Lock()
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """The cached value, or None when missing or expired."""
+        try:
+            raw = self._get(namespace, str(key))
+        except _BACKEND_ERRORS:
+            logger.warning("cache get failed; treating as a miss", exc_info=True)
+            raw = None
+        with self._counts_lock:
+            counts = self._counts.setdefault(namespace, [0, 0])
+            counts[0 if raw is not None else 1] += 1
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store `value`; with a TTL it expires after `ttl` seconds."""
+        if ttl is not None and ttl <= 0:
+            return
+        try:
+            self._set(namespace, str(key), json.dumps(value), ttl)
+        except _BACKEND_ERRORS:
+            logger.warning("cache set failed; skipping", exc_info=True)
+
+    def delete(self, namespace: str, key: str) -> None:
+        """Drop one entry. If the store is unreachable, other processes may serve it until its TTL."""
+        try:
+            self._delete(namespace, str(key))
+        except _BACKEND_ERRORS:
+            logger.warning("cache delete failed", exc_info=True)
+
+    def clear(self, namespace: str) -> None:
+        """Drop every entry in the namespace."""
+        try:
+            self._clear(namespace)
+        except _BACKEND_ERRORS:
+            logger.warning("cache clear failed", exc_info=True)
+
+    def stats(self) -> dict:
+        """Hits, misses and hit rate per namespace, for this process."""
+        with self._counts_lock:
+            return {
+                namespace: {"hits": hits, "misses": misses, "hit_rate": round(hits / (hits + misses), 3)}
+                for namespace, (hits, misses) in self._counts.items()
+                if hits + misses
+            }
+
+    @abstractmethod
+    def _get(self, namespace: str, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def _set(self, namespace: str, key: str, raw: str, ttl: Optional[float]) -> None:
+        ...
+
+    @abstractmethod
+    def _delete(self, namespace: str, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def _clear(self, namespace: str) -> None:
+        ...
+
+
+class LRUCache(Cache):
+    """In-process LRU bounded by `max_entries`."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        super().__init__()
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple[str, str], tuple[Optional[float], str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, namespace, key):
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None:
+                return None
+            expires_at, raw = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[(namespace, key)]
+                return None
+            self._entries.move_to_end((namespace, key))
+            return raw
+
+    def _set(self, namespace, key, raw, ttl):
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[(namespace, key)] = (expires_at, raw)
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _delete(self, namespace, key):
+        with self._lock:
+            self._entries.pop((namespace, key), None)
+
+    def _clear(self, namespace):
+        with self._lock:
+            for entry in [k for k in self._entries if k[0] == namespace]:
+                del self._entries[entry]
+
+
+class SQLiteCache(Cache):
+    """Entries in a WAL-mode SQLite file, shared by every process that opens the same path.
+
+    Expired rows are ignored on read and purged now and then on write.
+    """
+
+    _PURGE_EVERY = 1000  # writes
+
+    def __init__(self, path: str = CACHE_SQLITE_PATH):
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL,"
+            " PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _get(self, namespace, key):
+        row = self._conn().execute(
+            "SELECT value FROM cache_entries WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, key, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set(self, namespace, key, raw, ttl):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (namespace, key, raw, time.time() + ttl if ttl is not None else None),
+        )
+        self._writes += 1
+        if self._writes % self._PURGE_EVERY == 0:
+            conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (time.time(),))
+
+    def _delete(self, namespace, key):
+        self._conn().execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def _clear(self, namespace):
+        self._conn().execute("DELETE FROM cache_entries WHERE namespace = ?", (namespace,))
+
+
+class RESPCache(Cache):
+    """Redis-protocol backend with a minimal built-in client (one connection per thread).
+
+    Each namespace's keys are also tracked in a set, so `clear` can delete
+    them without scanning the keyspace.
+    """
+
+    def __init__(self, url: str = CACHE_REDIS_URL, timeout: float = 2.0):
+        super().__init__()
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.password = parsed.password
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._local.sock = sock
+        self._local.reader = sock.makefile("rb")
+        if self.password:
+            self._call("AUTH", self.password)
+        if self.db:
+            self._call("SELECT", str(self.db))
+
+    def _call(self, *args: str):
+        if getattr(self._local, "sock", None) is None:
+            self._connect()
+        payload = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg.encode("utf-8")
+            payload.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        try:
+            self._local.sock.sendall(b"".join(payload))
+            return self._read()
+        except OSError:
+            self._local.sock = None
+            raise
+
+    def _read(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError("cache server closed the connection")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise CacheError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._local.reader.read(length + 2)[:-2]
+            return data.decode("utf-8")
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self._read() for _ in range(length)]
+        raise CacheError(f"unexpected reply {line!r}")
+
+    @staticmethod
+    def _key(namespace: str, key: str) -> str:
+        return f"fittrack:{namespace}:{key}"
+
+    @staticmethod
+    def _members(namespace: str) -> str:
+        return f"fittrack:{namespace}:__keys__"
+
+    def _get(self, namespace, key):
+        return self._call("GET", self._key(namespace, key))
+
+    def _set(self, namespace, key, raw, ttl):
+        if ttl is None:
+            self._call("SET", self._key(namespace, key), raw)
+        else:
+            self._call("SET", self._key(namespace, key), raw, "PX", str(max(1, int(ttl * 1000))))
+        self._call("SADD", self._members(namespace), key)
+
+    def _delete(self, namespace, key):
+        self._call("DEL", self._key(namespace, key))
+        self._call("SREM", self._members(namespace), key)
+
+    def _clear(self, namespace):
+        keys = self._call("SMEMBERS", self._members(namespace)) or []
+        for start in range(0, len(keys), 500):
+            self._call("DEL", *(self._key(namespace, k) for k in keys[start:start + 500]))
+        self._call("DEL", self._members(namespace))
+
+
+@lru_cache(maxsize=None)
+def get_cache() -> Cache:
+    """The process-wide cache for the configured CACHE_BACKEND."""
+    if CACHE_BACKEND == "sqlite":
+        return SQLiteCache()
+    if CACHE_BACKEND == "redis":
+        return RESPCache()
+    if CACHE_BACKEND == "memory":
+        return LRUCache()
+    raise ValueError(f"Unknown CACHE_BACKEND {CACHE_BACKEND!r}; use memory, sqlite or redis.")
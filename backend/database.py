@@ -1,16 +1,266 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Optional
 
-DATABASE_URL = "sqlite:///./fitness.db"
+from fastapi import Request
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.sql.util import find_tables
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./fitness.db")
+
+
+def _default_replica_url(url: str) -> str:
+    """Locally, the "replica" is a read-only URI connection to the primary SQLite file."""
+    prefix = "sqlite:///"
+    if url.startswith(prefix) and ":memory:" not in url:
+        return f"{prefix}file:{url[len(prefix):]}?mode=ro&uri=true"
+    return url
+
+
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL", _default_replica_url(DATABASE_URL))
+
+
+def _default_shard_template(url: str) -> str:
+    """fitness.db -> fitness.shard{shard}.db next to it."""
+    root, dot, ext = url.rpartition(".")
+    if url.startswith("sqlite:///") and dot and "/" not in ext:
+        return f"{root}.shard{{shard}}.{ext}"
+    return url + ".shard{shard}"
+
+
+# Per-user tables are split across SHARD_COUNT databases by a hash of the
+# user id; users (and the other GLOBAL_TABLES) stay in DATABASE_URL. With
+# one shard, everything lives in DATABASE_URL as before.
+SHARD_COUNT = max(1, int(os.getenv("SHARD_COUNT", "1")))
+SHARD_URL_TEMPLATE = os.getenv("SHARD_URL_TEMPLATE", _default_shard_template(DATABASE_URL))
+REPLICA_SHARD_URL_TEMPLATE = os.getenv("REPLICA_SHARD_URL_TEMPLATE", "")
+GLOBAL_TABLES = frozenset({"users", "archive_state"})
+
+# After a write, the same caller keeps reading from the primary for this long
+# so a lagging replica never hides their own writes from them.
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+READ_METHODS = {"GET", "HEAD"}
+
+
+def shard_for(user_id: int, shard_count: int = SHARD_COUNT) -> int:
+    """The shard holding `user_id`'s rows. crc32 so every process agrees."""
+    return zlib.crc32(str(user_id).encode()) % shard_count
+
+
+def shard_url(shard: int, shard_count: int = SHARD_COUNT) -> str:
+    return DATABASE_URL if shard_count == 1 else SHARD_URL_TEMPLATE.format(shard=shard)
+
+
+def _replica_shard_url(shard: int) -> str:
+    if SHARD_COUNT == 1:
+        return REPLICA_DATABASE_URL
+    if REPLICA_SHARD_URL_TEMPLATE:
+        return REPLICA_SHARD_URL_TEMPLATE.format(shard=shard)
+    return _default_replica_url(shard_url(shard))
+
+
+def _create_engine(url: str):
+    return create_engine(url, connect_args={"check_same_thread": False})
+
+
+def _tables(mapper, clause) -> list:
+    if mapper is not None:
+        return [mapper.local_table]
+    if clause is not None:
+        return find_tables(clause, include_crud=True)
+    return []
+
+
+class ShardedSession(Session):
+    """Session that sends statements on per-user tables to the selected shard's engine.
+
+    Select the shard with `set_shard` (request code) or `use_shard` (jobs
+    walking every shard). Statements touching only GLOBAL_TABLES, or none,
+    go to the session's own bind.
+    """
+
+    def __init__(self, *args, shard_engines: Optional[list] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.shard_engines = shard_engines or []
+
+    @property
+    def shard(self) -> Optional[int]:
+        shard = self.info.get("shard")
+        if shard is None:
+            shard = getattr(self.info.get("request_state"), "shard", None)
+        return shard
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if len(self.shard_engines) > 1 and kw.get("bind") is None:
+            if any(table.name not in GLOBAL_TABLES for table in _tables(mapper, clause)):
+                if self.shard is None:
+                    raise RuntimeError("Per-user table used before a shard was selected (set_shard / use_shard)")
+                return self.shard_engines[self.shard]
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+engine = _create_engine(DATABASE_URL)
+replica_engine = _create_engine(REPLICA_DATABASE_URL)
+if SHARD_COUNT == 1:
+    shard_engines = [engine]
+    replica_shard_engines = [replica_engine]
+else:
+    shard_engines = [_create_engine(shard_url(n)) for n in range(SHARD_COUNT)]
+    replica_shard_engines = [_create_engine(_replica_shard_url(n)) for n in range(SHARD_COUNT)]
+SessionLocal = sessionmaker(
+    class_=ShardedSession, autocommit=False, autoflush=False, bind=engine, shard_engines=shard_engines
+)
+ReadSessionLocal = sessionmaker(
+    class_=ShardedSession, autocommit=False, autoflush=False, bind=replica_engine, shard_engines=replica_shard_engines
+)
 Base = declarative_base()
 
 
-def get_db():
+def _switch(session: Session, shard: int) -> None:
+    if session.info.get("shard") not in (None, shard):
+        # Pending changes belong to the shard they were made under, and the
+        # identity map is keyed by primary key alone, so per-user objects
+        # loaded from the old shard must not be handed out for the new one
+        session.flush()
+        for obj in list(session.identity_map.values()):
+            if type(obj).__table__.name not in GLOBAL_TABLES:
+                session.expunge(obj)
+    session.info["shard"] = shard
+
+
+def set_shard(session: Session, user_id: int) -> None:
+    """Route the session's per-user tables to `user_id`'s shard.
+
+    Request sessions share the choice through request.state, so every
+    session of the request (see get_primary_db) follows the current user.
+    """
+    shard = shard_for(user_id)
+    _switch(session, shard)
+    state = session.info.get("request_state")
+    if state is not None:
+        state.shard = shard
+
+
+def use_shard(session: Session, shard: int) -> None:
+    """Route the session's per-user tables to shard number `shard`, for jobs that walk every shard."""
+    _switch(session, shard)
+
+
+def users_by_shard(user_ids) -> dict[int, list[int]]:
+    """Group user ids by the shard holding their rows."""
+    groups: dict[int, list[int]] = {}
+    for user_id in user_ids:
+        groups.setdefault(shard_for(user_id), []).append(user_id)
+    return groups
+
+# sticky key -> monotonic time of the caller's last commit on the primary, oldest first
+_last_write: "OrderedDict[str, float]" = OrderedDict()
+_last_write_lock = threading.Lock()
+
+
+def _sticky_key(request: Request) -> Optional[str]:
+    """Identify the caller by their bearer credentials."""
+    return request.headers.get("authorization")
+
+
+def _is_sticky(key: Optional[str]) -> bool:
+    if key is None:
+        return False
+    wrote_at = _last_write.get(key)
+    if wrote_at is None:
+        return False
+    return time.monotonic() - wrote_at <= READ_YOUR_WRITES_SECONDS
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def mark_sticky(session):
+    """Start the read-your-writes window for the session's caller (also called for writes committed elsewhere)."""
+    key = session.info.get("sticky_key")
+    if key is None:
+        return
+    now = time.monotonic()
+    with _last_write_lock:
+        _last_write[key] = now
+        _last_write.move_to_end(key)
+        # Kept in write order, so every expired window is at the front
+        while now - next(iter(_last_write.values())) > READ_YOUR_WRITES_SECONDS:
+            _last_write.popitem(last=False)
+
+
+def _primary_session(request: Request):
     db = SessionLocal()
+    db.info["sticky_key"] = _sticky_key(request)
+    db.info["request_state"] = request.state
+    return db
+
+
+def get_db(request: Request):
+    """Session for the request: reads go to the replica, everything else to the primary."""
+    if request.method in READ_METHODS and not _is_sticky(_sticky_key(request)):
+        db = ReadSessionLocal()
+        db.info["request_state"] = request.state
+    else:
+        db = _primary_session(request)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_primary_db(request: Request):
+    """Primary session regardless of method, for GET handlers that also write."""
+    db = _primary_session(request)
     try:
         yield db
     finally:
         db.close()
+
+
+def global_tables() -> list:
+    """Tables that stay in the main database; the rest are per-user and sharded."""
+    return [table for table in Base.metadata.sorted_tables if table.name in GLOBAL_TABLES]
+
+
+def sharded_tables() -> list:
+    return [table for table in Base.metadata.sorted_tables if table.name not in GLOBAL_TABLES]
+
+
+def create_tables(bind, tables: list) -> None:
+    """Create any missing `tables` (and columns and indexes introduced since) in one database."""
+    Base.metadata.create_all(bind=bind, tables=tables)
+    _add_missing_columns(bind, tables)
+
+
+def init_db():
+    """Create any missing tables on the main database and every shard.
+
+    Runs at app startup or via `python -m scripts.init_db`.
+    """
+    import models  # noqa: F401  (registers the tables on Base)
+
+    if SHARD_COUNT == 1:
+        create_tables(engine, Base.metadata.sorted_tables)
+        return
+    create_tables(engine, global_tables())
+    for shard_engine in shard_engines:
+        create_tables(shard_engine, sharded_tables())
+
+
+def _add_missing_columns(bind, tables: list):
+    """create_all() never alters existing tables, so add columns and indexes introduced since."""
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    spec = CreateColumn(column).compile(dialect=bind.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {spec}"))
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
@@ -0,0 +1,12 @@
+"""Parsing of the dates clients send with their logs."""
+from datetime import date
+
+from fastapi import HTTPException
+
+
+def parse_log_date(value: str) -> date:
+    """Parse a log's "YYYY-MM-DD" date, rejecting anything else with a 400."""
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Date must be in YYYY-MM-DD format.")
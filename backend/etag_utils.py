@@ -0,0 +1,66 @@
+"""Per-user data versions and weak ETags for conditional GETs."""
+import zlib
+from datetime import datetime
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session, object_session
+
+from auth_utils import get_current_user
+from database import get_db
+from models import User, DataVersion
+
+
+def bump_data_version(user: User) -> None:
+    """Mark the user's data as changed, in the transaction of the session `user` was loaded in."""
+    bump_data_version_by_id(object_session(user), user.id)
+
+
+def bump_data_version_by_id(db: Session, user_id: int) -> None:
+    """`bump_data_version` for writes that don't go through the request's User object.
+
+    An upsert evaluated in SQL, so concurrent writes can't lose a bump.
+    """
+    stmt = insert(DataVersion).values(user_id=user_id, version=1)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[DataVersion.user_id], set_={"version": DataVersion.version + 1}
+    ))
+
+
+def data_version(db: Session, user_id: int) -> int:
+    """The user's current data version, by primary key."""
+    return db.query(DataVersion.version).filter(DataVersion.user_id == user_id).scalar() or 0
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison: W/"x" and "x" match
+    bare = etag.removeprefix("W/")
+    return "*" in candidates or any(tag.removeprefix("W/") == bare for tag in candidates)
+
+
+def conditional_get(daily: bool = False):
+    """Dependency factory: answer 304 before the handler runs when the client's ETag is current.
+
+    The tag covers the user's data version and the request path + query. Pass
+    daily=True for endpoints whose output also changes when the day rolls over.
+    """
+    def dependency(
+        request: Request,
+        response: Response,
+        current_user: User = Depends(get_current_user),
+        db: Session = Depends(get_db),
+    ):
+        resource = str(request.url.path) + "?" + str(request.url.query)
+        if daily:
+            resource += datetime.utcnow().strftime("@%Y-%m-%d")
+        # "v" marks versions from data_versions, so tags issued for the old users.data_version never match
+        version = data_version(db, current_user.id)
+        etag = f'W/"{current_user.id}.v{version}.{zlib.crc32(resource.encode()):08x}"'
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _matches(if_none_match, etag):
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+
+    return Depends(dependency)
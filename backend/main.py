@@ -1,40 +1,107 @@
-from fastapi import FastAPI
+import os
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+
+# Before any module reads its settings with os.getenv at import time
+load_dotenv()
+
+# Responses smaller than this are sent uncompressed
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from database import init_db
+    from services.weekly_stats import scheduler
+
+    # Schema creation happens at startup, not at import time
+    init_db()
+    scheduler.start()
+    yield
+    scheduler.stop()
+
+
+async def llm_busy_handler(request: Request, exc):
+    """Shed AI requests fast when the LLM governor is saturated."""
+    return ORJSONResponse(
+        status_code=429,
+        content={"detail": "The AI assistant is busy right now. Please try again shortly."},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+def create_app() -> FastAPI:
+    """Build the FastAPI application. Routers are imported here, not at module import."""
+    import profiling
+    import slow_queries
+    from json_utils import CompressionMiddleware
+    from services.openai_service import LLMBusyError
+    from routers import (
+        auth, bmi, sleep, steps, workout, water, energy, dashboard, reports, goals, series, sync, bootstrap, admin,
+        compare,
+    )
+
+    app = FastAPI(
+        title="FitTrack AI",
+        description="AI-powered fitness tracking API with personalized health insights",
+        version="1.0.0",
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse,
+    )
+
+    app.add_exception_handler(LLMBusyError, llm_busy_handler)
+    app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_BYTES)
+
+    # CORS – allow Vite dev server
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:5173", "http://127.0.0.1:5173"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Mount routers
+    app.include_router(auth.router)
+    app.include_router(bmi.router)
+    app.include_router(sleep.router)
+    app.include_router(steps.router)
+    app.include_router(workout.router)
+    app.include_router(water.router)
+    app.include_router(energy.router)
+    app.include_router(dashboard.router)
+    app.include_router(reports.router)
+    app.include_router(goals.router)
+    app.include_router(series.router)
+    app.include_router(compare.router)
+    app.include_router(sync.router)
+    app.include_router(bootstrap.router)
+    app.include_router(admin.router)
+
+    # Opt-in request profiling; adds nothing unless ADMIN_TOKEN or PROFILE_SAMPLE_RATE is set
+    profiling.install(app)
+    # Slow-query log; adds nothing unless SLOW_QUERY_MS is set
+    slow_queries.install(app)
+
+    @app.get("/")
+    def root():
+        return {"message": "FitTrack AI API is running", "docs": "/docs"}
+
+    return app
+
+
+_app = None
+
 
-from database import engine, Base
-from routers import auth, bmi, sleep, steps, workout, water, energy, dashboard, reports, goals
-
-# Create all tables
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(
-    title="FitTrack AI",
-    description="AI-powered fitness tracking API with personalized health insights",
-    version="1.0.0",
-)
-
-# CORS – allow Vite dev server
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5173", "http://127.0.0.1:5173"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Mount routers
-app.include_router(auth.router)
-app.include_router(bmi.router)
-app.include_router(sleep.router)
-app.include_router(steps.router)
-app.include_router(workout.router)
-app.include_router(water.router)
-app.include_router(energy.router)
-app.include_router(dashboard.router)
-app.include_router(reports.router)
-app.include_router(goals.router)
-
-
-@app.get("/")
-def root():
-    return {"message": "FitTrack AI API is running", "docs": "/docs"}
+def __getattr__(name):
+    # Keep `uvicorn main:app` working while building the app only on first access
+    global _app
+    if name == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,5 +1,7 @@
-from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import (
+    Column, Integer, Float, String, DateTime, ForeignKey, Text, Index, UniqueConstraint, LargeBinary, Boolean, Table,
+)
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 
 from database import Base
@@ -37,11 +39,22 @@ class SleepLog(Base):
     sleep_time = Column(String(50), nullable=False)
     wake_time = Column(String(50), nullable=False)
     duration_hours = Column(Float, nullable=False)
-    ai_analysis = Column(Text, nullable=True)
+    started_at = Column(DateTime, nullable=True)  # null only on rows logged before sessions were timestamped
+    ended_at = Column(DateTime, nullable=True)
+    day = Column(String(10), nullable=True)  # client's local date at ended_at, the day the session counts toward
+    ai_analysis = deferred(Column(Text, nullable=True))  # legacy; analyses now live in log_analyses
     created_at = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="sleep_logs")
 
+    # (user_id, ended_at, started_at) answers overlap checks, sessions being under 24h
+    __table_args__ = (
+        Index("ix_sleep_logs_user_created_at", "user_id", "created_at"),
+        Index("ix_sleep_logs_user_day", "user_id", "day"),
+        Index("ix_sleep_logs_user_ended_started", "user_id", "ended_at", "started_at"),
+        {"sqlite_autoincrement": True},
+    )
+
 
 class StepsLog(Base):
     __tablename__ = "steps_logs"
@@ -55,6 +68,8 @@ class StepsLog(Base):
 
     user = relationship("User", back_populates="steps_logs")
 
+    __table_args__ = (Index("ix_steps_logs_user_date", "user_id", "date"), {"sqlite_autoincrement": True})
+
 
 class WorkoutLog(Base):
     __tablename__ = "workout_logs"
@@ -66,11 +81,13 @@ class WorkoutLog(Base):
     intensity = Column(String(20), default="moderate")  # low, moderate, high
     calories_burnt = Column(Float, nullable=True)
     notes = Column(Text, nullable=True)
-    ai_analysis = Column(Text, nullable=True)
+    ai_analysis = deferred(Column(Text, nullable=True))  # legacy; analyses now live in log_analyses
     created_at = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="workout_logs")
 
+    __table_args__ = (Index("ix_workout_logs_user_created_at", "user_id", "created_at"), {"sqlite_autoincrement": True})
+
 
 class WaterLog(Base):
     __tablename__ = "water_logs"
@@ -83,6 +100,8 @@ class WaterLog(Base):
 
     user = relationship("User", back_populates="water_logs")
 
+    __table_args__ = (Index("ix_water_logs_user_date", "user_id", "date"), {"sqlite_autoincrement": True})
+
 
 class EnergyScore(Base):
     __tablename__ = "energy_scores"
@@ -98,6 +117,8 @@ class EnergyScore(Base):
 
     user = relationship("User", back_populates="energy_scores")
 
+    __table_args__ = ({"sqlite_autoincrement": True},)
+
 
 class WeeklyReport(Base):
     __tablename__ = "weekly_reports"
@@ -124,3 +145,140 @@ class UserGoal(Base):
     calorie_goal = Column(Integer, default=2500)
 
     user = relationship("User", back_populates="goals")
+
+
+class GoalProgress(Base):
+    """Incrementally maintained streak and rolling-window state per user and goal metric."""
+    __tablename__ = "goal_progress"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    metric = Column(String(20), nullable=False)  # steps, sleep, water, calories
+    anchor_day = Column(String(20), nullable=True)  # newest day in daily_totals
+    daily_totals = Column(Text, nullable=False, default="[]")  # JSON, index 0 = anchor_day, i = i days earlier
+    current_streak = Column(Integer, nullable=False, default=0)
+    best_streak = Column(Integer, nullable=False, default=0)
+    last_hit_day = Column(String(20), nullable=True)  # last day the goal was met
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (UniqueConstraint("user_id", "metric", name="uq_goal_progress_user_metric"),)
+
+
+class UserStats(Base):
+    """Per-user log counters, kept in step with the log tables by the routers."""
+    __tablename__ = "user_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    sleep_count = Column(Integer, nullable=False, default=0)
+    steps_count = Column(Integer, nullable=False, default=0)
+    workout_count = Column(Integer, nullable=False, default=0)
+    water_count = Column(Integer, nullable=False, default=0)
+
+
+class DataVersion(Base):
+    """Per-user write counter behind the ETags. Kept beside the user's logs so writes stay on one shard."""
+    __tablename__ = "data_versions"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class LogAnalysis(Base):
+    """AI analysis text for a sleep or workout log, zlib-compressed and kept out of the log rows."""
+    __tablename__ = "log_analyses"
+
+    id = Column(Integer, primary_key=True, index=True)
+    log_type = Column(String(20), nullable=False)  # sleep, workout
+    log_id = Column(Integer, nullable=False)
+    content = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (UniqueConstraint("log_type", "log_id", name="uq_log_analyses_log"),)
+
+
+class WeeklyStats(Base):
+    """Aggregated stats for one user and week (Mon–Sun), one typed column per figure.
+
+    Rows for ended weeks are closed by the week-close scheduler and served as-is
+    until a late log marks them dirty.
+    """
+    __tablename__ = "weekly_stats"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    week_start = Column(String(20), nullable=False)
+    week_end = Column(String(20), nullable=False)
+    sleep_total_hours = Column(Float, nullable=False, default=0)
+    sleep_avg_hours = Column(Float, nullable=False, default=0)
+    sleep_nights = Column(Integer, nullable=False, default=0)
+    steps_total = Column(Integer, nullable=False, default=0)
+    steps_calories = Column(Float, nullable=False, default=0)
+    steps_days = Column(Integer, nullable=False, default=0)
+    workout_minutes = Column(Float, nullable=False, default=0)
+    workout_calories = Column(Float, nullable=False, default=0)
+    workout_sessions = Column(Integer, nullable=False, default=0)
+    workout_types = Column(Text, nullable=False, default="{}")  # JSON, workout type -> sessions
+    water_glasses = Column(Integer, nullable=False, default=0)
+    water_days = Column(Integer, nullable=False, default=0)
+    closed = Column(Boolean, nullable=False, default=False, server_default="0")  # frozen snapshot of an ended week
+    dirty = Column(Boolean, nullable=False, default=False, server_default="0")  # a late log arrived after closing
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (UniqueConstraint("user_id", "week_start", name="uq_weekly_stats_user_week"),)
+
+
+class ChangeLog(Base):
+    """Append-only sequence of row changes per user, read by /api/sync."""
+    __tablename__ = "change_log"
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, nullable=False)
+    entity = Column(String(20), nullable=False)  # sleep, steps, workout, water, goals, energy, reports
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String(10), nullable=False)  # upsert, delete
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # AUTOINCREMENT so sequence numbers are never reused, even after old entries are pruned
+    __table_args__ = (Index("ix_change_log_user_seq", "user_id", "seq"), {"sqlite_autoincrement": True})
+
+
+class MetricSketch(Base):
+    """Quantile sketch of one metric's per-user daily totals on one day, over the users of this shard."""
+    __tablename__ = "metric_sketches"
+
+    metric = Column(String(20), primary_key=True)  # steps, sleep, workout
+    day = Column(String(20), primary_key=True)  # YYYY-MM-DD
+    buckets = Column(Text, nullable=False, default="{}")  # JSON, bucket index -> user count
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# ── Cold storage ────────────────────────────────────
+def _archive_table(model, date_column: str) -> Table:
+    """Cold copy of a log table: the same columns (ids kept), no foreign keys."""
+    source = model.__table__
+    return Table(
+        f"{source.name}_archive",
+        Base.metadata,
+        *(Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable) for c in source.columns),
+        Index(f"ix_{source.name}_archive_user_{date_column}", "user_id", date_column),
+    )
+
+
+# hot model -> archive table, filled by `python -m scripts.archive_logs`. The hot tables are
+# AUTOINCREMENT so new rows never reuse the id of one that was archived.
+ARCHIVE_TABLES = {
+    SleepLog: _archive_table(SleepLog, "day"),
+    StepsLog: _archive_table(StepsLog, "date"),
+    WorkoutLog: _archive_table(WorkoutLog, "created_at"),
+    WaterLog: _archive_table(WaterLog, "date"),
+    EnergyScore: _archive_table(EnergyScore, "date"),
+}
+
+
+class ArchiveState(Base):
+    """Per hot table: rows dated before `archived_before` may have moved to the archive table."""
+    __tablename__ = "archive_state"
+
+    table_name = Column(String(50), primary_key=True)
+    archived_before = Column(String(20), nullable=False)  # YYYY-MM-DD
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
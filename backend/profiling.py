@@ -0,0 +1,203 @@
+"""On-demand cProfile capture of single requests.
+
+A request is profiled when it carries `X-Profile-Request: <ADMIN_TOKEN>`,
+or at random with probability PROFILE_SAMPLE_RATE. Its endpoint function
+runs under cProfile on the worker thread that executes it; dependencies
+and middleware count toward the wall time only. Each profile is written
+to PROFILE_DIR as `<id>.prof` (pstats format) plus `<id>.json` with the
+route, user and timings, keeping the newest PROFILE_MAX_FILES. One request
+is profiled at a time (Python 3.12+ allows a single active profiler per
+process); requests that overlap it are served unprofiled.
+
+With neither ADMIN_TOKEN nor a sample rate configured, `install` adds
+nothing to the app, so requests pay no profiling cost at all.
+"""
+import contextvars
+import cProfile
+import functools
+import hmac
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+
+from auth_utils import ADMIN_TOKEN
+from models import User
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+
+PROFILE_HEADER = b"x-profile-request"
+PROFILE_ID = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$")
+
+
+class _Capture:
+    """What the endpoint wrapper hands back to the middleware for one request."""
+
+    def __init__(self, trigger: str):
+        self.trigger = trigger
+        self.profile: Optional[cProfile.Profile] = None
+        self.user_id: Optional[int] = None
+        self.endpoint_ms: Optional[float] = None
+
+
+_capture: contextvars.ContextVar[Optional[_Capture]] = contextvars.ContextVar("profile_capture", default=None)
+# Held while a profile is being captured
+_profiling = threading.Lock()
+
+
+def enabled() -> bool:
+    return bool(ADMIN_TOKEN) or PROFILE_SAMPLE_RATE > 0
+
+
+def _profiled(call):
+    @functools.wraps(call)
+    def wrapper(*args, **kwargs):
+        capture = _capture.get()
+        if capture is None or not _profiling.acquire(blocking=False):
+            return call(*args, **kwargs)
+        try:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:  # another profiler (not ours) is active
+                return call(*args, **kwargs)
+            capture.user_id = next((v.id for v in kwargs.values() if isinstance(v, User)), None)
+            capture.profile = profile
+            started = time.perf_counter()
+            try:
+                return call(*args, **kwargs)
+            finally:
+                profile.disable()
+                capture.endpoint_ms = (time.perf_counter() - started) * 1000
+        finally:
+            _profiling.release()
+
+    return wrapper
+
+
+class ProfilingMiddleware:
+    """Marks requests for profiling and stores their profile once the response is sent."""
+
+    def __init__(self, app, sample_rate: float = PROFILE_SAMPLE_RATE, token: str = ADMIN_TOKEN):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.token = token.encode()
+
+    def _trigger(self, scope) -> Optional[str]:
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER and hmac.compare_digest(value, self.token):
+                    return "header"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        trigger = self._trigger(scope) if scope["type"] == "http" else None
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        capture = _Capture(trigger)
+        status = None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token = _capture.set(capture)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _capture.reset(token)
+            wall_ms = (time.perf_counter() - started) * 1000
+            if capture.profile is not None:
+                route = scope.get("route")
+                save(capture, {
+                    "method": scope["method"],
+                    "route": getattr(route, "path", scope["path"]),
+                    "path": scope["path"],
+                    "query": scope["query_string"].decode("latin-1"),
+                    "status": status,
+                    "wall_ms": round(wall_ms, 2),
+                })
+
+
+def save(capture: _Capture, meta: dict) -> str:
+    """Write the profile and its metadata; returns the profile id."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    now = datetime.utcnow()
+    profile_id = f"{now:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    capture.profile.dump_stats(os.path.join(PROFILE_DIR, f"{profile_id}.prof"))
+    meta = {
+        "id": profile_id,
+        "created_at": now.isoformat(),
+        "trigger": capture.trigger,
+        "user_id": capture.user_id,
+        **meta,
+        "endpoint_ms": round(capture.endpoint_ms, 2) if capture.endpoint_ms is not None else None,
+    }
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), "w") as f:
+        json.dump(meta, f)
+    _prune()
+    return profile_id
+
+
+def _prune():
+    ids = sorted(name[:-5] for name in os.listdir(PROFILE_DIR) if name.endswith(".json"))
+    for profile_id in ids[:-PROFILE_MAX_FILES] if PROFILE_MAX_FILES > 0 else []:
+        for ext in (".json", ".prof"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, profile_id + ext))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles(limit: int) -> list[dict]:
+    """Metadata of the newest `limit` profiles, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    ids = sorted((name[:-5] for name in os.listdir(PROFILE_DIR) if name.endswith(".json")), reverse=True)
+    profiles = []
+    for profile_id in ids[:limit]:
+        try:
+            with open(os.path.join(PROFILE_DIR, f"{profile_id}.json")) as f:
+                profiles.append(json.load(f))
+        except (FileNotFoundError, ValueError):
+            continue  # pruned or half-written meanwhile
+    return profiles
+
+
+def profile_path(profile_id: str) -> Optional[str]:
+    """Path of a stored .prof file, or None for unknown or malformed ids."""
+    if not PROFILE_ID.match(profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.prof")
+    return path if os.path.isfile(path) else None
+
+
+def install(app: FastAPI) -> None:
+    """Wrap every endpoint and add the middleware, but only when profiling is configured.
+
+    Call after all routers are included.
+    """
+    if not enabled():
+        return
+    for route in app.routes:
+        if isinstance(route, APIRoute):
+            # The route handler calls dependant.call, so wrapping it there covers the endpoint
+            route.dependant.call = _profiled(route.dependant.call)
+    app.add_middleware(ProfilingMiddleware)
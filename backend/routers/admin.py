@@ -0,0 +1,54 @@
+"""Operator endpoints, guarded by the X-Admin-Token header (see auth_utils.require_admin)."""
+import io
+import pstats
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+
+import profiling
+import slow_queries
+from auth_utils import require_admin
+
+router = APIRouter(prefix="/api/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/profiles")
+def list_profiles(limit: int = Query(50, ge=1, le=500)):
+    """Stored request profiles, newest first: id, route, user, status and timings."""
+    return {"profiles": profiling.list_profiles(limit)}
+
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, format: str = Query("prof", pattern="^(prof|text)$"), top: int = Query(40, ge=1)):
+    """Download one profile as a pstats file (open with `python -m pstats` or snakeviz).
+
+    format=text returns the `top` functions by cumulative time instead.
+    """
+    path = profiling.profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "prof":
+        return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).sort_stats("cumulative").print_stats(top)
+    return PlainTextResponse(out.getvalue())
+
+
+@router.get("/slow-queries")
+def slow_queries_top(
+    top: int = Query(20, ge=1, le=500),
+    order: str = Query("total_ms", pattern="^(total_ms|max_ms|count)$"),
+):
+    """The worst statements over SLOW_QUERY_MS seen by this worker, with routes, parameter shapes and plans."""
+    return {
+        "threshold_ms": slow_queries.SLOW_QUERY_MS,
+        "enabled": slow_queries.SLOW_QUERY_MS > 0,
+        "queries": slow_queries.top(top, order),
+    }
+
+
+@router.delete("/slow-queries")
+def slow_queries_reset():
+    """Start the aggregates over (the on-disk log is kept)."""
+    slow_queries.reset()
+    return {"message": "Slow-query aggregates cleared"}
@@ -7,6 +7,7 @@ from schemas import (
     RegisterRequest, LoginRequest, GoogleAuthRequest,
     AuthResponse, UserProfileResponse,
 )
+from services.google_service import verify_token as verify_google_token
 from auth_utils import (
     hash_password, verify_password, create_access_token, get_current_user,
 )
@@ -66,34 +67,10 @@ def login(req: LoginRequest, db: Session = Depends(get_db)):
 def google_auth(req: GoogleAuthRequest, db: Session = Depends(get_db)):
     """Login or register using a Google access token or ID token."""
     try:
-        import requests as http_requests
-
-        # Try as access token first (from useGoogleLogin implicit flow)
-        userinfo_response = http_requests.get(
-            "https://www.googleapis.com/oauth2/v3/userinfo",
-            headers={"Authorization": f"Bearer {req.token}"},
-        )
-
-        if userinfo_response.status_code == 200:
-            idinfo = userinfo_response.json()
-            google_id = idinfo.get("sub", "")
-            email = idinfo.get("email", "").lower()
-            name = idinfo.get("name", email.split("@")[0])
-        else:
-            # Fallback: try as ID token
-            from google.oauth2 import id_token
-            from google.auth.transport import requests as google_requests
-            import os
-
-            client_id = os.getenv("GOOGLE_CLIENT_ID", "")
-            idinfo = id_token.verify_oauth2_token(
-                req.token, google_requests.Request(), client_id
-            )
-            google_id = idinfo["sub"]
-            email = idinfo.get("email", "").lower()
-            name = idinfo.get("name", email.split("@")[0])
+        profile = verify_google_token(req.token)
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid Google token.")
+    google_id, email, name = profile["google_id"], profile["email"], profile["name"]
 
     if not google_id or not email:
         raise HTTPException(status_code=401, detail="Could not retrieve Google profile info.")
@@ -137,11 +114,6 @@ def get_profile_stats(
     db: Session = Depends(get_db),
 ):
     """Get aggregate stats for the user's profile page."""
-    from models import SleepLog, StepsLog, WorkoutLog, WaterLog
-
-    return {
-        "sleep_count": db.query(SleepLog).filter(SleepLog.user_id == current_user.id).count(),
-        "steps_count": db.query(StepsLog).filter(StepsLog.user_id == current_user.id).count(),
-        "workout_count": db.query(WorkoutLog).filter(WorkoutLog.user_id == current_user.id).count(),
-        "water_count": db.query(WaterLog).filter(WaterLog.user_id == current_user.id).count(),
-    }
+    from services.user_stats import get_stats
+
+    return get_stats(db, current_user.id)
@@ -5,6 +5,7 @@ from database import get_db
 from models import User
 from schemas import BMIRequest, BMIResponse
 from auth_utils import get_current_user
+from etag_utils import bump_data_version
 
 router = APIRouter(prefix="/api/bmi", tags=["BMI"])
 
@@ -43,6 +44,7 @@ def create_or_update_bmi(
     current_user.weight_kg = req.weight_kg
     current_user.bmi = bmi_value
     current_user.bmi_category = category
+    bump_data_version(current_user)
     db.commit()
     db.refresh(current_user)
 
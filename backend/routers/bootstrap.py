@@ -0,0 +1,47 @@
+"""Everything the dashboard needs on first paint, in one request."""
+from datetime import datetime
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from database import get_db
+from auth_utils import get_current_user
+from json_utils import query_rows
+from models import User, EnergyScore, WeeklyReport
+from routers.dashboard import today_totals
+from schemas import BootstrapResponse, EnergyScoreResponse, ReportSummary, UserProfileResponse
+from services import goal_cache
+
+router = APIRouter(prefix="/api/bootstrap", tags=["bootstrap"])
+
+
+# No conditional_get: GET /api/energy/ stores new scores without bumping data_version
+@router.get("/", response_model=BootstrapResponse)
+def bootstrap(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Profile, goals, today's totals, latest energy score and latest report metadata.
+
+    One session and at most four statements after the user lookup (goals
+    are usually served from the goal cache).
+    """
+    energy = (
+        query_rows(db, EnergyScore, EnergyScoreResponse)
+        .filter(EnergyScore.user_id == current_user.id)
+        .order_by(EnergyScore.created_at.desc())
+        .first()
+    )
+    report = (
+        query_rows(db, WeeklyReport, ReportSummary)
+        .filter(WeeklyReport.user_id == current_user.id)
+        .order_by(WeeklyReport.created_at.desc())
+        .first()
+    )
+    return {
+        "profile": UserProfileResponse.model_validate(current_user),
+        "goals": goal_cache.get_goals(db, current_user.id),
+        "today": today_totals(db, current_user.id, datetime.utcnow().date()),
+        "energy": energy._asdict() if energy else None,
+        "latest_report": report._asdict() if report else None,
+    }
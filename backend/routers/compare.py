@@ -0,0 +1,22 @@
+"""How the user's recent days compare with every user's."""
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from database import get_db
+from auth_utils import get_current_user
+from models import User
+from services import population
+
+router = APIRouter(prefix="/api/compare", tags=["compare"])
+
+
+@router.get("/")
+def compare(
+    days: int = Query(7, ge=1, le=30),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Per metric, the user's average logged day over the last `days` days and its percentile among all users' days."""
+    return population.compare(db, current_user.id, days, datetime.utcnow().date())
@@ -1,74 +1,54 @@
 """Dashboard aggregation endpoints."""
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
 
 from database import get_db
 from auth_utils import get_current_user
+from etag_utils import conditional_get
 from models import User, SleepLog, StepsLog, WorkoutLog, WaterLog
 
 router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 
 
-@router.get("/today")
-def get_today_summary(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-):
-    """Aggregate today's fitness data for the authenticated user."""
-    today = datetime.utcnow().strftime("%Y-%m-%d")
-
-    # Sleep – sum duration_hours logged today
-    sleep_hours = (
-        db.query(func.coalesce(func.sum(SleepLog.duration_hours), 0.0))
-        .filter(SleepLog.user_id == current_user.id)
-        .filter(func.date(SleepLog.created_at) == today)
-        .scalar()
-    )
-
-    # Steps – sum steps logged today
-    steps = (
-        db.query(func.coalesce(func.sum(StepsLog.steps), 0))
-        .filter(StepsLog.user_id == current_user.id, StepsLog.date == today)
-        .scalar()
-    )
-
-    # Calories from steps
-    step_calories = (
-        db.query(func.coalesce(func.sum(StepsLog.calories_burnt), 0.0))
-        .filter(StepsLog.user_id == current_user.id, StepsLog.date == today)
-        .scalar()
-    )
+def today_totals(db: Session, user_id: int, today: date) -> dict:
+    """Today's totals per metric, as one SELECT of scalar subqueries."""
+    day = today.isoformat()
+    day_start = datetime.combine(today, datetime.min.time())
+    day_end = day_start + timedelta(days=1)
 
-    # Workout minutes today
-    workout_minutes = (
-        db.query(func.coalesce(func.sum(WorkoutLog.duration_min), 0.0))
-        .filter(WorkoutLog.user_id == current_user.id)
-        .filter(func.date(WorkoutLog.created_at) == today)
-        .scalar()
-    )
+    def total(column, *criteria):
+        return select(func.coalesce(func.sum(column), 0)).where(*criteria).scalar_subquery()
 
-    # Workout calories
-    workout_calories = (
-        db.query(func.coalesce(func.sum(WorkoutLog.calories_burnt), 0.0))
-        .filter(WorkoutLog.user_id == current_user.id)
-        .filter(func.date(WorkoutLog.created_at) == today)
-        .scalar()
-    )
+    sleep_today = (SleepLog.user_id == user_id, SleepLog.day == day)
+    steps_today = (StepsLog.user_id == user_id, StepsLog.date == day)
+    workout_today = (WorkoutLog.user_id == user_id, WorkoutLog.created_at >= day_start, WorkoutLog.created_at < day_end)
+    water_today = (WaterLog.user_id == user_id, WaterLog.date == day)
 
-    # Water glasses today
-    water_glasses = (
-        db.query(func.coalesce(func.sum(WaterLog.glasses), 0))
-        .filter(WaterLog.user_id == current_user.id, WaterLog.date == today)
-        .scalar()
-    )
+    row = db.execute(select(
+        total(SleepLog.duration_hours, *sleep_today).label("sleep_hours"),
+        total(StepsLog.steps, *steps_today).label("steps"),
+        total(StepsLog.calories_burnt, *steps_today).label("step_calories"),
+        total(WorkoutLog.duration_min, *workout_today).label("workout_minutes"),
+        total(WorkoutLog.calories_burnt, *workout_today).label("workout_calories"),
+        total(WaterLog.glasses, *water_today).label("water_glasses"),
+    )).one()
 
     return {
-        "sleep_hours": round(float(sleep_hours), 1),
-        "steps": int(steps),
-        "calories_burnt": round(float(step_calories) + float(workout_calories), 0),
-        "water_glasses": int(water_glasses),
-        "workout_minutes": round(float(workout_minutes), 0),
+        "sleep_hours": round(float(row.sleep_hours), 1),
+        "steps": int(row.steps),
+        "calories_burnt": round(float(row.step_calories) + float(row.workout_calories), 0),
+        "water_glasses": int(row.water_glasses),
+        "workout_minutes": round(float(row.workout_minutes), 0),
     }
+
+
+@router.get("/today", dependencies=[conditional_get(daily=True)])
+def get_today_summary(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Aggregate today's fitness data for the authenticated user."""
+    return today_totals(db, current_user.id, datetime.utcnow().date())
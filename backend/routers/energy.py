@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from datetime import date
 
-from database import get_db
+from database import get_primary_db
 from models import EnergyScore, User, SleepLog, WorkoutLog
 from schemas import EnergyScoreResponse
 from auth_utils import get_current_user
@@ -69,12 +69,12 @@ def compute_energy_score(sleep_logs: list, workout_logs: list) -> tuple[int, flo
 @router.get("/", response_model=EnergyScoreResponse)
 def get_energy_score(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_primary_db),
 ):
     """Compute and return the energy score for the authenticated user."""
     recent_sleep = db.query(SleepLog).filter(
         SleepLog.user_id == current_user.id
-    ).order_by(SleepLog.created_at.desc()).limit(7).all()
+    ).order_by(SleepLog.ended_at.desc()).limit(7).all()
 
     recent_workouts = db.query(WorkoutLog).filter(
         WorkoutLog.user_id == current_user.id
@@ -1,28 +1,26 @@
 """User Goals endpoints."""
+from datetime import datetime
+
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.orm import Session
 
 from database import get_db
 from auth_utils import get_current_user
+from etag_utils import bump_data_version, conditional_get
 from models import User, UserGoal
 from schemas import GoalRequest, GoalResponse
+from services import changes, goal_cache, goal_progress
 
 router = APIRouter(prefix="/api/goals", tags=["goals"])
 
-@router.get("/", response_model=GoalResponse)
+@router.get("/", response_model=GoalResponse, dependencies=[conditional_get()])
 def get_goals(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    """Get the current goals for the authenticated user."""
-    goal = db.query(UserGoal).filter(UserGoal.user_id == current_user.id).first()
-    if not goal:
-        # Create default goals if they don't exist
-        goal = UserGoal(user_id=current_user.id)
-        db.add(goal)
-        db.commit()
-        db.refresh(goal)
-    return goal
+    """Get the current goals for the authenticated user (defaults if none are saved yet)."""
+    return goal_cache.get_goals(db, current_user.id)
 
 @router.put("/", response_model=GoalResponse)
 def update_goals(
@@ -31,20 +29,34 @@ def update_goals(
     db: Session = Depends(get_db),
 ):
     """Update goals for the authenticated user."""
-    goal = db.query(UserGoal).filter(UserGoal.user_id == current_user.id).first()
-    if not goal:
-        goal = UserGoal(user_id=current_user.id)
-        db.add(goal)
-    
-    if request.step_goal is not None:
-        goal.step_goal = request.step_goal
-    if request.sleep_goal is not None:
-        goal.sleep_goal = request.sleep_goal
-    if request.water_goal is not None:
-        goal.water_goal = request.water_goal
-    if request.calorie_goal is not None:
-        goal.calorie_goal = request.calorie_goal
-        
+    values = request.model_dump(exclude_none=True)
+    # Upsert, so concurrent first updates can't both insert the user's row
+    stmt = insert(UserGoal).values(user_id=current_user.id, **values)
+    if values:
+        stmt = stmt.on_conflict_do_update(index_elements=[UserGoal.user_id], set_=values)
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=[UserGoal.user_id])
+    db.execute(stmt)
+    goal = db.query(UserGoal).filter(UserGoal.user_id == current_user.id).populate_existing().one()
+    # The Core upsert bypasses the after_flush hook that logs ORM changes
+    changes.record(db, current_user.id, "goals", goal.id)
+
+    goal_progress.on_goals_updated(
+        db, current_user.id,
+        {field: getattr(goal, field) for field in goal_progress.GOAL_FIELDS.values()},
+    )
+    bump_data_version(current_user)
     db.commit()
+    goal_cache.invalidate(current_user.id)
     db.refresh(goal)
     return goal
+
+
+@router.get("/progress", dependencies=[conditional_get(daily=True)])
+def get_goal_progress(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Streaks and 7/30-day rolling totals per goal, read from the maintained state."""
+    goals = goal_progress.goal_values(db, current_user.id)
+    return goal_progress.progress(db, current_user.id, goals, datetime.utcnow().date())
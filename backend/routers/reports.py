@@ -1,16 +1,18 @@
 """Weekly AI Reports router."""
 import json
-import os
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 
 from database import get_db
 from auth_utils import get_current_user
-from models import User, SleepLog, StepsLog, WorkoutLog, WaterLog, WeeklyReport
-from schemas import WeeklyReportResponse
+from json_utils import query_rows, rows_response
+from etag_utils import bump_data_version, conditional_get
+from models import User, WeeklyReport
+from schemas import WeeklyReportResponse, TrendsResponse
+from services import weekly_stats
+from services.openai_service import LLMBusyError, complete
 
 router = APIRouter(prefix="/api/reports", tags=["reports"])
 
@@ -23,86 +25,8 @@ def _get_week_range():
     return str(start), str(end)
 
 
-def _aggregate_week_data(db: Session, user_id: int, week_start: str, week_end: str) -> dict:
-    """Aggregate all fitness data for the given week."""
-    # Sleep
-    sleep_logs = (
-        db.query(SleepLog)
-        .filter(
-            SleepLog.user_id == user_id,
-            func.date(SleepLog.created_at) >= week_start,
-            func.date(SleepLog.created_at) <= week_end,
-        )
-        .all()
-    )
-    total_sleep = sum(l.duration_hours for l in sleep_logs)
-    avg_sleep = round(total_sleep / len(sleep_logs), 1) if sleep_logs else 0
-
-    # Steps
-    step_logs = (
-        db.query(StepsLog)
-        .filter(StepsLog.user_id == user_id, StepsLog.date >= week_start, StepsLog.date <= week_end)
-        .all()
-    )
-    total_steps = sum(l.steps for l in step_logs)
-    total_step_cal = sum(l.calories_burnt for l in step_logs)
-
-    # Workouts
-    workout_logs = (
-        db.query(WorkoutLog)
-        .filter(
-            WorkoutLog.user_id == user_id,
-            func.date(WorkoutLog.created_at) >= week_start,
-            func.date(WorkoutLog.created_at) <= week_end,
-        )
-        .all()
-    )
-    total_workout_min = sum(l.duration_min for l in workout_logs)
-    total_workout_cal = sum(l.calories_burnt or 0 for l in workout_logs)
-    workout_types = {}
-    for w in workout_logs:
-        workout_types[w.workout_type] = workout_types.get(w.workout_type, 0) + 1
-
-    # Water
-    water_logs = (
-        db.query(WaterLog)
-        .filter(WaterLog.user_id == user_id, WaterLog.date >= week_start, WaterLog.date <= week_end)
-        .all()
-    )
-    total_water = sum(l.glasses for l in water_logs)
-
-    return {
-        "week_start": week_start,
-        "week_end": week_end,
-        "sleep": {
-            "total_hours": round(total_sleep, 1),
-            "avg_hours": avg_sleep,
-            "nights_logged": len(sleep_logs),
-        },
-        "steps": {
-            "total": total_steps,
-            "calories": round(total_step_cal, 0),
-            "days_logged": len(step_logs),
-        },
-        "workouts": {
-            "total_minutes": round(total_workout_min, 0),
-            "calories": round(total_workout_cal, 0),
-            "sessions": len(workout_logs),
-            "types": workout_types,
-        },
-        "water": {
-            "total_glasses": total_water,
-            "days_logged": len(water_logs),
-        },
-    }
-
-
 def _generate_report_text(stats: dict, user: User) -> str:
     """Call OpenAI to generate a comprehensive weekly fitness report."""
-    from openai import OpenAI
-
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY", ""))
-
     prompt = f"""You are a certified fitness coach and health advisor. Generate a comprehensive weekly fitness report for the user based on this data:
 
 **User Profile:**
@@ -138,13 +62,9 @@ Please provide:
 Use markdown formatting with headers, bullet points, and bold text. Keep it encouraging but honest. If there is little data, acknowledge it and encourage consistency."""
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=1200,
-            temperature=0.7,
-        )
-        return response.choices[0].message.content
+        return complete([{"role": "user", "content": prompt}], max_tokens=1200, user_id=user.id)
+    except LLMBusyError:
+        raise
     except Exception as e:
         return f"**Report Generation Error**\n\nCould not generate AI report: {str(e)}\n\nPlease ensure your OpenAI API key is configured correctly."
 
@@ -170,15 +90,17 @@ def generate_weekly_report(
 
     if existing:
         # Regenerate the report text but update in place
-        stats = _aggregate_week_data(db, current_user.id, week_start, week_end)
+        stats = weekly_stats.for_week(db, current_user.id, week_start, week_end)
         existing.report_text = _generate_report_text(stats, current_user)
         existing.summary_stats = json.dumps(stats)
+        weekly_stats.save(db, current_user.id, stats)
+        bump_data_version(current_user)
         db.commit()
         db.refresh(existing)
         return existing
 
     # Generate new report
-    stats = _aggregate_week_data(db, current_user.id, week_start, week_end)
+    stats = weekly_stats.for_week(db, current_user.id, week_start, week_end)
     report_text = _generate_report_text(stats, current_user)
 
     report = WeeklyReport(
@@ -189,26 +111,44 @@ def generate_weekly_report(
         summary_stats=json.dumps(stats),
     )
     db.add(report)
+    weekly_stats.save(db, current_user.id, stats)
+    bump_data_version(current_user)
     db.commit()
     db.refresh(report)
     return report
 
 
-@router.get("/", response_model=list[WeeklyReportResponse])
+@router.get("/", response_model=list[WeeklyReportResponse], dependencies=[conditional_get()])
 def list_reports(
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """List all weekly reports for the user, newest first."""
-    return (
-        db.query(WeeklyReport)
+    reports = (
+        query_rows(db, WeeklyReport, WeeklyReportResponse)
         .filter(WeeklyReport.user_id == current_user.id)
         .order_by(WeeklyReport.created_at.desc())
-        .all()
     )
+    return rows_response(reports, response)
+
+
+@router.get("/trends", response_model=TrendsResponse, dependencies=[conditional_get(daily=True)])
+def get_trends(
+    weeks: int = Query(12, ge=1, le=104),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Week-over-week stats and deltas for the last `weeks` weeks, from the stored weekly stats."""
+    week_start, _ = _get_week_range()
+    return {
+        "weeks": weeks,
+        "metrics": list(weekly_stats.TREND_METRICS),
+        "trend": weekly_stats.trends(db, current_user.id, weeks, date.fromisoformat(week_start)),
+    }
 
 
-@router.get("/{report_id}", response_model=WeeklyReportResponse)
+@router.get("/{report_id}", response_model=WeeklyReportResponse, dependencies=[conditional_get()])
 def get_report(
     report_id: int,
     current_user: User = Depends(get_current_user),
@@ -0,0 +1,155 @@
+"""Time-bucketed chart series, aggregated in SQL."""
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database import get_db
+from auth_utils import get_current_user
+from etag_utils import conditional_get
+from models import User, SleepLog, StepsLog, WorkoutLog, WaterLog
+from services import archive
+
+router = APIRouter(prefix="/api/series", tags=["series"])
+
+# metric -> (model, date column name, is the column a timestamp, {series name: aggregate of the rows})
+# Aggregates take the row source so archived rows can be unioned in for old ranges.
+METRICS = {
+    "steps": (StepsLog, "date", False, {
+        "steps": lambda rows: func.sum(rows.steps),
+        "calories": lambda rows: func.sum(rows.calories_burnt),
+    }),
+    "water": (WaterLog, "date", False, {
+        "glasses": lambda rows: func.sum(rows.glasses),
+    }),
+    "sleep": (SleepLog, "day", False, {
+        "avg_hours": lambda rows: func.avg(rows.duration_hours),
+        "nights": lambda rows: func.count(rows.id),
+    }),
+    "workout": (WorkoutLog, "created_at", True, {
+        "minutes": lambda rows: func.sum(rows.duration_min),
+        "calories": lambda rows: func.sum(rows.calories_burnt),
+        "sessions": lambda rows: func.count(rows.id),
+    }),
+}
+
+# How far back the range starts when `from` is omitted, in buckets
+DEFAULT_SPAN = {"day": 30, "week": 12, "month": 12}
+# Most buckets one request may ask for
+MAX_BUCKETS = 366
+# Latest accepted `to`, so bucket arithmetic never passes date.max
+MAX_DAY = date(9000, 1, 1)
+
+
+def _bucket_expr(column, bucket: str):
+    """SQL expression for the bucket start date (YYYY-MM-DD) of each row."""
+    if bucket == "day":
+        return func.date(column)
+    if bucket == "week":
+        return func.date(column, "weekday 0", "-6 days")  # Monday
+    return func.strftime("%Y-%m-01", column)
+
+
+def _bucket_start(day: date, bucket: str) -> date:
+    if bucket == "day":
+        return day
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def _next_bucket(start: date, bucket: str) -> date:
+    if bucket == "day":
+        return start + timedelta(days=1)
+    if bucket == "week":
+        return start + timedelta(days=7)
+    return (start + timedelta(days=32)).replace(day=1)
+
+
+def _bucket_count(from_day: date, to_day: date, bucket: str) -> int:
+    start, end = _bucket_start(from_day, bucket), _bucket_start(to_day, bucket)
+    if bucket == "day":
+        return (end - start).days + 1
+    if bucket == "week":
+        return (end - start).days // 7 + 1
+    return (end.year - start.year) * 12 + end.month - start.month + 1
+
+
+def _default_from(to_day: date, bucket: str) -> date:
+    start = _bucket_start(to_day, bucket)
+    for _ in range(DEFAULT_SPAN[bucket] - 1):
+        start = _bucket_start(start - timedelta(days=1), bucket)
+    return start
+
+
+def _parse_day(value: str, name: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"'{name}' must be a YYYY-MM-DD date.")
+
+
+@router.get("/{metric}", dependencies=[conditional_get(daily=True)])
+def get_series(
+    metric: str,
+    bucket: str = "day",
+    from_: Optional[str] = Query(None, alias="from"),
+    to: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Aggregate a metric into day/week/month buckets with gaps filled, as columnar arrays."""
+    if metric not in METRICS:
+        raise HTTPException(status_code=404, detail=f"Unknown metric. Choose from: {', '.join(METRICS)}.")
+    if bucket not in DEFAULT_SPAN:
+        raise HTTPException(status_code=400, detail="'bucket' must be day, week or month.")
+
+    to_day = _parse_day(to, "to") if to else datetime.utcnow().date()
+    from_day = _parse_day(from_, "from") if from_ else _default_from(to_day, bucket)
+    if from_day > to_day:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'.")
+    if to_day >= MAX_DAY:
+        raise HTTPException(status_code=400, detail=f"'to' must be before {MAX_DAY.isoformat()}.")
+    if _bucket_count(from_day, to_day, bucket) > MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Ask for at most {MAX_BUCKETS} {bucket} buckets.")
+
+    model, column_name, is_timestamp, aggregates = METRICS[metric]
+    rows_source = archive.source(db, model, _bucket_start(from_day, bucket))
+    column = getattr(rows_source, column_name)
+    bucket_col = _bucket_expr(column, bucket).label("bucket")
+
+    query = db.query(bucket_col, *(agg(rows_source).label(name) for name, agg in aggregates.items())).filter(
+        rows_source.user_id == current_user.id
+    )
+    # Range on the raw column so the (user_id, date) indexes apply
+    if is_timestamp:
+        query = query.filter(
+            column >= datetime.combine(from_day, datetime.min.time()),
+            column < datetime.combine(to_day + timedelta(days=1), datetime.min.time()),
+        )
+    else:
+        query = query.filter(column >= from_day.isoformat(), column <= to_day.isoformat())
+    rows = {row.bucket: row for row in query.group_by(bucket_col)}
+
+    labels = []
+    series = {name: [] for name in aggregates}
+    start = _bucket_start(from_day, bucket)
+    while start <= to_day:
+        label = start.isoformat()
+        labels.append(label)
+        row = rows.get(label)
+        for name in aggregates:
+            value = getattr(row, name) if row is not None else None
+            series[name].append(round(float(value), 1) if value is not None else 0)
+        start = _next_bucket(start, bucket)
+
+    return {
+        "metric": metric,
+        "bucket": bucket,
+        "from": from_day.isoformat(),
+        "to": to_day.isoformat(),
+        "labels": labels,
+        "series": series,
+    }
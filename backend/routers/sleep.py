@@ -1,74 +1,87 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 
 from database import get_db
 from models import SleepLog, User
-from schemas import SleepLogRequest, SleepLogResponse, SleepAnalyzeRequest, AIAnalysisResponse
-from services.openai_service import analyze_sleep
+from schemas import (
+    SleepLogRequest, SleepLogResponse, SleepAnalyzeRequest, AIAnalysisResponse,
+    SleepBatchAnalyzeRequest, BatchAnalysisResponse, BatchAnalysisItem,
+)
+from services.openai_service import analyze_sleep, analyze_sleep_batch, BATCH_MAX_ITEMS
+from services import analysis_store, goal_progress, group_commit, population, sleep_sessions, user_stats, weekly_stats
 from auth_utils import get_current_user
+from json_utils import query_rows, rows_response, parse_include
+from etag_utils import bump_data_version, conditional_get
+from date_utils import parse_log_date
 
 router = APIRouter(prefix="/api/sleep", tags=["Sleep"])
 
 
-def parse_duration(sleep_time: str, wake_time: str) -> float:
-    """Parse sleep/wake times and return duration in hours."""
-    from datetime import datetime
-
-    formats = ["%I:%M %p", "%H:%M"]
-    st = wt = None
-    for fmt in formats:
-        try:
-            st = datetime.strptime(sleep_time.strip().upper(), fmt)
-            break
-        except ValueError:
-            continue
-    for fmt in formats:
-        try:
-            wt = datetime.strptime(wake_time.strip().upper(), fmt)
-            break
-        except ValueError:
-            continue
-
-    if not st or not wt:
-        return 8.0  # default
-
-    diff = (wt - st).total_seconds() / 3600
-    if diff < 0:
-        diff += 24
-    return round(diff, 1)
-
-
 @router.post("/", response_model=SleepLogResponse)
 def log_sleep(
     req: SleepLogRequest,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    """Log a sleep entry for the authenticated user."""
-    duration = parse_duration(req.sleep_time, req.wake_time)
-
-    log = SleepLog(
-        user_id=current_user.id,
-        sleep_time=req.sleep_time,
-        wake_time=req.wake_time,
-        duration_hours=duration,
-    )
-    db.add(log)
-    db.commit()
-    db.refresh(log)
-    return log
-
-
-@router.get("/", response_model=list[SleepLogResponse])
+    """Log a sleep entry for the authenticated user.
+
+    Times are the client's local clock; send `utc_offset_minutes` so they are placed correctly.
+    Without `date` the session is the one that ended most recently at the wake time.
+    Returns 409 if it overlaps a session already logged.
+    """
+    night = parse_log_date(req.date) if req.date else None
+    offset = timedelta(minutes=req.utc_offset_minutes) if req.utc_offset_minutes is not None else None
+    try:
+        started_at, ended_at = sleep_sessions.session_bounds(
+            req.sleep_time, req.wake_time, night, datetime.utcnow(), offset
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    duration = sleep_sessions.duration_hours(started_at, ended_at)
+    day = sleep_sessions.local_day(ended_at, offset)
+
+    def after(session, log):
+        # Checked after the insert, in the writing transaction, so concurrent logs can't both pass
+        clash = sleep_sessions.find_overlap(session, log["user_id"], started_at, ended_at, exclude_id=log["id"])
+        if clash is not None:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Overlaps sleep log {clash.id} ({clash.started_at:%Y-%m-%d %H:%M} to {clash.ended_at:%H:%M}).",
+            )
+        goal_progress.record_log(session, log["user_id"], day, sleep=duration)
+        population.record(session, log["user_id"], "sleep", day, duration)
+        weekly_stats.mark_dirty(session, log["user_id"], day)
+        user_stats.adjust(session, log["user_id"], sleep_count=1)
+
+    return group_commit.insert_log(db, current_user.id, SleepLog, {
+        "sleep_time": req.sleep_time,
+        "wake_time": req.wake_time,
+        "duration_hours": duration,
+        "started_at": started_at,
+        "ended_at": ended_at,
+        "day": day.isoformat(),
+    }, after)
+
+
+@router.get("/", response_model=list[SleepLogResponse], dependencies=[conditional_get()])
 def get_sleep_logs(
+    response: Response,
+    include: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    """Get all sleep logs for the authenticated user."""
-    logs = db.query(SleepLog).filter(
+    """Get all sleep logs for the authenticated user. Pass ?include=analysis for the AI analyses."""
+    logs = [row._asdict() for row in query_rows(db, SleepLog, SleepLogResponse, exclude={"ai_analysis"}).filter(
         SleepLog.user_id == current_user.id
-    ).order_by(SleepLog.created_at.desc()).all()
-    return logs
+    ).order_by(SleepLog.created_at.desc())]
+    if "analysis" in parse_include(include):
+        analyses = analysis_store.load(db, "sleep", [log["id"] for log in logs])
+        for log in logs:
+            log["ai_analysis"] = analyses.get(log["id"])
+    return rows_response(logs, response)
 
 
 @router.post("/analyze", response_model=AIAnalysisResponse)
@@ -88,12 +101,55 @@ def analyze_sleep_endpoint(
     analysis = analyze_sleep(
         bmi=current_user.bmi or 0,
         bmi_category=current_user.bmi_category or "Unknown",
+        weight_kg=current_user.weight_kg or 70,
         sleep_time=sleep_log.sleep_time,
         wake_time=sleep_log.wake_time,
-        duration=sleep_log.duration_hours,
+        duration_hours=sleep_log.duration_hours,
+        user_id=current_user.id,
     )
 
-    sleep_log.ai_analysis = analysis
+    analysis_store.save(db, "sleep", sleep_log.id, analysis)
+    bump_data_version(current_user)
     db.commit()
 
     return AIAnalysisResponse(analysis=analysis)
+
+
+@router.post("/analyze/batch", response_model=BatchAnalysisResponse)
+def analyze_sleep_batch_endpoint(
+    req: SleepBatchAnalyzeRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Analyze several sleep entries with one AI call and save every analysis together."""
+    ids = list(dict.fromkeys(req.sleep_log_ids))
+    if not ids or len(ids) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {BATCH_MAX_ITEMS} sleep log ids.")
+
+    logs = db.query(SleepLog).filter(
+        SleepLog.id.in_(ids),
+        SleepLog.user_id == current_user.id,
+    ).all()
+    if len(logs) != len(ids):
+        raise HTTPException(status_code=404, detail="Sleep log not found.")
+
+    analyses, failed = analyze_sleep_batch(
+        bmi=current_user.bmi or 0,
+        bmi_category=current_user.bmi_category or "Unknown",
+        weight_kg=current_user.weight_kg or 70,
+        logs=[
+            {"id": l.id, "sleep_time": l.sleep_time, "wake_time": l.wake_time, "duration_hours": l.duration_hours}
+            for l in logs
+        ],
+        user_id=current_user.id,
+    )
+
+    for log_id, analysis in analyses.items():
+        analysis_store.save(db, "sleep", log_id, analysis)
+    bump_data_version(current_user)
+    db.commit()
+
+    return BatchAnalysisResponse(
+        results=[BatchAnalysisItem(log_id=i, analysis=analyses[i]) for i in ids if i in analyses],
+        failed_ids=failed,
+    )
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 
 from database import get_db
 from models import StepsLog, User
 from schemas import StepsLogRequest, StepsLogResponse
 from auth_utils import get_current_user
+from services import goal_progress, group_commit, population, user_stats, weekly_stats
+from json_utils import query_rows, rows_response
+from etag_utils import conditional_get
+from date_utils import parse_log_date
 
 router = APIRouter(prefix="/api/steps", tags=["Steps"])
 
@@ -23,25 +27,29 @@ def log_steps(
     """Log a step count entry for the authenticated user."""
     cals = estimate_calories(req.steps, current_user.weight_kg or 70)
 
-    log = StepsLog(
-        user_id=current_user.id,
-        steps=req.steps,
-        calories_burnt=cals,
-        date=req.date,
-    )
-    db.add(log)
-    db.commit()
-    db.refresh(log)
-    return log
+    day = parse_log_date(req.date)
 
+    def after(session, log):
+        goal_progress.record_log(session, log["user_id"], day, steps=req.steps, calories=cals)
+        population.record(session, log["user_id"], "steps", day, req.steps)
+        weekly_stats.mark_dirty(session, log["user_id"], day)
+        user_stats.adjust(session, log["user_id"], steps_count=1)
 
-@router.get("/", response_model=list[StepsLogResponse])
+    return group_commit.insert_log(db, current_user.id, StepsLog, {
+        "steps": req.steps,
+        "calories_burnt": cals,
+        "date": req.date,
+    }, after)
+
+
+@router.get("/", response_model=list[StepsLogResponse], dependencies=[conditional_get()])
 def get_steps_logs(
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Get all step logs for the authenticated user."""
-    logs = db.query(StepsLog).filter(
+    logs = query_rows(db, StepsLog, StepsLogResponse).filter(
         StepsLog.user_id == current_user.id
-    ).order_by(StepsLog.created_at.desc()).all()
-    return logs
+    ).order_by(StepsLog.created_at.desc())
+    return rows_response(logs, response)
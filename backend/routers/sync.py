@@ -0,0 +1,100 @@
+"""Delta sync for offline clients: every change since a cursor in one response."""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.orm import Session
+
+from database import SHARD_COUNT, get_db, shard_for
+from auth_utils import get_current_user
+from json_utils import query_rows
+from models import User
+from schemas import (
+    SleepLogResponse, StepsLogResponse, WorkoutLogResponse, WaterLogResponse,
+    GoalResponse, EnergyScoreResponse, WeeklyReportResponse,
+)
+from services import analysis_store, changes
+
+router = APIRouter(prefix="/api/sync", tags=["sync"])
+
+# entity -> schema of the rows sent for it (the same shape as the list endpoints)
+SCHEMAS = {
+    "sleep": SleepLogResponse,
+    "steps": StepsLogResponse,
+    "workout": WorkoutLogResponse,
+    "water": WaterLogResponse,
+    "goals": GoalResponse,
+    "energy": EnergyScoreResponse,
+    "reports": WeeklyReportResponse,
+}
+# entities whose rows carry an AI analysis stored in log_analyses
+WITH_ANALYSIS = {"sleep", "workout"}
+
+
+def _rows(db: Session, entity: str, user_id: int, ids: Optional[set] = None) -> list[dict]:
+    model = changes.SYNCED[entity]
+    query = query_rows(db, model, SCHEMAS[entity], exclude={"ai_analysis"}).filter(model.user_id == user_id)
+    if ids is not None:
+        query = query.filter(model.id.in_(ids))
+    rows = [row._asdict() for row in query]
+    if entity in WITH_ANALYSIS and rows:
+        analyses = analysis_store.load(db, entity, [row["id"] for row in rows])
+        for row in rows:
+            row["ai_analysis"] = analyses.get(row["id"])
+    return rows
+
+
+def _cursor(user_id: int, seq: int) -> str:
+    """Sequence numbers are per shard database, so sharded cursors also name the layout they came from."""
+    if SHARD_COUNT == 1:
+        return str(seq)
+    return f"{SHARD_COUNT}.{shard_for(user_id)}.{seq}"
+
+
+def _parse_cursor(since: str, user_id: int) -> Optional[int]:
+    """The sequence number in `since`, or None when it was issued under another shard layout."""
+    parts = since.split(".")
+    try:
+        numbers = [int(part) for part in parts]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="'since' must be a cursor returned by a previous sync.")
+    if len(numbers) == 1:
+        return numbers[0] if SHARD_COUNT == 1 else None
+    if len(numbers) == 3:
+        shard_count, shard, seq = numbers
+        return seq if (shard_count, shard) == (SHARD_COUNT, shard_for(user_id)) else None
+    raise HTTPException(status_code=400, detail="'since' must be a cursor returned by a previous sync.")
+
+
+# No ETag: energy scores are written by a GET without bumping data_version,
+# and an up-to-date client already costs only one empty index range scan.
+@router.get("/")
+def sync(
+    since: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Rows changed since the `since` cursor, per entity, plus the cursor to send next time.
+
+    Without a usable cursor every row is returned (`full` is true), e.g. on
+    first sync or after the user's rows moved shards. Rows deleted since the
+    cursor are listed by id under `deleted`.
+    """
+    cursor = None if since is None else _parse_cursor(since, current_user.id)
+    if cursor is None:
+        payload = {
+            "cursor": _cursor(current_user.id, changes.latest_seq(db, current_user.id)),
+            "full": True,
+            "changes": {entity: _rows(db, entity, current_user.id) for entity in SCHEMAS},
+            "deleted": {},
+        }
+        return ORJSONResponse(payload)
+
+    upserted, deleted, cursor = changes.since(db, current_user.id, cursor)
+    payload = {
+        "cursor": _cursor(current_user.id, cursor),
+        "full": False,
+        "changes": {entity: _rows(db, entity, current_user.id, ids) for entity, ids in upserted.items() if ids},
+        "deleted": {entity: sorted(ids) for entity, ids in deleted.items() if ids},
+    }
+    return ORJSONResponse(payload)
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 
 from database import get_db
 from models import WaterLog, User
 from schemas import WaterLogRequest, WaterLogResponse
 from auth_utils import get_current_user
+from services import goal_progress, group_commit, user_stats, weekly_stats
+from json_utils import query_rows, rows_response
+from etag_utils import conditional_get
+from date_utils import parse_log_date
 
 router = APIRouter(prefix="/api/water", tags=["Water"])
 
@@ -16,24 +20,27 @@ def log_water(
     db: Session = Depends(get_db),
 ):
     """Log water intake for the authenticated user."""
-    log = WaterLog(
-        user_id=current_user.id,
-        glasses=req.glasses,
-        date=req.date,
-    )
-    db.add(log)
-    db.commit()
-    db.refresh(log)
-    return log
-
-
-@router.get("/", response_model=list[WaterLogResponse])
+    day = parse_log_date(req.date)
+
+    def after(session, log):
+        goal_progress.record_log(session, log["user_id"], day, water=req.glasses)
+        weekly_stats.mark_dirty(session, log["user_id"], day)
+        user_stats.adjust(session, log["user_id"], water_count=1)
+
+    return group_commit.insert_log(db, current_user.id, WaterLog, {
+        "glasses": req.glasses,
+        "date": req.date,
+    }, after)
+
+
+@router.get("/", response_model=list[WaterLogResponse], dependencies=[conditional_get()])
 def get_water_logs(
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Get all water logs for the authenticated user."""
-    logs = db.query(WaterLog).filter(
+    logs = query_rows(db, WaterLog, WaterLogResponse).filter(
         WaterLog.user_id == current_user.id
-    ).order_by(WaterLog.created_at.desc()).all()
-    return logs
+    ).order_by(WaterLog.created_at.desc())
+    return rows_response(logs, response)
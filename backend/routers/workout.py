@@ -1,11 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 
 from database import get_db
 from models import WorkoutLog, User
-from schemas import WorkoutLogRequest, WorkoutLogResponse, WorkoutAnalyzeRequest, AIAnalysisResponse
-from services.openai_service import analyze_workout
+from schemas import (
+    WorkoutLogRequest, WorkoutLogResponse, WorkoutAnalyzeRequest, AIAnalysisResponse,
+    WorkoutBatchAnalyzeRequest, BatchAnalysisResponse, BatchAnalysisItem,
+)
+from services.openai_service import analyze_workout, analyze_workout_batch, BATCH_MAX_ITEMS
+from services import analysis_store, goal_progress, group_commit, population, user_stats
 from auth_utils import get_current_user
+from json_utils import query_rows, rows_response, parse_include
+from etag_utils import bump_data_version, conditional_get
 
 router = APIRouter(prefix="/api/workout", tags=["Workout"])
 
@@ -39,30 +47,36 @@ def log_workout(
         req.workout_type, req.duration_min, req.intensity, current_user.weight_kg or 70
     )
 
-    log = WorkoutLog(
-        user_id=current_user.id,
-        workout_type=req.workout_type,
-        duration_min=req.duration_min,
-        intensity=req.intensity,
-        calories_burnt=calories,
-        notes=req.notes,
-    )
-    db.add(log)
-    db.commit()
-    db.refresh(log)
-    return log
+    def after(session, log):
+        goal_progress.record_log(session, log["user_id"], log["created_at"].date(), calories=calories)
+        population.record(session, log["user_id"], "workout", log["created_at"].date(), req.duration_min)
+        user_stats.adjust(session, log["user_id"], workout_count=1)
 
+    return group_commit.insert_log(db, current_user.id, WorkoutLog, {
+        "workout_type": req.workout_type,
+        "duration_min": req.duration_min,
+        "intensity": req.intensity,
+        "calories_burnt": calories,
+        "notes": req.notes,
+    }, after)
 
-@router.get("/", response_model=list[WorkoutLogResponse])
+
+@router.get("/", response_model=list[WorkoutLogResponse], dependencies=[conditional_get()])
 def get_workout_logs(
+    response: Response,
+    include: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    """Get all workout logs for the authenticated user."""
-    logs = db.query(WorkoutLog).filter(
+    """Get all workout logs for the authenticated user. Pass ?include=analysis for the AI analyses."""
+    logs = [row._asdict() for row in query_rows(db, WorkoutLog, WorkoutLogResponse, exclude={"ai_analysis"}).filter(
         WorkoutLog.user_id == current_user.id
-    ).order_by(WorkoutLog.created_at.desc()).all()
-    return logs
+    ).order_by(WorkoutLog.created_at.desc())]
+    if "analysis" in parse_include(include):
+        analyses = analysis_store.load(db, "workout", [log["id"] for log in logs])
+        for log in logs:
+            log["ai_analysis"] = analyses.get(log["id"])
+    return rows_response(logs, response)
 
 
 @router.post("/analyze", response_model=AIAnalysisResponse)
@@ -87,9 +101,52 @@ def analyze_workout_endpoint(
         duration_min=workout_log.duration_min,
         intensity=workout_log.intensity,
         calories=workout_log.calories_burnt or 0,
+        user_id=current_user.id,
     )
 
-    workout_log.ai_analysis = analysis
+    analysis_store.save(db, "workout", workout_log.id, analysis)
+    bump_data_version(current_user)
     db.commit()
 
     return AIAnalysisResponse(analysis=analysis)
+
+
+@router.post("/analyze/batch", response_model=BatchAnalysisResponse)
+def analyze_workout_batch_endpoint(
+    req: WorkoutBatchAnalyzeRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Analyze several workouts with one AI call and save every analysis together."""
+    ids = list(dict.fromkeys(req.workout_log_ids))
+    if not ids or len(ids) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {BATCH_MAX_ITEMS} workout log ids.")
+
+    logs = db.query(WorkoutLog).filter(
+        WorkoutLog.id.in_(ids),
+        WorkoutLog.user_id == current_user.id,
+    ).all()
+    if len(logs) != len(ids):
+        raise HTTPException(status_code=404, detail="Workout log not found.")
+
+    analyses, failed = analyze_workout_batch(
+        bmi=current_user.bmi or 0,
+        bmi_category=current_user.bmi_category or "Unknown",
+        weight_kg=current_user.weight_kg or 70,
+        logs=[
+            {"id": l.id, "workout_type": l.workout_type, "duration_min": l.duration_min,
+             "intensity": l.intensity, "calories": l.calories_burnt or 0}
+            for l in logs
+        ],
+        user_id=current_user.id,
+    )
+
+    for log_id, analysis in analyses.items():
+        analysis_store.save(db, "workout", log_id, analysis)
+    bump_data_version(current_user)
+    db.commit()
+
+    return BatchAnalysisResponse(
+        results=[BatchAnalysisItem(log_id=i, analysis=analyses[i]) for i in ids if i in analyses],
+        failed_ids=failed,
+    )
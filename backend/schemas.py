@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
 
@@ -21,6 +21,8 @@ class BMIResponse(BaseModel):
 class SleepLogRequest(BaseModel):
     sleep_time: str  # e.g. "10:00 PM" or "22:00"
     wake_time: str   # e.g. "6:00 AM" or "06:00"
+    date: Optional[str] = None  # "YYYY-MM-DD" evening the sleep began; default: the latest wake time
+    utc_offset_minutes: Optional[int] = Field(None, ge=-720, le=840)  # client's offset, e.g. 330 for UTC+5:30
 
 
 class SleepLogResponse(BaseModel):
@@ -29,6 +31,9 @@ class SleepLogResponse(BaseModel):
     sleep_time: str
     wake_time: str
     duration_hours: float
+    started_at: Optional[datetime] = None
+    ended_at: Optional[datetime] = None
+    day: Optional[str] = None
     ai_analysis: Optional[str] = None
     created_at: datetime
 
@@ -40,6 +45,10 @@ class SleepAnalyzeRequest(BaseModel):
     sleep_log_id: int
 
 
+class SleepBatchAnalyzeRequest(BaseModel):
+    sleep_log_ids: List[int]
+
+
 # ── Steps ────────────────────────────────────────────
 class StepsLogRequest(BaseModel):
     steps: int
@@ -85,6 +94,10 @@ class WorkoutAnalyzeRequest(BaseModel):
     workout_log_id: int
 
 
+class WorkoutBatchAnalyzeRequest(BaseModel):
+    workout_log_ids: List[int]
+
+
 # ── Water ────────────────────────────────────────────
 class WaterLogRequest(BaseModel):
     glasses: int
@@ -123,6 +136,16 @@ class AIAnalysisResponse(BaseModel):
     suggestions: Optional[List[str]] = None
 
 
+class BatchAnalysisItem(BaseModel):
+    log_id: int
+    analysis: str
+
+
+class BatchAnalysisResponse(BaseModel):
+    results: List[BatchAnalysisItem]
+    failed_ids: List[int] = []  # logs that could not be analyzed; retry them individually
+
+
 # ── Auth ─────────────────────────────────────────────
 class RegisterRequest(BaseModel):
     name: str
@@ -174,6 +197,19 @@ class WeeklyReportResponse(BaseModel):
         from_attributes = True
 
 
+class WeekTrend(BaseModel):
+    week_start: str
+    week_end: str
+    values: dict[str, Optional[float]]  # None for weeks without stats
+    deltas: dict[str, Optional[float]]  # change from the previous week
+
+
+class TrendsResponse(BaseModel):
+    weeks: int
+    metrics: list[str]
+    trend: list[WeekTrend]  # oldest week first
+
+
 # ── Goals ────────────────────────────────────────────
 class GoalRequest(BaseModel):
     step_goal: Optional[int] = None
@@ -183,7 +219,7 @@ class GoalRequest(BaseModel):
 
 
 class GoalResponse(BaseModel):
-    id: int
+    id: Optional[int] = None  # None until the user saves goals
     user_id: int
     step_goal: int
     sleep_goal: float
@@ -192,3 +228,27 @@ class GoalResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+# ── Bootstrap ────────────────────────────────────────
+class TodayTotals(BaseModel):
+    sleep_hours: float
+    steps: int
+    calories_burnt: float
+    water_glasses: int
+    workout_minutes: float
+
+
+class ReportSummary(BaseModel):
+    id: int
+    week_start: str
+    week_end: str
+    created_at: datetime
+
+
+class BootstrapResponse(BaseModel):
+    profile: UserProfileResponse
+    goals: GoalResponse
+    today: TodayTotals
+    energy: Optional[EnergyScoreResponse] = None  # latest stored score
+    latest_report: Optional[ReportSummary] = None
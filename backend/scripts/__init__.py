@@ -0,0 +1 @@
+# make scripts a package
@@ -0,0 +1,59 @@
+"""Move log rows older than the archive horizon into the *_archive tables.
+
+Covers sleep, steps, workout, water and energy rows. Moves are chunked,
+one transaction per chunk, and the run is safe to repeat. Series, weekly
+report stats, goal-progress rebuilds and counter recounts read the
+archive automatically when their range reaches past the cutoff. On
+databases created before the log tables were AUTOINCREMENT, run
+`python -m scripts.migrate_log_ids` once first.
+
+Usage (from the backend directory):
+    python -m scripts.archive_logs                      # rows older than ARCHIVE_HORIZON_DAYS
+    python -m scripts.archive_logs --horizon-days 180
+    python -m scripts.archive_logs --dry-run            # only count what would move
+"""
+import argparse
+import time
+
+from database import SHARD_COUNT, SessionLocal, use_shard
+from services import archive
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--horizon-days", type=int, default=archive.ARCHIVE_HORIZON_DAYS)
+    parser.add_argument("--dry-run", action="store_true", help="count rows without moving them")
+    parser.add_argument("--no-wait", action="store_true",
+                        help="don't wait for app processes to see a raised watermark (only safe with the app stopped)")
+    args = parser.parse_args()
+    if args.horizon_days < 35:
+        parser.error("--horizon-days must be at least 35; goal progress reads the last 30 days from the hot tables")
+
+    cutoff = archive.cutoff_for(args.horizon_days)
+    db = SessionLocal()
+    if args.dry_run:
+        for model in archive.DATE_COLUMNS:
+            count = 0
+            for shard in range(SHARD_COUNT):
+                use_shard(db, shard)
+                count += archive.count_older(db, model, cutoff)
+            print(f"{model.__tablename__}: {count} rows before {cutoff}")
+        db.close()
+        return
+
+    raised = [archive.raise_watermark(db, model, cutoff) for model in archive.DATE_COLUMNS]
+    if any(raised) and not args.no_wait:
+        # Running app processes may hold the old watermark in their cache until it expires
+        print(f"Watermark raised to {cutoff}; waiting {archive.WATERMARK_TTL_SECONDS}s for readers to pick it up.")
+        time.sleep(archive.WATERMARK_TTL_SECONDS)
+    for model in archive.DATE_COLUMNS:
+        moved = 0
+        for shard in range(SHARD_COUNT):
+            use_shard(db, shard)
+            moved += archive.archive_older_than(db, model, cutoff)
+        print(f"{model.__tablename__}: moved {moved} rows before {cutoff}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Fill started_at/ended_at/day on sleep logs stored before sessions were timestamped.
+
+Each legacy row (hot or archived) is placed at the latest occurrence of
+its wake time up to when it was logged. Rows whose times never parsed
+(stored with the old 8 hour default) end when they were logged. Rows
+that have a session but no day get the UTC date it ended on, the
+client's offset being unknown. Weekly snapshots whose sleep moves to
+another week are marked dirty; legacy rows that overlap each other are
+reported, not changed. Safe to re-run. Run
+`python -m scripts.rebuild_goal_progress --fix` and
+`python -m scripts.rebuild_sketches --fix` afterwards.
+
+Usage (from the backend directory):
+    python -m scripts.backfill_sleep_sessions
+"""
+from datetime import timedelta
+
+from sqlalchemy import select, update
+
+from database import SHARD_COUNT, SessionLocal, use_shard
+from models import ARCHIVE_TABLES, SleepLog
+from services import sleep_sessions, weekly_stats
+
+CHUNK = 500
+
+
+def _bounds(row):
+    try:
+        return sleep_sessions.session_bounds(row.sleep_time, row.wake_time, None, row.created_at)
+    except ValueError:
+        return row.created_at - timedelta(hours=row.duration_hours), row.created_at
+
+
+def main():
+    db = SessionLocal()
+    filled = overlapping = 0
+    for shard in range(SHARD_COUNT):
+        use_shard(db, shard)
+        for table in (SleepLog.__table__, ARCHIVE_TABLES[SleepLog]):
+            while True:
+                rows = db.execute(
+                    select(table.c.id, table.c.user_id, table.c.sleep_time, table.c.wake_time,
+                           table.c.duration_hours, table.c.started_at, table.c.ended_at, table.c.created_at)
+                    .where(table.c.day.is_(None))
+                    .order_by(table.c.id)
+                    .limit(CHUNK)
+                ).all()
+                if not rows:
+                    break
+                for row in rows:
+                    if row.ended_at is not None:
+                        started_at, ended_at = row.started_at, row.ended_at
+                    else:
+                        started_at, ended_at = _bounds(row)
+                    day = sleep_sessions.local_day(ended_at)
+                    db.execute(update(table).where(table.c.id == row.id).values(
+                        started_at=started_at, ended_at=ended_at, day=day.isoformat()
+                    ))
+                    if weekly_stats.week_of(day) != weekly_stats.week_of(row.created_at.date()):
+                        weekly_stats.mark_dirty(db, row.user_id, row.created_at.date())
+                        weekly_stats.mark_dirty(db, row.user_id, day)
+                    if row.ended_at is None and table is SleepLog.__table__ and sleep_sessions.find_overlap(
+                        db, row.user_id, started_at, ended_at, exclude_id=row.id
+                    ) is not None:
+                        overlapping += 1
+                db.commit()
+                filled += len(rows)
+    db.close()
+    print(f"{filled} sleep logs dated, {overlapping} overlap an earlier log.")
+
+
+if __name__ == "__main__":
+    main()
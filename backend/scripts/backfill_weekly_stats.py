@@ -0,0 +1,36 @@
+"""Copy the JSON summary_stats of existing weekly reports into weekly_stats.
+
+Run once after deploying the weekly_stats table; reports generated since
+then write their stats there directly. Reports whose summary_stats is
+missing or unreadable are skipped.
+
+Usage (from the backend directory):
+    python -m scripts.backfill_weekly_stats
+"""
+import json
+
+from database import SHARD_COUNT, SessionLocal, use_shard
+from models import WeeklyReport
+from services import weekly_stats
+
+
+def main():
+    db = SessionLocal()
+    copied = skipped = 0
+    for shard in range(SHARD_COUNT):
+        use_shard(db, shard)
+        # Oldest first so the newest report for a week wins
+        for report in db.query(WeeklyReport).order_by(WeeklyReport.created_at):
+            try:
+                weekly_stats.save(db, report.user_id, json.loads(report.summary_stats or ""))
+            except (ValueError, KeyError, TypeError):
+                skipped += 1
+                continue
+            copied += 1
+        db.commit()
+    db.close()
+    print(f"{copied} reports copied, {skipped} skipped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Measure Google login latency against a local stand-in for Google's endpoints.
+
+Logs in through POST /api/auth/google with fresh access tokens, repeated
+access tokens and fresh ID tokens, and prints latency percentiles plus how
+often the stand-in's userinfo and certs endpoints were hit. With the caches
+working, the certs endpoint is fetched once and repeated tokens never
+reach the stand-in.
+
+Usage (from the backend directory):
+    python -m scripts.bench_google_login [--logins 50] [--latency-ms 50]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from scripts.fake_google import FakeGoogle
+
+
+def _percentiles(samples: list[float]) -> str:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"p50 {statistics.median(ordered):6.1f} ms  p95 {p95:6.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=50, help="simulated Google response time")
+    args = parser.parse_args()
+
+    fake = FakeGoogle(latency_seconds=args.latency_ms / 1000).start()
+    os.environ.update(fake.env())
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='fittrack-bench-')}/bench.db"
+
+    from fastapi.testclient import TestClient
+
+    import main as app_main
+
+    names = [f"user{i}" for i in range(args.logins)]
+    scenarios = [
+        ("access token, first login", [f"access-{n}" for n in names]),
+        ("access token, repeated", [f"access-{n}" for n in names]),
+        ("ID token, first login", [fake.id_token(f"id{n}") for n in names]),
+    ]
+
+    with TestClient(app_main.create_app()) as client:
+        for label, tokens in scenarios:
+            before = dict(fake.hits)
+            samples = []
+            for token in tokens:
+                started = time.perf_counter()
+                response = client.post("/api/auth/google", json={"token": token})
+                samples.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, response.text
+            hits = {path: fake.hits[path] - before[path] for path in fake.hits}
+            print(f"{label:28} {_percentiles(samples)}  userinfo hits {hits['/userinfo']:4}  certs hits {hits['/certs']:3}")
+
+        rejected = client.post("/api/auth/google", json={"token": "not-a-token"})
+        print(f"invalid token -> {rejected.status_code}")
+    fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Compare log-insert throughput with and without group commit.
+
+Runs the same workload twice, each in a fresh process and a fresh
+database: --users users POST --writes water logs each from concurrent
+threads against the app in-process, first with GROUP_COMMIT=0 (one
+commit per request) then with GROUP_COMMIT=1. Prints writes/sec and
+latency percentiles for each.
+
+Usage (from the backend directory):
+    python -m scripts.bench_group_commit [--users 16] [--writes 50]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _run_workload(users: int, writes: int) -> dict:
+    from fastapi.testclient import TestClient
+
+    import main as app_main
+
+    with TestClient(app_main.create_app()) as client:
+        headers = []
+        for i in range(users):
+            response = client.post("/api/auth/register", json={
+                "email": f"bench{i}@example.com", "password": "bench-password", "name": f"Bench {i}",
+            })
+            headers.append({"Authorization": f"Bearer {response.json()['access_token']}"})
+
+        def write(user: int) -> list[float]:
+            samples = []
+            for _ in range(writes):
+                started = time.perf_counter()
+                response = client.post("/api/water/", json={"glasses": 1, "date": "2024-01-01"}, headers=headers[user])
+                samples.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, response.text
+            return samples
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=users) as pool:
+            samples = [s for per_user in pool.map(write, range(users)) for s in per_user]
+        elapsed = time.perf_counter() - started
+
+    ordered = sorted(samples)
+    return {
+        "writes_per_sec": len(samples) / elapsed,
+        "p50_ms": statistics.median(ordered),
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=16, help="concurrent writers")
+    parser.add_argument("--writes", type=int, default=50, help="writes per user")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_run_workload(args.users, args.writes)))
+        return
+
+    for group_commit in ("0", "1"):
+        env = dict(
+            os.environ,
+            GROUP_COMMIT=group_commit,
+            DATABASE_URL=f"sqlite:///{tempfile.mkdtemp(prefix='fittrack-bench-')}/bench.db",
+            WEEK_CLOSE_INTERVAL_SECONDS="0",
+        )
+        output = subprocess.run(
+            [sys.executable, "-m", "scripts.bench_group_commit", "--child",
+             "--users", str(args.users), "--writes", str(args.writes)],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        label = "group commit" if group_commit == "1" else "commit per request"
+        print(f"{label:20} {result['writes_per_sec']:8.1f} writes/s  "
+              f"p50 {result['p50_ms']:6.1f} ms  p95 {result['p95_ms']:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
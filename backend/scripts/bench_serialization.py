@@ -0,0 +1,114 @@
+"""Benchmark list-endpoint serialization on a 10k-row response.
+
+Compares the old path (ORM objects -> response_model validation ->
+jsonable_encoder -> json.dumps) with the row path in json_utils
+(column rows -> orjson), then reports gzip/brotli size and time on the
+resulting payload. Runs against a throwaway SQLite database.
+
+Usage (from the backend directory):
+    python -m scripts.bench_serialization [--rows 10000] [--repeat 5]
+"""
+import argparse
+import gzip
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.mkdtemp(prefix="fittrack-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/bench.db"
+
+from fastapi import Response  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from database import SessionLocal, init_db, set_shard  # noqa: E402
+from json_utils import brotli, query_rows, rows_response  # noqa: E402
+from models import User, WorkoutLog  # noqa: E402
+from schemas import WorkoutLogResponse  # noqa: E402
+
+
+def seed(rows: int) -> int:
+    init_db()
+    db = SessionLocal()
+    user = User(email="bench@example.com", name="Bench")
+    db.add(user)
+    db.flush()
+    user_id = user.id
+    set_shard(db, user_id)
+    start = datetime(2024, 1, 1)
+    db.add_all(
+        WorkoutLog(
+            user_id=user_id,
+            workout_type="running",
+            duration_min=30 + i % 45,
+            intensity="moderate",
+            calories_burnt=250.0 + i % 100,
+            notes="Tempo run along the river" if i % 3 == 0 else None,
+            created_at=start + timedelta(hours=i),
+        )
+        for i in range(rows)
+    )
+    db.commit()
+    db.close()
+    return user_id
+
+
+def legacy_path(user_id: int) -> bytes:
+    db = SessionLocal()
+    set_shard(db, user_id)
+    logs = db.query(WorkoutLog).filter(WorkoutLog.user_id == user_id).order_by(WorkoutLog.created_at.desc()).all()
+    validated = TypeAdapter(list[WorkoutLogResponse]).validate_python(logs, from_attributes=True)
+    body = json.dumps(jsonable_encoder(validated)).encode("utf-8")
+    db.close()
+    return body
+
+
+def row_path(user_id: int) -> bytes:
+    db = SessionLocal()
+    set_shard(db, user_id)
+    logs = query_rows(db, WorkoutLog, WorkoutLogResponse).filter(
+        WorkoutLog.user_id == user_id
+    ).order_by(WorkoutLog.created_at.desc())
+    body = rows_response(logs, Response()).body
+    db.close()
+    return body
+
+
+def best_of(fn, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    user_id = seed(args.rows)
+
+    legacy_ms, legacy_body = best_of(lambda: legacy_path(user_id), args.repeat)
+    row_ms, row_body = best_of(lambda: row_path(user_id), args.repeat)
+    assert json.loads(legacy_body) == json.loads(row_body), "row path must produce the same payload"
+
+    print(f"{args.rows} rows, best of {args.repeat}")
+    print(f"  ORM -> Pydantic -> json.dumps : {legacy_ms:8.1f} ms  {len(legacy_body):>10} bytes")
+    print(f"  rows -> orjson                : {row_ms:8.1f} ms  {len(row_body):>10} bytes  ({legacy_ms / row_ms:.1f}x faster)")
+
+    gzip_ms, gzipped = best_of(lambda: gzip.compress(row_body, compresslevel=6), args.repeat)
+    print(f"  gzip level 6                  : {gzip_ms:8.1f} ms  {len(gzipped):>10} bytes")
+    if brotli is not None:
+        br_ms, br_body = best_of(lambda: brotli.compress(row_body, quality=4), args.repeat)
+        print(f"  brotli quality 4              : {br_ms:8.1f} ms  {len(br_body):>10} bytes")
+    else:
+        print("  brotli                        : not installed")
+
+
+if __name__ == "__main__":
+    main()
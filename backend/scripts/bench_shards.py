@@ -0,0 +1,121 @@
+"""Measure concurrent log-insert throughput for several shard counts.
+
+For each --shards value, a fresh set of databases is created and
+--processes worker processes (like separate app workers) each register
+--users users and POST --writes water logs per user from concurrent
+threads, starting together once all are set up. SQLite takes one write
+lock per database file, so with one shard every worker queues on the
+same lock; with more shards, writers for users on different shards
+proceed in parallel (given a core per worker).
+Prints total writes/sec and latency percentiles per shard count.
+
+Usage (from the backend directory):
+    python -m scripts.bench_shards [--shards 1 2 4] [--processes 4] [--users 8] [--writes 50]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _run_worker(worker: int, users: int, writes: int) -> dict:
+    from fastapi.testclient import TestClient
+
+    import main as app_main
+
+    with TestClient(app_main.create_app()) as client:
+        headers = []
+        for i in range(users):
+            response = client.post("/api/auth/register", json={
+                "email": f"bench{worker}-{i}@example.com", "password": "bench-password", "name": f"Bench {i}",
+            })
+            assert response.status_code == 200, response.text
+            headers.append({"Authorization": f"Bearer {response.json()['access_token']}"})
+
+        def write(user: int) -> list[float]:
+            samples = []
+            for _ in range(writes):
+                started = time.perf_counter()
+                response = client.post("/api/water/", json={"glasses": 1, "date": "2024-01-01"}, headers=headers[user])
+                samples.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, response.text
+            return samples
+
+        # Every worker starts writing when the parent says all are ready
+        print("ready", flush=True)
+        sys.stdin.readline()
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=users) as pool:
+            samples = [s for per_user in pool.map(write, range(users)) for s in per_user]
+    return {"started": started, "finished": time.time(), "samples": samples}
+
+
+def _run(shards: int, processes: int, users: int, writes: int) -> dict:
+    directory = tempfile.mkdtemp(prefix="fittrack-bench-")
+    env = dict(
+        os.environ,
+        SHARD_COUNT=str(shards),
+        DATABASE_URL=f"sqlite:///{directory}/bench.db",
+        SHARD_URL_TEMPLATE=f"sqlite:///{directory}/bench.shard{{shard}}.db",
+        WEEK_CLOSE_INTERVAL_SECONDS="0",
+    )
+    env.pop("REPLICA_DATABASE_URL", None)
+    env.pop("REPLICA_SHARD_URL_TEMPLATE", None)
+    subprocess.run([sys.executable, "-m", "scripts.init_db"], env=env, check=True, capture_output=True)
+
+    workers = [
+        subprocess.Popen(
+            [sys.executable, "-m", "scripts.bench_shards", "--worker", str(worker), "--users", str(users),
+             "--writes", str(writes)],
+            env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+        )
+        for worker in range(processes)
+    ]
+    # Start writing only once every worker has registered its users
+    for worker in workers:
+        if worker.stdout.readline().strip() != "ready":
+            raise SystemExit("worker failed during setup")
+    for worker in workers:
+        worker.stdin.write("go\n")
+        worker.stdin.flush()
+    results = []
+    for worker in workers:
+        output, _ = worker.communicate()
+        if worker.returncode != 0:
+            raise SystemExit(f"worker failed with exit code {worker.returncode}")
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    ordered = sorted(s for r in results for s in r["samples"])
+    elapsed = max(r["finished"] for r in results) - min(r["started"] for r in results)
+    return {
+        "writes_per_sec": len(ordered) / elapsed,
+        "p50_ms": statistics.median(ordered),
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4], help="shard counts to compare")
+    parser.add_argument("--processes", type=int, default=4, help="worker processes")
+    parser.add_argument("--users", type=int, default=8, help="users (writer threads) per process")
+    parser.add_argument("--writes", type=int, default=50, help="writes per user")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(_run_worker(args.worker, args.users, args.writes)))
+        return
+
+    for shards in args.shards:
+        result = _run(shards, args.processes, args.users, args.writes)
+        print(f"{shards} shard(s) {result['writes_per_sec']:8.1f} writes/s  "
+              f"p50 {result['p50_ms']:6.1f} ms  p95 {result['p95_ms']:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
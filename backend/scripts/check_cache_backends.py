@@ -0,0 +1,70 @@
+"""Exercise every cache backend, including sharing between processes.
+
+For each backend: set/get/delete, TTL expiry, namespace clear and hit-rate
+stats in this process, then a second process reads what this one wrote
+(skipped for the in-process LRU, which is never shared). The Redis-protocol
+backend runs against the local stand-in from scripts/fake_redis.py.
+
+Usage (from the backend directory):
+    python -m scripts.check_cache_backends
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from cache import LRUCache, RESPCache, SQLiteCache
+from scripts.fake_redis import FakeRedis
+
+_READER = (
+    "import sys; from cache import get_cache; "
+    "print(get_cache().get('check', 'shared'))"
+)
+
+
+def _check(cache, env: dict = None) -> str:
+    cache.set("check", "a", {"value": 1})
+    assert cache.get("check", "a") == {"value": 1}
+    cache.delete("check", "a")
+    assert cache.get("check", "a") is None
+
+    cache.set("check", "short", "x", ttl=0.05)
+    time.sleep(0.1)
+    assert cache.get("check", "short") is None
+
+    cache.set("other", "kept", 1)
+    for i in range(3):
+        cache.set("check", f"k{i}", i)
+    cache.clear("check")
+    assert all(cache.get("check", f"k{i}") is None for i in range(3))
+    assert cache.get("other", "kept") == 1
+
+    shared = "n/a"
+    if env is not None:
+        cache.set("check", "shared", "from another process")
+        shared = subprocess.run(
+            [sys.executable, "-c", _READER], env=dict(os.environ, **env),
+            check=True, capture_output=True, text=True,
+        ).stdout.strip()
+        assert shared == "from another process", shared
+    return f"stats {cache.stats()}  cross-process read: {shared}"
+
+
+def main():
+    print("memory ", _check(LRUCache()))
+
+    path = os.path.join(tempfile.mkdtemp(prefix="fittrack-cache-"), "cache.db")
+    print("sqlite ", _check(SQLiteCache(path), {"CACHE_BACKEND": "sqlite", "CACHE_SQLITE_PATH": path}))
+
+    fake = FakeRedis().start()
+    print("redis  ", _check(RESPCache(fake.url), {"CACHE_BACKEND": "redis", "CACHE_REDIS_URL": fake.url}))
+    fake.stop()
+
+    unreachable = RESPCache("redis://127.0.0.1:1/0", timeout=0.2)
+    assert unreachable.get("check", "a") is None  # degrades to a miss
+    print("unreachable redis server: reads miss, writes skipped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Cold-start budget check: fails when importing the app and building it gets slower.
+
+Runs `import main; main.create_app()` in a fresh interpreter under
+`python -X importtime` and sums the per-module self times. Machine speed
+varies too much between runs for an absolute budget, so each cold start is
+paired with a baseline run that imports only the frameworks the app is
+built on, and the check exits non-zero when the median cold start/baseline
+ratio exceeds the allowed one. The slowest modules are printed so a
+regression can be traced to the import that caused it.
+
+Usage (from the backend directory):
+    python -m scripts.check_import_time [--max-ratio 1.5] [--runs 7] [--top 15]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+DEFAULT_MAX_RATIO = float(os.getenv("IMPORT_TIME_MAX_RATIO", "1.5"))
+DEFAULT_RUNS = 7
+COLD_START = "import main; main.create_app()"
+# What any cold start of the app must import anyway
+BASELINE = "import fastapi, fastapi.openapi.models, pydantic, sqlalchemy.orm"
+
+
+def measure(code: str = COLD_START) -> list[tuple[int, int, str]]:
+    """Return (self_us, cumulative_us, module) for every import done by `code` in a fresh interpreter."""
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=backend_dir,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"Cold start failed:\n{proc.stderr}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.strip()))
+    return rows
+
+
+def _total_ms(rows: list) -> float:
+    return sum(r[0] for r in rows) / 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-ratio", type=float, default=DEFAULT_MAX_RATIO)
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="cold start/baseline pairs to take the median of")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    runs = []
+    for _ in range(max(args.runs, 1)):
+        rows = measure()
+        runs.append((_total_ms(rows) / _total_ms(measure(BASELINE)), rows))
+    ratio = statistics.median(r[0] for r in runs)
+    # Show the run closest to the median
+    rows = min(runs, key=lambda r: abs(r[0] - ratio))[1]
+
+    print("Slowest imports (self time):")
+    for self_us, cumulative_us, name in sorted(rows, reverse=True)[: args.top]:
+        print(f"  {self_us / 1000:8.1f} ms  (cumulative {cumulative_us / 1000:8.1f} ms)  {name}")
+    print(f"Total import time: {_total_ms(rows):.1f} ms")
+    print(f"Cold start/baseline: {ratio:.2f}x, median of {len(runs)} runs (allowed {args.max_ratio:.2f}x)")
+
+    if ratio > args.max_ratio:
+        print("FAIL: cold start is over budget")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Check how sleep clock times become UTC sessions, for clients on and off UTC.
+
+Covers the latest-wake default, explicit nights, clients east and west of
+UTC, clients that send no offset, and the input rejected with a 400.
+
+Usage (from the backend directory):
+    python -m scripts.check_sleep_sessions
+"""
+from datetime import date, datetime, timedelta
+
+from services.sleep_sessions import local_day, session_bounds
+
+IST = timedelta(hours=5, minutes=30)
+PST = timedelta(hours=-8)
+
+
+def _rejected(*args) -> bool:
+    try:
+        session_bounds(*args)
+    except ValueError:
+        return True
+    return False
+
+
+def main():
+    # UTC+5:30 user logging at 07:30 local (02:00 UTC) the night of the 18th, 11 PM to 7 AM
+    now = datetime(2026, 10, 19, 2, 0)
+    expected = (datetime(2026, 10, 18, 17, 30), datetime(2026, 10, 19, 1, 30))
+    assert session_bounds("11:00 PM", "7:00 AM", date(2026, 10, 18), now, IST) == expected
+    assert session_bounds("11:00 PM", "7:00 AM", None, now, IST) == expected
+    # Waking at 5:00 AM local on the 19th is still the 18th in UTC; it counts toward the local day
+    _, ended_at = session_bounds("9:00 PM", "5:00 AM", date(2026, 10, 18), now, IST)
+    assert ended_at == datetime(2026, 10, 18, 23, 30)
+    assert local_day(ended_at, IST) == date(2026, 10, 19)
+    assert local_day(ended_at) == date(2026, 10, 18)
+    # Without an offset the dated log is still accepted (taken as UTC)
+    assert session_bounds("11:00 PM", "7:00 AM", date(2026, 10, 18), now) == (
+        datetime(2026, 10, 18, 23, 0), datetime(2026, 10, 19, 7, 0)
+    )
+
+    # UTC-8 user logging at 07:30 local (15:30 UTC)
+    now = datetime(2026, 10, 19, 15, 30)
+    expected = (datetime(2026, 10, 19, 7, 0), datetime(2026, 10, 19, 15, 0))
+    assert session_bounds("23:00", "07:00", None, now, PST) == expected
+    assert session_bounds("11:00 PM", "7:00 AM", date(2026, 10, 18), now, PST) == expected
+
+    # UTC client: a wake time later today means yesterday's
+    now = datetime(2026, 10, 19, 6, 0)
+    assert session_bounds("10:00 PM", "7:00 AM", None, now, timedelta(0)) == (
+        datetime(2026, 10, 17, 22, 0), datetime(2026, 10, 18, 7, 0)
+    )
+    # Sleep times before noon belong to the night before
+    assert session_bounds("1:00 AM", "9:00 AM", date(2026, 10, 17), now, timedelta(0))[0] == datetime(2026, 10, 18, 1, 0)
+
+    assert _rejected("banana", "7:00 AM", None, now, timedelta(0))
+    assert _rejected("7:00", "7:00 AM", None, now, timedelta(0))
+    # Ending in the future: tonight for a known offset, beyond any offset when unknown
+    assert _rejected("11:00 PM", "7:00 AM", date(2026, 10, 19), now, IST)
+    assert _rejected("11:00 PM", "7:00 AM", date(2026, 10, 20), now)
+    print("sleep session checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""Snapshot ended weeks into weekly_stats and refresh snapshots marked dirty.
+
+The app does this on a timer (WEEK_CLOSE_INTERVAL_SECONDS); run this from
+cron instead when the in-process scheduler is disabled, or once with a
+larger --weeks to backfill history.
+
+Usage (from the backend directory):
+    python -m scripts.close_weeks [--weeks 12]
+"""
+import argparse
+
+from database import SessionLocal
+from services.weekly_stats import WEEK_CLOSE_BACKFILL_WEEKS, close_due_weeks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--weeks", type=int, default=WEEK_CLOSE_BACKFILL_WEEKS, help="ended weeks to make sure are closed")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    result = close_due_weeks(db, backfill_weeks=args.weeks)
+    db.close()
+    print(f"{result['closed']} snapshots closed, {result['refreshed']} dirty snapshots refreshed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Local stand-in for Google's userinfo and certs endpoints.
+
+Serves, on 127.0.0.1:
+    GET /userinfo   200 with a profile for "Bearer access-<name>" tokens, 401 otherwise
+    GET /certs      the signing certificate, with Cache-Control: max-age
+
+`FakeGoogle.id_token(name)` mints ID tokens signed with the served key.
+Point the app at it with GOOGLE_USERINFO_URL / GOOGLE_CERTS_URL /
+GOOGLE_CLIENT_ID (see `env()`) before importing it.
+"""
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CLIENT_ID = "fittrack-local.apps.googleusercontent.com"
+KEY_ID = "fake-key-1"
+
+
+def _make_key_and_cert():
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "fake-google")])
+    now = datetime.utcnow()
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(days=1))
+        .not_valid_after(now + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    key_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    return key_pem, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+class FakeGoogle:
+    def __init__(self, latency_seconds: float = 0.05, certs_max_age: int = 3600):
+        self.latency_seconds = latency_seconds
+        self.certs_max_age = certs_max_age
+        self.hits = {"/userinfo": 0, "/certs": 0}
+        self._key_pem, self._cert_pem = _make_key_and_cert()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def env(self) -> dict:
+        return {
+            "GOOGLE_USERINFO_URL": f"{self.base_url}/userinfo",
+            "GOOGLE_CERTS_URL": f"{self.base_url}/certs",
+            "GOOGLE_CLIENT_ID": CLIENT_ID,
+        }
+
+    def start(self) -> "FakeGoogle":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def id_token(self, name: str) -> str:
+        from google.auth import crypt, jwt
+
+        now = int(time.time())
+        payload = {
+            "iss": "https://accounts.google.com",
+            "aud": CLIENT_ID,
+            "sub": f"google-{name}",
+            "email": f"{name}@example.com",
+            "name": name.title(),
+            "iat": now,
+            "exp": now + 3600,
+        }
+        signer = crypt.RSASigner.from_string(self._key_pem, key_id=KEY_ID)
+        return jwt.encode(signer, payload).decode()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: dict, headers: dict = None):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                time.sleep(fake.latency_seconds)
+                if self.path in fake.hits:
+                    fake.hits[self.path] += 1
+                if self.path == "/certs":
+                    self._send(200, {KEY_ID: fake._cert_pem},
+                               {"Cache-Control": f"public, max-age={fake.certs_max_age}"})
+                elif self.path == "/userinfo":
+                    auth = self.headers.get("Authorization", "")
+                    token = auth.removeprefix("Bearer ")
+                    if not token.startswith("access-"):
+                        self._send(401, {"error": "invalid_token"})
+                        return
+                    name = token[len("access-"):]
+                    self._send(200, {"sub": f"google-{name}", "email": f"{name}@example.com", "name": name.title()})
+                else:
+                    self._send(404, {"error": "not_found"})
+
+        return Handler
@@ -0,0 +1,104 @@
+"""Local stand-in for the OpenAI chat completions endpoint.
+
+Serves, on 127.0.0.1:
+    POST /v1/chat/completions   a canned reply after a simulated model latency
+
+Requests with response_format json_object get a batch reply covering
+every "- id N:" entry in the prompt, so batch analysis parses. Usage
+token counts are reported so the app's token budget keeps working.
+Point the app at it with OPENAI_BASE_URL / OPENAI_API_KEY (see `env()`)
+before it builds its client.
+"""
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENTRY_ID = re.compile(r"^- id (\d+):", re.MULTILINE)
+REPLY = (
+    "## Summary\n\nSolid effort overall. 👍\n\n"
+    "- Keep a consistent schedule\n- Stay hydrated\n- Add a short walk after meals\n"
+)
+
+
+class FakeOpenAI:
+    def __init__(self, latency_seconds: float = 0.8, jitter: float = 0.25):
+        self.latency_seconds = latency_seconds
+        self.jitter = jitter
+        self.hits = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def env(self) -> dict:
+        return {"OPENAI_BASE_URL": self.base_url, "OPENAI_API_KEY": "sk-fake-local"}
+
+    def start(self) -> "FakeOpenAI":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reply(self, request: dict) -> str:
+        if (request.get("response_format") or {}).get("type") == "json_object":
+            prompt = request["messages"][-1]["content"]
+            return json.dumps({"analyses": [{"id": int(i), "analysis": REPLY} for i in ENTRY_ID.findall(prompt)]})
+        return REPLY
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path.rstrip("/") != "/v1/chat/completions":
+                    self._send(404, {"error": {"message": "not found"}})
+                    return
+                with fake._lock:
+                    fake.hits += 1
+                spread = fake.latency_seconds * fake.jitter
+                time.sleep(max(0.0, fake.latency_seconds + random.uniform(-spread, spread)))
+                content = fake.reply(body)
+                prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+                completion_tokens = len(content) // 4
+                self._send(200, {
+                    "id": f"chatcmpl-fake-{fake.hits}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "fake"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                    },
+                })
+
+            def _send(self, status: int, body: dict):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
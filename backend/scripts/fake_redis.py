@@ -0,0 +1,138 @@
+"""Local stand-in for a Redis server, enough for the cache's RESP backend.
+
+Supports PING, AUTH, SELECT, GET, SET (with EX/PX), DEL, SADD, SREM and
+SMEMBERS, keeping everything in memory. Use it from code via
+`FakeRedis().start()` / `.url`, or run it for a multi-worker dev setup:
+
+    python -m scripts.fake_redis --port 6379
+    CACHE_BACKEND=redis uvicorn main:app --workers 4
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class _Status(str):
+    """A simple-string reply (+OK), as opposed to a bulk string."""
+
+
+class FakeRedis:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self._data: dict[str, tuple[object, float]] = {}  # key -> (str or set, expires_at or 0)
+        self._lock = threading.Lock()
+        self.commands = 0
+        self._server = socketserver.ThreadingTCPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"redis://{host}:{port}/0"
+
+    def start(self) -> "FakeRedis":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _live(self, key: str):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at and expires_at <= time.time():
+            del self._data[key]
+            return None
+        return value
+
+    def execute(self, name: str, args: list[str]):
+        self.commands += 1
+        with self._lock:
+            if name in ("PING", "AUTH", "SELECT"):
+                return _Status("PONG" if name == "PING" else "OK")
+            if name == "GET":
+                value = self._live(args[0])
+                return value if isinstance(value, str) or value is None else ValueError("WRONGTYPE")
+            if name == "SET":
+                expires_at = 0.0
+                options = [a.upper() for a in args[2:]]
+                if "PX" in options:
+                    expires_at = time.time() + int(args[2 + options.index("PX") + 1]) / 1000
+                elif "EX" in options:
+                    expires_at = time.time() + int(args[2 + options.index("EX") + 1])
+                self._data[args[0]] = (args[1], expires_at)
+                return _Status("OK")
+            if name == "DEL":
+                return sum(self._data.pop(key, None) is not None for key in args)
+            if name in ("SADD", "SREM"):
+                members = self._live(args[0])
+                if members is None:
+                    members = set()
+                    self._data[args[0]] = (members, 0.0)
+                before = len(members)
+                if name == "SADD":
+                    members.update(args[1:])
+                else:
+                    members.difference_update(args[1:])
+                return abs(len(members) - before)
+            if name == "SMEMBERS":
+                return sorted(self._live(args[0]) or ())
+            return ValueError(f"ERR unknown command '{name}'")
+
+    def _handler(self):
+        fake = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def _read_command(self):
+                line = self.rfile.readline()
+                if not line:
+                    return None
+                count = int(line[1:-2])
+                args = []
+                for _ in range(count):
+                    length = int(self.rfile.readline()[1:-2])
+                    args.append(self.rfile.read(length + 2)[:-2].decode("utf-8"))
+                return args
+
+            def _encode(self, reply) -> bytes:
+                if isinstance(reply, ValueError):
+                    return f"-{reply}\r\n".encode()
+                if isinstance(reply, _Status):
+                    return f"+{reply}\r\n".encode()
+                if isinstance(reply, int):
+                    return f":{reply}\r\n".encode()
+                if reply is None:
+                    return b"$-1\r\n"
+                if isinstance(reply, list):
+                    return f"*{len(reply)}\r\n".encode() + b"".join(self._encode(item) for item in reply)
+                data = reply.encode("utf-8")
+                return b"$%d\r\n%s\r\n" % (len(data), data)
+
+            def handle(self):
+                while True:
+                    args = self._read_command()
+                    if not args:
+                        return
+                    reply = fake.execute(args[0].upper(), args[1:])
+                    self.wfile.write(self._encode(reply))
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+
+    fake = FakeRedis(args.host, args.port)
+    print(f"Fake Redis listening on {fake.url}")
+    fake._server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+"""Create the database schema ahead of starting the API.
+
+Usage (from the backend directory):
+    python -m scripts.init_db
+"""
+from database import init_db, DATABASE_URL, SHARD_COUNT
+
+if __name__ == "__main__":
+    init_db()
+    print(f"Schema ready at {DATABASE_URL}" + (f" and {SHARD_COUNT} shards" if SHARD_COUNT > 1 else ""))
@@ -0,0 +1,370 @@
+"""End-to-end load test against a real server process, fully offline.
+
+Starts local stand-ins for Google (scripts/fake_google.py) and the OpenAI
+API (scripts/fake_openai.py), then the app under uvicorn on a fresh
+database. --users virtual users sign up (some through Google), then for
+--duration seconds each repeatedly picks an action from the --mix
+weights, pausing --think-ms between actions:
+
+    login       POST /api/auth/login (bcrypt) or /api/auth/google
+    log         POST a sleep, steps, water or workout log
+    dashboard   GET /api/dashboard/today or /api/bootstrap/
+    energy      GET /api/energy/
+    list        GET one of the log lists
+    report      POST /api/reports/weekly (LLM)
+    analyze     POST /api/sleep/analyze for the user's latest night (LLM)
+
+Prints requests/sec, latency percentiles and error rates per route; 429s
+from the LLM governor are counted as shed rather than errors. Each run is
+saved as JSON under --runs-dir, and --compare prints the change from an
+earlier run (a path, or "latest").
+
+Usage (from the backend directory):
+    python -m scripts.load_test [--users 50] [--duration 60] [--workers 1]
+    python -m scripts.load_test --mix "log=50,dashboard=30,list=20" --label writes-heavy
+    python -m scripts.load_test --compare latest
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+import httpx
+
+from scripts.fake_google import FakeGoogle
+from scripts.fake_openai import FakeOpenAI
+
+DEFAULT_MIX = "login=5,log=35,dashboard=25,energy=10,list=15,report=5,analyze=5"
+ACTIONS = ("login", "log", "dashboard", "energy", "list", "report", "analyze")
+LOG_KINDS = ("sleep", "steps", "water", "workout")
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ACTIONS:
+            raise ValueError(f"unknown action {name!r}; choose from {', '.join(ACTIONS)}")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise ValueError("the mix needs at least one positive weight")
+    return mix
+
+
+class Recorder:
+    """Latency samples and outcomes per route, shared by every virtual user."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: dict[str, list[float]] = {}
+        self.outcomes: dict[str, dict[str, int]] = {}
+
+    def add(self, route: str, elapsed_ms: float, outcome: str):
+        with self._lock:
+            self.samples.setdefault(route, []).append(elapsed_ms)
+            counts = self.outcomes.setdefault(route, {"ok": 0, "shed": 0, "error": 0})
+            counts[outcome] += 1
+
+    def summary(self, elapsed_seconds: float) -> dict[str, dict]:
+        routes = {}
+        for route, samples in sorted(self.samples.items()):
+            ordered = sorted(samples)
+            counts = self.outcomes[route]
+
+            def pct(p: float) -> float:
+                return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 1)
+
+            routes[route] = {
+                "requests": len(ordered),
+                "rps": round(len(ordered) / elapsed_seconds, 2),
+                "p50_ms": round(statistics.median(ordered), 1),
+                "p95_ms": pct(0.95),
+                "p99_ms": pct(0.99),
+                "max_ms": round(ordered[-1], 1),
+                "error_rate": round(counts["error"] / len(ordered), 4),
+                "shed_rate": round(counts["shed"] / len(ordered), 4),
+            }
+        return routes
+
+
+class VirtualUser:
+    def __init__(self, index: int, base_url: str, recorder: Recorder, google: bool, fake: FakeGoogle):
+        self.index = index
+        self.recorder = recorder
+        self.google = google
+        self.fake = fake
+        self.client = httpx.Client(base_url=base_url, timeout=60)
+        self.email = f"load{index}@example.com"
+        self.password = "load-test-password"
+        self.headers: dict = {}
+        self.sleep_log_id = None
+        self.nights_logged = 0  # each sleep log takes an earlier night, so sessions never overlap
+
+    def call(self, method: str, route: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = self.client.request(method, route, headers=self.headers, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.add(f"{method} {route}", (time.perf_counter() - started) * 1000, "error")
+            return None
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        outcome = "shed" if response.status_code == 429 else "ok" if response.status_code < 400 else "error"
+        self.recorder.add(f"{method} {route}", elapsed_ms, outcome)
+        return response
+
+    def sign_up(self) -> bool:
+        if self.google:
+            response = self.call("POST", "/api/auth/google", json={"token": f"access-load{self.index}"})
+        else:
+            response = self.call("POST", "/api/auth/register", json={
+                "email": self.email, "password": self.password, "name": f"Load {self.index}",
+            })
+        if response is None or response.status_code != 200:
+            return False
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        self.call("POST", "/api/bmi/", json={"height_cm": 160 + self.index % 30, "weight_kg": 55 + self.index % 40})
+        self.log("sleep")
+        return True
+
+    def login(self):
+        if self.google:
+            # Alternate cached access tokens with freshly signed ID tokens
+            token = f"access-load{self.index}" if random.random() < 0.5 else self.fake.id_token(f"load{self.index}")
+            self.call("POST", "/api/auth/google", json={"token": token})
+        else:
+            self.call("POST", "/api/auth/login", json={"email": self.email, "password": self.password})
+
+    def log(self, kind: Optional[str] = None):
+        kind = kind or random.choice(LOG_KINDS)
+        day = (date.today() - timedelta(days=random.randint(0, 20))).isoformat()
+        if kind == "sleep":
+            response = self.call("POST", "/api/sleep/", json={
+                "sleep_time": f"{random.randint(9, 11)}:{random.choice(['00', '30'])} PM",
+                "wake_time": f"{random.randint(5, 8)}:{random.choice(['00', '15', '45'])} AM",
+                "date": (datetime.utcnow().date() - timedelta(days=2 + self.nights_logged)).isoformat(),
+            })
+            self.nights_logged += 1
+            if response is not None and response.status_code == 200:
+                self.sleep_log_id = response.json()["id"]
+        elif kind == "steps":
+            self.call("POST", "/api/steps/", json={"steps": random.randint(1000, 15000), "date": day})
+        elif kind == "water":
+            self.call("POST", "/api/water/", json={"glasses": random.randint(1, 3), "date": day})
+        else:
+            self.call("POST", "/api/workout/", json={
+                "workout_type": random.choice(["walking", "running", "strength", "misc"]),
+                "duration_min": random.randint(15, 90),
+                "intensity": random.choice(["low", "moderate", "high"]),
+            })
+
+    def act(self, action: str):
+        if action == "login":
+            self.login()
+        elif action == "log":
+            self.log()
+        elif action == "dashboard":
+            route = random.choice(["/api/dashboard/today", "/api/bootstrap/"])
+            self.call("GET", route)
+        elif action == "energy":
+            self.call("GET", "/api/energy/")
+        elif action == "list":
+            self.call("GET", f"/api/{random.choice(LOG_KINDS)}/")
+        elif action == "report":
+            self.call("POST", "/api/reports/weekly")
+        elif action == "analyze" and self.sleep_log_id is not None:
+            self.call("POST", "/api/sleep/analyze", json={"sleep_log_id": self.sleep_log_id})
+
+    def run(self, mix: dict[str, float], deadline: float, think_seconds: float):
+        actions, weights = zip(*mix.items())
+        while time.monotonic() < deadline:
+            self.act(random.choices(actions, weights)[0])
+            if think_seconds:
+                time.sleep(random.uniform(0.5, 1.5) * think_seconds)
+        self.client.close()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(env: dict, port: int, workers: int) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=env, cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"server exited during startup:\n{server.stderr.read()}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit("server did not start within 60s")
+
+
+def _print_summary(routes: dict[str, dict]):
+    print(f"{'route':34} {'reqs':>6} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'err%':>6} {'shed%':>6}")
+    for route, s in routes.items():
+        print(f"{route:34} {s['requests']:6} {s['rps']:7.2f} {s['p50_ms']:8.1f} {s['p95_ms']:8.1f} "
+              f"{s['p99_ms']:8.1f} {s['max_ms']:8.1f} {s['error_rate'] * 100:6.2f} {s['shed_rate'] * 100:6.2f}")
+
+
+def _print_comparison(current: dict, baseline: dict, path: str):
+    print(f"\nChange from {os.path.basename(path)} ({baseline['label'] or 'unlabelled'}, {baseline['started_at']}):")
+    print(f"{'route':34} {'req/s':>16} {'p95 ms':>18} {'err%':>14}")
+    for route, s in current["routes"].items():
+        before = baseline["routes"].get(route)
+        if before is None:
+            print(f"{route:34} (new route)")
+            continue
+        p95_change = (s["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0.0
+        print(f"{route:34} {before['rps']:7.2f} -> {s['rps']:6.2f} "
+              f"{before['p95_ms']:7.1f} -> {s['p95_ms']:7.1f} ({p95_change:+.0f}%)"
+              f" {before['error_rate'] * 100:5.2f} -> {s['error_rate'] * 100:5.2f}")
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=60, help="seconds of mixed traffic after sign-up")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="action=weight pairs (default: %(default)s)")
+    parser.add_argument("--think-ms", type=float, default=200, help="mean pause between a user's actions")
+    parser.add_argument("--google-share", type=float, default=0.2, help="fraction of users signing in with Google")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--llm-latency-ms", type=float, default=800, help="simulated model response time")
+    parser.add_argument("--google-latency-ms", type=float, default=50, help="simulated Google response time")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE",
+                        help="extra app setting, e.g. --env GROUP_COMMIT=1 (repeatable)")
+    parser.add_argument("--label", default="", help="name stored with the run")
+    parser.add_argument("--runs-dir", default="./load_runs", help="where runs are saved")
+    parser.add_argument("--compare", help='earlier run to compare against: a path, or "latest"')
+    parser.add_argument("--seed", type=int, help="random seed for a repeatable action sequence")
+    args = parser.parse_args()
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    baseline_path = args.compare
+    if baseline_path == "latest":
+        saved = sorted(glob.glob(os.path.join(args.runs_dir, "*.json")))
+        if not saved:
+            parser.error(f"no saved runs in {args.runs_dir} to compare against")
+        baseline_path = saved[-1]
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    google = FakeGoogle(latency_seconds=args.google_latency_ms / 1000).start()
+    llm = FakeOpenAI(latency_seconds=args.llm_latency_ms / 1000).start()
+    directory = tempfile.mkdtemp(prefix="fittrack-load-")
+    env = dict(
+        os.environ,
+        **google.env(),
+        **llm.env(),
+        DATABASE_URL=f"sqlite:///{directory}/load.db",
+        SHARD_URL_TEMPLATE=f"sqlite:///{directory}/load.shard{{shard}}.db",
+        CACHE_SQLITE_PATH=f"{directory}/cache.db",
+        WEEK_CLOSE_INTERVAL_SECONDS="0",
+    )
+    for setting in args.env:
+        name, _, value = setting.partition("=")
+        env[name] = value
+    port = _free_port()
+    server = _start_server(env, port, args.workers)
+
+    recorder = Recorder()
+    users = [
+        VirtualUser(i, f"http://127.0.0.1:{port}", recorder, random.random() < args.google_share, google)
+        for i in range(args.users)
+    ]
+    started_at = datetime.utcnow()
+    try:
+        print(f"Signing up {args.users} users...")
+        ready = []
+        lock = threading.Lock()
+
+        def sign_up(user: VirtualUser):
+            if user.sign_up():
+                with lock:
+                    ready.append(user)
+
+        threads = [threading.Thread(target=sign_up, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        print(f"Running mixed traffic from {len(ready)} users for {args.duration:.0f}s...")
+        began = time.monotonic()
+        deadline = began + args.duration
+        threads = [
+            threading.Thread(target=user.run, args=(mix, deadline, args.think_ms / 1000))
+            for user in ready
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Sign-up traffic counts toward its routes; rates are over the mixed phase
+        elapsed = time.monotonic() - began
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        google.stop()
+        llm.stop()
+
+    run = {
+        "label": args.label,
+        "started_at": started_at.isoformat(),
+        "revision": _git_revision(),
+        "config": {
+            "users": args.users, "duration": args.duration, "mix": mix, "think_ms": args.think_ms,
+            "google_share": args.google_share, "workers": args.workers, "llm_latency_ms": args.llm_latency_ms,
+            "google_latency_ms": args.google_latency_ms, "env": args.env, "seed": args.seed,
+        },
+        "elapsed_seconds": round(elapsed, 2),
+        "llm_calls": llm.hits,
+        "routes": recorder.summary(elapsed),
+    }
+    print()
+    _print_summary(run["routes"])
+
+    os.makedirs(args.runs_dir, exist_ok=True)
+    name = started_at.strftime("%Y%m%dT%H%M%S") + (f"-{args.label}" if args.label else "")
+    path = os.path.join(args.runs_dir, f"{name}.json")
+    with open(path, "w") as f:
+        json.dump(run, f, indent=2)
+    print(f"\nSaved {path}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            _print_comparison(run, json.load(f), baseline_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Move AI analyses out of the legacy sleep_logs/workout_logs.ai_analysis columns.
+
+Each analysis is compressed into log_analyses and the legacy column is
+cleared, a chunk per transaction. Safe to re-run. Pass --vacuum to rebuild
+the database file afterwards so the log tables actually shrink.
+
+Usage (from the backend directory):
+    python -m scripts.migrate_analyses [--vacuum]
+"""
+import argparse
+
+from sqlalchemy import text
+
+from database import SHARD_COUNT, SessionLocal, shard_engines, use_shard
+from services.analysis_store import LOG_MODELS, save
+
+CHUNK = 500
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the database (every shard) when done")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    for shard in range(SHARD_COUNT):
+        use_shard(db, shard)
+        for log_type, model in LOG_MODELS.items():
+            moved = 0
+            while True:
+                rows = (
+                    db.query(model.id, model.ai_analysis)
+                    .filter(model.ai_analysis.isnot(None))
+                    .limit(CHUNK)
+                    .all()
+                )
+                if not rows:
+                    break
+                for log_id, analysis in rows:
+                    save(db, log_type, log_id, analysis)
+                db.query(model).filter(model.id.in_([r.id for r in rows])).update(
+                    {model.ai_analysis: None}, synchronize_session=False
+                )
+                db.commit()
+                moved += len(rows)
+            print(f"{log_type}: moved {moved} analyses" + (f" on shard {shard}" if SHARD_COUNT > 1 else ""))
+    db.close()
+
+    if args.vacuum:
+        for shard_engine in shard_engines:
+            with shard_engine.connect() as conn:
+                conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+        print("Vacuumed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Rebuild log tables created before they were AUTOINCREMENT, so ids are never reused.
+
+Archived rows keep their ids, and a plain INTEGER PRIMARY KEY hands out
+max(id) + 1: once a hot table (or a shard's) empties, new rows would get
+ids that are already in the archive, in log_analyses and in change_log.
+Each old table is copied into an AUTOINCREMENT one in a single
+transaction, and its sequence starts above every hot and archived id.
+Safe to re-run; stop the API first.
+
+Usage (from the backend directory):
+    python -m scripts.migrate_log_ids
+"""
+from sqlalchemy import func, select, text
+from sqlalchemy.schema import CreateTable
+
+from database import init_db, shard_engines
+from models import ARCHIVE_TABLES
+
+
+def _migrate(conn, model) -> bool:
+    table = model.__table__
+    ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                       {"name": table.name}).scalar()
+    if ddl is None or "AUTOINCREMENT" in ddl.upper():
+        return False
+
+    staging = f"{table.name}_rebuild"
+    create = str(CreateTable(table).compile(dialect=conn.dialect))
+    conn.execute(text(create.replace(f"CREATE TABLE {table.name} ", f"CREATE TABLE {staging} ", 1)))
+    columns = ", ".join(c.name for c in table.columns)
+    conn.execute(text(f"INSERT INTO {staging} ({columns}) SELECT {columns} FROM {table.name}"))
+    conn.execute(text(f"DROP TABLE {table.name}"))
+    conn.execute(text(f"ALTER TABLE {staging} RENAME TO {table.name}"))
+    for index in table.indexes:
+        index.create(bind=conn)
+
+    highest = max(
+        conn.execute(select(func.max(table.c.id))).scalar() or 0,
+        conn.execute(select(func.max(ARCHIVE_TABLES[model].c.id))).scalar() or 0,
+    )
+    conn.execute(text("DELETE FROM sqlite_sequence WHERE name = :name"), {"name": table.name})
+    conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"),
+                 {"name": table.name, "seq": highest})
+    return True
+
+
+def main():
+    init_db()  # adds any columns introduced since, so the copy has somewhere to put them
+    for shard, shard_engine in enumerate(shard_engines):
+        with shard_engine.begin() as conn:
+            rebuilt = [model.__tablename__ for model in ARCHIVE_TABLES if _migrate(conn, model)]
+        where = f" on shard {shard}" if len(shard_engines) > 1 else ""
+        print(f"Rebuilt {', '.join(rebuilt)}{where}." if rebuilt else f"Nothing to rebuild{where}.")
+
+
+if __name__ == "__main__":
+    main()
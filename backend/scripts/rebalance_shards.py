@@ -0,0 +1,162 @@
+"""Move users' rows to the shard they belong to after SHARD_COUNT changes.
+
+Run with the app stopped, with the new SHARD_COUNT in the environment and
+the count the data was written under as --from-count (1 means everything
+is still in DATABASE_URL). Each moved user is copied in one transaction on
+the target shard, then deleted from the old one; the run is safe to repeat
+if interrupted.
+
+Moved rows get new ids on the target shard (analyses follow their logs),
+archived rows land back in the hot tables until the next
+`python -m scripts.archive_logs`, and the user's change log is dropped.
+Sync cursors name the shard layout, so every client does one full sync
+after a rebalance. Population sketches are per shard and not moved; run
+`python -m scripts.rebuild_sketches --fix` afterwards.
+
+Usage (from the backend directory):
+    SHARD_COUNT=4 python -m scripts.rebalance_shards --from-count 1 --dry-run
+    SHARD_COUNT=4 python -m scripts.rebalance_shards --from-count 1
+"""
+import argparse
+
+from sqlalchemy import create_engine, delete, insert, select
+
+import models
+from database import (
+    SHARD_COUNT, engine, init_db, shard_engines, shard_for, shard_url, sharded_tables,
+)
+from etag_utils import bump_data_version_by_id
+from services.analysis_store import LOG_MODELS
+
+CHUNK = 500
+
+# archive table -> the hot table its rows are copied back into
+HOT_TABLE = {archive: model.__table__ for model, archive in models.ARCHIVE_TABLES.items()}
+# hot table name -> log_type of its analyses
+ANALYZED = {model.__tablename__: log_type for log_type, model in LOG_MODELS.items()}
+# tables not copied: the change log restarts, analyses are keyed by log id rather than user,
+# and sketches cover a whole shard (rebuilt afterwards)
+SKIPPED = {models.ChangeLog.__tablename__, models.LogAnalysis.__tablename__, models.MetricSketch.__tablename__}
+
+
+def _engines(from_count: int) -> tuple[list, list]:
+    """(old layout engines, new layout engines), sharing engines for the same database."""
+    by_url = {shard_url(n): shard_engines[n] for n in range(SHARD_COUNT)}
+    by_url.setdefault(shard_url(0, 1), engine)
+    old = []
+    for n in range(from_count):
+        url = shard_url(n, from_count)
+        if url not in by_url:
+            by_url[url] = create_engine(url)
+        old.append(by_url[url])
+    return old, shard_engines
+
+
+def _user_rows(conn, user_id: int) -> dict:
+    """The user's rows per copied table, archive tables included."""
+    return {
+        table: [dict(row) for row in conn.execute(select(table).where(table.c.user_id == user_id)).mappings()]
+        for table in sharded_tables()
+        if table.name not in SKIPPED
+    }
+
+
+def _log_ids(conn, user_id: int) -> dict[str, list[int]]:
+    """log_type -> ids of the user's analyzable logs, hot and archived."""
+    ids: dict[str, list[int]] = {}
+    for log_type, model in LOG_MODELS.items():
+        for table in (model.__table__, models.ARCHIVE_TABLES[model]):
+            ids.setdefault(log_type, []).extend(
+                row[0] for row in conn.execute(select(table.c.id).where(table.c.user_id == user_id))
+            )
+    return ids
+
+
+def _analyses(conn, log_ids: dict[str, list[int]]) -> list[dict]:
+    analyses = models.LogAnalysis.__table__
+    found = []
+    for log_type, ids in log_ids.items():
+        for start in range(0, len(ids), CHUNK):
+            found.extend(dict(row) for row in conn.execute(select(analyses).where(
+                analyses.c.log_type == log_type, analyses.c.log_id.in_(ids[start:start + CHUNK])
+            )).mappings())
+    return found
+
+
+def _delete_user(conn, user_id: int) -> None:
+    analyses = models.LogAnalysis.__table__
+    for log_type, ids in _log_ids(conn, user_id).items():
+        for start in range(0, len(ids), CHUNK):
+            conn.execute(delete(analyses).where(
+                analyses.c.log_type == log_type, analyses.c.log_id.in_(ids[start:start + CHUNK])
+            ))
+    for table in reversed(sharded_tables()):
+        if table.name not in (analyses.name, models.MetricSketch.__tablename__):
+            conn.execute(delete(table).where(table.c.user_id == user_id))
+
+
+def _copy_user(conn, user_id: int, rows: dict, analyses: list[dict]) -> None:
+    """Insert the rows on the target shard with fresh ids and remap analyses to them."""
+    new_ids: dict[tuple[str, int], int] = {}  # (log_type, old id) -> new id
+    for table, table_rows in rows.items():
+        target = HOT_TABLE.get(table, table)
+        log_type = ANALYZED.get(target.name)
+        for row in table_rows:
+            if "id" in target.c:
+                old_id = row.pop("id")
+                new_id = conn.execute(insert(target).values(**row).returning(target.c.id)).scalar_one()
+                if log_type is not None:
+                    new_ids[(log_type, old_id)] = new_id
+            else:
+                conn.execute(insert(target).values(**row))
+    for analysis in analyses:
+        new_id = new_ids.get((analysis["log_type"], analysis["log_id"]))
+        if new_id is not None:
+            analysis.pop("id")
+            conn.execute(insert(models.LogAnalysis.__table__).values(**{**analysis, "log_id": new_id}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--from-count", type=int, required=True, help="the SHARD_COUNT the data was written under")
+    parser.add_argument("--dry-run", action="store_true", help="only report which users would move")
+    args = parser.parse_args()
+    if args.from_count < 1:
+        parser.error("--from-count must be at least 1")
+
+    init_db()
+    old_engines, new_engines = _engines(args.from_count)
+    with engine.connect() as conn:
+        user_ids = [row[0] for row in conn.execute(select(models.User.id).order_by(models.User.id))]
+
+    moved = skipped = 0
+    for user_id in user_ids:
+        source = old_engines[shard_for(user_id, args.from_count)]
+        target = new_engines[shard_for(user_id)]
+        if source is target:
+            continue
+        with source.connect() as conn:
+            rows = _user_rows(conn, user_id)
+            analyses = _analyses(conn, _log_ids(conn, user_id))
+        if not any(rows.values()):
+            skipped += 1  # nothing left on the old shard: never written, or already moved
+            continue
+        print(f"user {user_id}: {sum(map(len, rows.values()))} rows, {len(analyses)} analyses "
+              f"-> {target.url.database}")
+        moved += 1
+        if args.dry_run:
+            continue
+        with target.begin() as conn:
+            _delete_user(conn, user_id)  # leftovers of an interrupted run
+            _copy_user(conn, user_id, rows, analyses)
+            # Row ids changed, so cached ETags must not match any more
+            bump_data_version_by_id(conn, user_id)
+        with source.begin() as conn:
+            _delete_user(conn, user_id)
+
+    action = "would move" if args.dry_run else "moved"
+    print(f"{moved} users {action}, {skipped} without rows on their old shard.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Verify (and optionally repair) the goal streak/rolling-sum state against the raw logs.
+
+Usage (from the backend directory):
+    python -m scripts.rebuild_goal_progress            # report drift only
+    python -m scripts.rebuild_goal_progress --fix      # overwrite drifted rows
+    python -m scripts.rebuild_goal_progress --user 42  # a single user
+"""
+import argparse
+import json
+
+from database import SessionLocal, set_shard
+from models import GoalProgress, User
+from services import goal_progress
+
+
+def _mismatches(stored: GoalProgress, rebuilt: GoalProgress) -> list[str]:
+    problems = []
+    stored_ring = goal_progress._ring(stored)
+    rebuilt_ring = goal_progress._ring(rebuilt)
+    if stored.anchor_day != rebuilt.anchor_day:
+        problems.append(f"anchor_day {stored.anchor_day} != {rebuilt.anchor_day}")
+    elif any(abs(a - b) > 1e-6 for a, b in zip(stored_ring, rebuilt_ring)):
+        problems.append("daily totals differ")
+    if (stored.current_streak or 0) != rebuilt.current_streak:
+        problems.append(f"current_streak {stored.current_streak} != {rebuilt.current_streak}")
+    if stored.last_hit_day != rebuilt.last_hit_day:
+        problems.append(f"last_hit_day {stored.last_hit_day} != {rebuilt.last_hit_day}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fix", action="store_true", help="write the rebuilt state for drifted rows")
+    parser.add_argument("--user", type=int, help="only check this user id")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    users = db.query(User.id)
+    if args.user is not None:
+        users = users.filter(User.id == args.user)
+
+    checked = drifted = 0
+    for (user_id,) in users.all():
+        set_shard(db, user_id)
+        goals = goal_progress.goal_values(db, user_id)
+        stored = {s.metric: s for s in db.query(GoalProgress).filter(GoalProgress.user_id == user_id)}
+        for metric, rebuilt in goal_progress.rebuild_user(db, user_id, goals).items():
+            checked += 1
+            state = stored.get(metric) or GoalProgress(
+                user_id=user_id, metric=metric, daily_totals="[]", current_streak=0, best_streak=0
+            )
+            problems = _mismatches(state, rebuilt)
+            if not problems:
+                continue
+            drifted += 1
+            print(f"user {user_id} {metric}: {'; '.join(problems)}")
+            if args.fix:
+                state.anchor_day = rebuilt.anchor_day
+                state.daily_totals = json.dumps(goal_progress._ring(rebuilt))
+                state.current_streak = rebuilt.current_streak
+                state.last_hit_day = rebuilt.last_hit_day
+                # The rebuild uses today's goals, so never lower a best streak earned under older ones
+                state.best_streak = max(state.best_streak or 0, rebuilt.best_streak)
+                if state not in db:
+                    db.add(state)
+    if args.fix:
+        db.commit()
+    db.close()
+
+    action = "repaired" if args.fix else "drifted"
+    print(f"Checked {checked} goal states, {drifted} {action}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Verify (and optionally repair) the population quantile sketches against the raw logs.
+
+Sketches are kept per shard, so run with --fix once after deploying them,
+after `python -m scripts.backfill_sleep_sessions` and after a rebalance.
+
+Usage (from the backend directory):
+    python -m scripts.rebuild_sketches          # report drift only
+    python -m scripts.rebuild_sketches --fix    # overwrite drifted sketches
+"""
+import argparse
+import json
+
+from database import SHARD_COUNT, SessionLocal, use_shard
+from models import MetricSketch
+from services import population
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fix", action="store_true", help="write the rebuilt sketches for drifted days")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    checked = drifted = 0
+    for shard in range(SHARD_COUNT):
+        use_shard(db, shard)
+        rebuilt = population.rebuild(db)
+        stored = {
+            (row.metric, row.day): population.Sketch(json.loads(row.buckets)) for row in db.query(MetricSketch)
+        }
+        for key in sorted(rebuilt.keys() | stored.keys()):
+            checked += 1
+            sketch = rebuilt.get(key, population.Sketch())
+            current = stored.get(key, population.Sketch())
+            if sketch.buckets == current.buckets:
+                continue
+            drifted += 1
+            metric, day = key
+            print(f"shard {shard} {metric} {day}: {current.count} user-days stored, {sketch.count} from logs")
+            if args.fix:
+                population.save(db, metric, day, sketch)
+        if args.fix:
+            db.commit()
+    db.close()
+
+    action = "repaired" if args.fix else "drifted"
+    print(f"Checked {checked} sketches, {drifted} {action}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Recount every user's logs and repair drift in the user_stats counters.
+
+Run once after deploying the counters table to backfill existing users,
+then periodically.
+
+Usage (from the backend directory):
+    python -m scripts.reconcile_user_stats          # report drift only
+    python -m scripts.reconcile_user_stats --fix    # write the recounted values
+"""
+import argparse
+
+from database import SessionLocal, use_shard, users_by_shard
+from models import User, UserStats
+from services.user_stats import COUNTED, recount
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fix", action="store_true", help="overwrite drifted counters")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    user_ids = [user_id for (user_id,) in db.query(User.id)]
+
+    drifted = 0
+    for shard, shard_user_ids in users_by_shard(user_ids).items():
+        use_shard(db, shard)
+        actual = recount(db)
+        stored = {s.user_id: s for s in db.query(UserStats)}
+        for user_id in shard_user_ids:
+            expected = actual.get(user_id, dict.fromkeys(COUNTED, 0))
+            stats = stored.get(user_id)
+            current = {c: getattr(stats, c) for c in COUNTED} if stats else None
+            if current == expected:
+                continue
+            drifted += 1
+            print(f"user {user_id}: stored {current} actual {expected}")
+            if args.fix:
+                if stats is None:
+                    db.add(UserStats(user_id=user_id, **expected))
+                else:
+                    for column, value in expected.items():
+                        setattr(stats, column, value)
+        if args.fix:
+            db.commit()
+    db.close()
+
+    action = "repaired" if args.fix else "drifted"
+    print(f"{drifted} users {action}.")
+
+
+if __name__ == "__main__":
+    main()
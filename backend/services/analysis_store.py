@@ -0,0 +1,53 @@
+"""AI analyses stored compressed in their own table, loaded only when asked for.
+
+Rows analyzed before the table existed still hold their text in the
+deferred legacy `ai_analysis` column until `python -m scripts.migrate_analyses`
+moves it; `load` falls back to that column for them.
+"""
+import zlib
+from datetime import datetime
+
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from models import LogAnalysis, SleepLog, WorkoutLog
+from services import changes
+
+LOG_MODELS = {"sleep": SleepLog, "workout": WorkoutLog}
+
+# Keeps IN (...) lists well under SQLite's bound-parameter limit
+_CHUNK = 500
+
+
+def save(db: Session, log_type: str, log_id: int, text: str) -> None:
+    """Insert or replace the analysis for one log, in the caller's transaction."""
+    content = zlib.compress(text.encode("utf-8"), 6)
+    stmt = insert(LogAnalysis).values(
+        log_type=log_type, log_id=log_id, content=content, created_at=datetime.utcnow()
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[LogAnalysis.log_type, LogAnalysis.log_id],
+        set_={"content": stmt.excluded.content, "created_at": stmt.excluded.created_at},
+    ))
+    # Synced clients see the analysis as a change to the log row
+    changes.record_from(db, log_type, log_id)
+
+
+def load(db: Session, log_type: str, log_ids: list[int]) -> dict[int, str]:
+    """Analyses for the given logs, keyed by log id; logs without one are absent."""
+    found = {}
+    for start in range(0, len(log_ids), _CHUNK):
+        chunk = log_ids[start:start + _CHUNK]
+        found.update(
+            (log_id, zlib.decompress(content).decode("utf-8"))
+            for log_id, content in db.query(LogAnalysis.log_id, LogAnalysis.content).filter(
+                LogAnalysis.log_type == log_type, LogAnalysis.log_id.in_(chunk)
+            )
+        )
+        missing = [i for i in chunk if i not in found]
+        if missing:
+            model = LOG_MODELS[log_type]
+            found.update(
+                db.query(model.id, model.ai_analysis).filter(model.id.in_(missing), model.ai_analysis.isnot(None))
+            )
+    return found
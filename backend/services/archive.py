@@ -0,0 +1,130 @@
+"""Hot/cold tiering for the log tables.
+
+`raise_watermark` records a cutoff in archive_state, then
+`archive_older_than` moves rows dated before it from each hot log table
+into its `<table>_archive` twin (ids preserved). Readers cache the
+watermark for WATERMARK_TTL_SECONDS, so rows should only move once that
+long has passed since the watermark was raised (scripts/archive_logs.py
+waits). Rows are moved with Core statements, so the sync change log never
+sees them as deletions: clients keep what they have.
+
+Readers that may reach back past the cutoff get their model from
+`source(model, since)`. It is the plain model for recent ranges, or an
+alias over hot UNION ALL archive when `since` is older than the
+archived_before watermark, so the same ORM query works on both.
+"""
+import os
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, select, union_all
+from sqlalchemy.orm import Session, aliased
+
+from cache import get_cache
+from models import ARCHIVE_TABLES, ArchiveState, SleepLog, StepsLog, WorkoutLog, WaterLog, EnergyScore
+
+# Rows older than this many days are archived. Goal streaks and rolling
+# windows read the last 30 days from the hot tables, so keep it above that.
+ARCHIVE_HORIZON_DAYS = max(35, int(os.getenv("ARCHIVE_HORIZON_DAYS", "365")))
+ARCHIVE_CHUNK_ROWS = 1000
+
+# hot model -> column the horizon applies to, and whether it is a timestamp (else a YYYY-MM-DD string)
+DATE_COLUMNS = {
+    SleepLog: ("day", False),
+    StepsLog: ("date", False),
+    WorkoutLog: ("created_at", True),
+    WaterLog: ("date", False),
+    EnergyScore: ("date", False),
+}
+
+NAMESPACE = "archive"
+WATERMARK_TTL_SECONDS = 60
+
+
+def watermark(db: Session, model) -> Optional[date]:
+    """Rows of `model` dated before this day may be in the archive; None when nothing was archived."""
+    table_name = model.__tablename__
+    cached = get_cache().get(NAMESPACE, table_name)
+    if cached is None:
+        state = db.get(ArchiveState, table_name)
+        cached = state.archived_before if state else ""
+        get_cache().set(NAMESPACE, table_name, cached, ttl=WATERMARK_TTL_SECONDS)
+    return date.fromisoformat(cached) if cached else None
+
+
+def source(db: Session, model, since: Optional[date]):
+    """`model` itself, or an alias over hot + archived rows when `since` reaches past the watermark.
+
+    Pass since=None for reads with no lower bound.
+    """
+    archived_before = watermark(db, model)
+    if archived_before is None or (since is not None and since >= archived_before):
+        return model
+    hot = model.__table__
+    cold = ARCHIVE_TABLES[model]
+    both = union_all(
+        select(*(hot.c[c.name] for c in hot.columns)),
+        select(*(cold.c[c.name] for c in hot.columns)),
+    ).subquery(f"{hot.name}_all")
+    return aliased(model, both, adapt_on_names=True)
+
+
+def _cutoff_value(model, cutoff: date):
+    _, is_timestamp = DATE_COLUMNS[model]
+    return datetime.combine(cutoff, datetime.min.time()) if is_timestamp else cutoff.isoformat()
+
+
+def count_older(db: Session, model, cutoff: date) -> int:
+    """How many hot rows `archive_older_than` would move."""
+    column = getattr(model, DATE_COLUMNS[model][0])
+    return db.query(func.count(model.id)).filter(column < _cutoff_value(model, cutoff)).scalar()
+
+
+def raise_watermark(db: Session, model, cutoff: date) -> bool:
+    """Make readers union the archive for ranges before `cutoff`; True if the watermark moved."""
+    table_name = model.__tablename__
+    state = db.get(ArchiveState, table_name)
+    if state is None:
+        db.add(ArchiveState(table_name=table_name, archived_before=cutoff.isoformat()))
+    elif state.archived_before < cutoff.isoformat():
+        state.archived_before = cutoff.isoformat()
+    else:
+        return False
+    db.commit()
+    get_cache().delete(NAMESPACE, table_name)
+    return True
+
+
+def archive_older_than(db: Session, model, cutoff: date, chunk: int = ARCHIVE_CHUNK_ROWS) -> int:
+    """Move hot rows dated before `cutoff` into the archive table, committing per chunk.
+
+    Archived rows keep their ids. The row with the highest id always stays
+    hot: tables created before the log tables were AUTOINCREMENT hand out
+    max(id) + 1, which would otherwise reuse archived ids once the hot
+    table empties. Call `raise_watermark` for the same cutoff first.
+    """
+    hot = model.__table__
+    cold = ARCHIVE_TABLES[model]
+    column = hot.c[DATE_COLUMNS[model][0]]
+    bound = _cutoff_value(model, cutoff)
+    newest = db.execute(select(func.max(hot.c.id))).scalar()
+    if newest is None:
+        return 0
+
+    moved = 0
+    while True:
+        ids = [row[0] for row in db.execute(
+            select(hot.c.id).where(column < bound, hot.c.id < newest).order_by(hot.c.id).limit(chunk)
+        )]
+        if not ids:
+            return moved
+        columns = [c.name for c in hot.columns]
+        db.execute(insert(cold).from_select(columns, select(*(hot.c[c] for c in columns)).where(hot.c.id.in_(ids))))
+        db.execute(delete(hot).where(hot.c.id.in_(ids)))
+        db.commit()
+        moved += len(ids)
+
+
+def cutoff_for(horizon_days: int = ARCHIVE_HORIZON_DAYS, today: Optional[date] = None) -> date:
+    """The first day that stays hot for the given horizon."""
+    return (today or datetime.utcnow().date()) - timedelta(days=horizon_days)
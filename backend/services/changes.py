@@ -0,0 +1,83 @@
+"""Change sequence behind delta sync.
+
+Every insert, update or delete of a synced row through a primary session
+appends a ChangeLog entry in the same transaction (an `after_flush` hook),
+so the sequence commits or rolls back with the change itself. Writes that
+bypass the ORM unit of work call `record` / `record_from` directly.
+
+A client's sync cursor is the highest `seq` it has seen.
+"""
+from sqlalchemy import event, insert, literal, select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import ChangeLog, SleepLog, StepsLog, WorkoutLog, WaterLog, UserGoal, EnergyScore, WeeklyReport
+
+# entity name -> model, for every table /api/sync serves
+SYNCED = {
+    "sleep": SleepLog,
+    "steps": StepsLog,
+    "workout": WorkoutLog,
+    "water": WaterLog,
+    "goals": UserGoal,
+    "energy": EnergyScore,
+    "reports": WeeklyReport,
+}
+_ENTITY_OF = {model: entity for entity, model in SYNCED.items()}
+
+
+def record(db: Session, user_id: int, entity: str, entity_id: int, op: str = "upsert") -> None:
+    """Append one change in the caller's transaction."""
+    db.execute(insert(ChangeLog).values(user_id=user_id, entity=entity, entity_id=entity_id, op=op))
+
+
+def record_from(db: Session, entity: str, entity_id: int) -> None:
+    """Append an upsert for a row whose owner isn't at hand, looking the user up in SQL."""
+    model = SYNCED[entity]
+    db.execute(insert(ChangeLog).from_select(
+        ["user_id", "entity", "entity_id", "op"],
+        select(model.user_id, literal(entity), model.id, literal("upsert")).where(model.id == entity_id),
+    ))
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _log_changes(session, flush_context):
+    # new/dirty/deleted still hold the pre-flush state here; new rows already have their ids
+    rows = []
+    for objects, op in ((session.new, "upsert"), (session.dirty, "upsert"), (session.deleted, "delete")):
+        for obj in objects:
+            entity = _ENTITY_OF.get(type(obj))
+            if entity is None or (op == "upsert" and obj in session.dirty and not session.is_modified(obj)):
+                continue
+            rows.append({"user_id": obj.user_id, "entity": entity, "entity_id": obj.id, "op": op})
+    if rows:
+        # Bind by mapper so the rows land on the same shard as the changes
+        session.connection(bind_arguments={"mapper": ChangeLog.__mapper__}).execute(insert(ChangeLog), rows)
+
+
+def latest_seq(db: Session, user_id: int) -> int:
+    """The user's newest change sequence number, 0 when there are none."""
+    seq = db.query(ChangeLog.seq).filter(ChangeLog.user_id == user_id).order_by(ChangeLog.seq.desc()).first()
+    return seq[0] if seq else 0
+
+
+def since(db: Session, user_id: int, cursor: int) -> tuple[dict[str, set], dict[str, set], int]:
+    """Entities changed after `cursor` as ({entity: upserted ids}, {entity: deleted ids}, new cursor).
+
+    Uses the (user_id, seq) index; a client with nothing new costs one empty range scan.
+    """
+    upserted: dict[str, set] = {}
+    deleted: dict[str, set] = {}
+    newest = cursor
+    # Ascending, so a later change to the same row overrides an earlier one
+    for seq, entity, entity_id, op in db.query(
+        ChangeLog.seq, ChangeLog.entity, ChangeLog.entity_id, ChangeLog.op
+    ).filter(ChangeLog.user_id == user_id, ChangeLog.seq > cursor).order_by(ChangeLog.seq):
+        newest = seq
+        if op == "delete":
+            upserted.get(entity, set()).discard(entity_id)
+            deleted.setdefault(entity, set()).add(entity_id)
+        else:
+            deleted.get(entity, set()).discard(entity_id)
+            upserted.setdefault(entity, set()).add(entity_id)
+    return upserted, deleted, newest
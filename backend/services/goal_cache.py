@@ -0,0 +1,41 @@
+"""Per-user goal targets with defaults, cached in the shared cache and invalidated on update.
+
+Reads never create a UserGoal row: users without one get the column
+defaults. Entries also expire after GOAL_CACHE_TTL_SECONDS, which bounds
+staleness when the in-process backend is used with several workers
+(only the updating worker's copy is dropped).
+"""
+import os
+
+from sqlalchemy.orm import Session
+
+from cache import get_cache
+from models import UserGoal
+
+GOAL_FIELDS = ("step_goal", "sleep_goal", "water_goal", "calorie_goal")
+DEFAULT_GOALS = {field: getattr(UserGoal, field).default.arg for field in GOAL_FIELDS}
+
+GOAL_CACHE_TTL_SECONDS = float(os.getenv("GOAL_CACHE_TTL_SECONDS", "60"))
+
+NAMESPACE = "goals"
+
+
+def get_goals(db: Session, user_id: int) -> dict:
+    """Goal row as a dict (id is None when the user never saved goals)."""
+    cached = get_cache().get(NAMESPACE, user_id)
+    if cached is not None:
+        return cached
+
+    goal = db.query(UserGoal).filter(UserGoal.user_id == user_id).first()
+    if goal is None:
+        values = {"id": None, "user_id": user_id, **DEFAULT_GOALS}
+    else:
+        values = {"id": goal.id, "user_id": user_id, **{field: getattr(goal, field) for field in GOAL_FIELDS}}
+
+    get_cache().set(NAMESPACE, user_id, values, ttl=GOAL_CACHE_TTL_SECONDS)
+    return values
+
+
+def invalidate(user_id: int) -> None:
+    """Drop the cached goals; call after the update is committed."""
+    get_cache().delete(NAMESPACE, user_id)
@@ -0,0 +1,213 @@
+"""Streaks and rolling sums per goal, updated in O(1) as logs arrive.
+
+Each (user, metric) row keeps the last RING_DAYS daily totals as a ring
+anchored at the newest logged day, plus the current/best streak of days
+meeting the goal from UserGoal. Log POSTs add to one slot of the ring and
+goal updates re-evaluate the ring; neither scans the log tables.
+`rebuild_user` recomputes the same state from the raw logs, and
+`python -m scripts.rebuild_goal_progress` uses it to verify or repair.
+"""
+import json
+from datetime import date, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from models import GoalProgress, SleepLog, StepsLog, WorkoutLog, WaterLog
+from services import archive, goal_cache
+
+RING_DAYS = 30
+
+# metric -> UserGoal column holding its daily target
+GOAL_FIELDS = {
+    "steps": "step_goal",
+    "sleep": "sleep_goal",
+    "water": "water_goal",
+    "calories": "calorie_goal",
+}
+
+
+def goal_values(db: Session, user_id: int) -> dict:
+    """The user's goal targets keyed by UserGoal field (cached, defaults when unset)."""
+    return goal_cache.get_goals(db, user_id)
+
+
+def _get_state(db: Session, user_id: int, metric: str) -> GoalProgress:
+    # Create the row with an upsert rather than a pending object: a group-commit batch
+    # shares one session, and two pending rows for the same metric would fail the batch
+    db.execute(
+        insert(GoalProgress)
+        .values(user_id=user_id, metric=metric, daily_totals="[]", current_streak=0, best_streak=0)
+        .on_conflict_do_nothing(index_elements=[GoalProgress.user_id, GoalProgress.metric])
+    )
+    return (
+        db.query(GoalProgress)
+        .filter(GoalProgress.user_id == user_id, GoalProgress.metric == metric)
+        .one()
+    )
+
+
+def _ring(state: GoalProgress) -> list[float]:
+    totals = json.loads(state.daily_totals or "[]")
+    return totals + [0.0] * (RING_DAYS - len(totals))
+
+
+def _run_length(ring: list[float], start: int, goal: float) -> int:
+    """Consecutive days meeting the goal, walking back from ring index `start`."""
+    run = 0
+    for total in ring[start:]:
+        if total < goal:
+            break
+        run += 1
+    return run
+
+
+def record(db: Session, user_id: int, metric: str, day: date, amount: float, goals: dict) -> None:
+    """Add `amount` to the metric's total for `day` and advance the streak if the goal was just met."""
+    if not amount:
+        return
+    state = _get_state(db, user_id, metric)
+    ring = _ring(state)
+    goal = goals[GOAL_FIELDS[metric]]
+
+    anchor = date.fromisoformat(state.anchor_day) if state.anchor_day else day
+    if day > anchor:
+        shift = min((day - anchor).days, RING_DAYS)
+        ring = [0.0] * shift + ring[:RING_DAYS - shift]
+        anchor = day
+    index = (anchor - day).days
+    if index >= RING_DAYS:
+        return  # older than the window; only a rebuild can account for it
+
+    before = ring[index]
+    ring[index] = before + amount
+    state.anchor_day = anchor.isoformat()
+    state.daily_totals = json.dumps(ring)
+
+    if before < goal <= ring[index]:
+        last_hit = date.fromisoformat(state.last_hit_day) if state.last_hit_day else None
+        if last_hit is None or day > last_hit:
+            state.current_streak = (state.current_streak or 0) + 1 if last_hit == day - timedelta(days=1) else 1
+            state.last_hit_day = day.isoformat()
+        else:
+            # Back-filled day: it may join two runs, so recount from the last hit
+            run = _run_length(ring, (anchor - last_hit).days, goal)
+            state.current_streak = max(state.current_streak or 0, run)
+        state.best_streak = max(state.best_streak or 0, state.current_streak)
+
+
+def record_log(db: Session, user_id: int, day: date, **amounts: float) -> None:
+    """Record one log's contribution to each metric, e.g. record_log(db, uid, day, steps=..., calories=...)."""
+    goals = goal_values(db, user_id)
+    for metric, amount in amounts.items():
+        record(db, user_id, metric, day, amount, goals)
+
+
+def on_goals_updated(db: Session, user_id: int, goals: dict) -> None:
+    """Re-evaluate the current streaks against new targets using only the ring."""
+    for metric, field in GOAL_FIELDS.items():
+        state = (
+            db.query(GoalProgress)
+            .filter(GoalProgress.user_id == user_id, GoalProgress.metric == metric)
+            .first()
+        )
+        if state is None or state.anchor_day is None:
+            continue
+        ring = _ring(state)
+        anchor = date.fromisoformat(state.anchor_day)
+        goal = goals[field]
+
+        latest = next((i for i, total in enumerate(ring) if total >= goal), None)
+        if latest is None:
+            state.current_streak = 0
+            state.last_hit_day = None
+            continue
+        run = _run_length(ring, latest, goal)
+        last_hit = (anchor - timedelta(days=latest)).isoformat()
+        if run == RING_DAYS - latest and last_hit == state.last_hit_day:
+            # The run reaches past the ring; the older part is still counted
+            run = max(run, state.current_streak or 0)
+        state.current_streak = run
+        state.last_hit_day = last_hit
+        state.best_streak = max(state.best_streak or 0, run)
+
+
+def _window(ring: list[float], offset: int, days: int) -> list[float]:
+    """The last `days` totals ending today, where today is `offset` days after the anchor."""
+    return ring[:max(0, days - offset)]
+
+
+def progress(db: Session, user_id: int, goals: dict, today: date) -> dict:
+    """Goal progress for every metric, answered from the state rows alone."""
+    states = {s.metric: s for s in db.query(GoalProgress).filter(GoalProgress.user_id == user_id)}
+    result = {}
+    for metric, field in GOAL_FIELDS.items():
+        state = states.get(metric)
+        ring = _ring(state) if state else [0.0] * RING_DAYS
+        offset = (today - date.fromisoformat(state.anchor_day)).days if state and state.anchor_day else RING_DAYS
+
+        entry = {"goal": goals[field], "today": round(ring[0], 1) if offset == 0 else 0}
+        for days in (7, 30):
+            window = _window(ring, offset, days)
+            logged = [total for total in window if total]
+            entry[f"sum_{days}d"] = round(sum(window), 1)
+            entry[f"avg_{days}d"] = round(sum(logged) / len(logged), 1) if logged else 0
+
+        last_hit = state.last_hit_day if state else None
+        alive = last_hit is not None and date.fromisoformat(last_hit) >= today - timedelta(days=1)
+        entry["current_streak"] = state.current_streak if alive else 0
+        entry["best_streak"] = state.best_streak if state else 0
+        result[metric] = entry
+    return result
+
+
+def _daily_totals(db: Session, user_id: int) -> dict[str, dict[date, float]]:
+    """Per-day totals for every metric, straight from the log tables (archived rows included)."""
+    sleep, steps, workout, water = (archive.source(db, model, None) for model in (SleepLog, StepsLog, WorkoutLog, WaterLog))
+
+    def by_day(day_col, value_col, user_col):
+        rows = (
+            db.query(func.date(day_col), func.sum(value_col))
+            .filter(user_col == user_id)
+            .group_by(func.date(day_col))
+        )
+        return {date.fromisoformat(day): float(total or 0) for day, total in rows}
+
+    steps_calories = by_day(steps.date, steps.calories_burnt, steps.user_id)
+    workout_calories = by_day(workout.created_at, workout.calories_burnt, workout.user_id)
+    calories = dict(steps_calories)
+    for day, total in workout_calories.items():
+        calories[day] = calories.get(day, 0.0) + total
+
+    return {
+        "steps": by_day(steps.date, steps.steps, steps.user_id),
+        "sleep": by_day(sleep.day, sleep.duration_hours, sleep.user_id),
+        "water": by_day(water.date, water.glasses, water.user_id),
+        "calories": calories,
+    }
+
+
+def rebuild_user(db: Session, user_id: int, goals: dict) -> dict[str, GoalProgress]:
+    """Recompute every metric's state from the raw logs (not added to the session)."""
+    rebuilt = {}
+    for metric, totals in _daily_totals(db, user_id).items():
+        goal = goals[GOAL_FIELDS[metric]]
+        state = GoalProgress(user_id=user_id, metric=metric, current_streak=0, best_streak=0)
+        if totals:
+            anchor = max(totals)
+            ring = [round(totals.get(anchor - timedelta(days=i), 0.0), 6) for i in range(RING_DAYS)]
+            state.anchor_day = anchor.isoformat()
+            state.daily_totals = json.dumps(ring)
+
+            run, previous = 0, None
+            for day in sorted(d for d, total in totals.items() if total >= goal):
+                run = run + 1 if previous == day - timedelta(days=1) else 1
+                previous = day
+                state.best_streak = max(state.best_streak, run)
+            state.current_streak = run
+            state.last_hit_day = previous.isoformat() if previous else None
+        else:
+            state.daily_totals = json.dumps([0.0] * RING_DAYS)
+        rebuilt[metric] = state
+    return rebuilt
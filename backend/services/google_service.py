@@ -0,0 +1,154 @@
+"""Google sign-in verification over a pooled HTTP session, with cert and profile caches.
+
+- One `requests.Session` (built on first use) with connection pooling and
+  timeouts serves both the userinfo endpoint and Google's signing certs.
+- The certs response is cached for as long as its Cache-Control max-age allows.
+- Verified tokens are remembered in the shared cache for
+  GOOGLE_TOKEN_CACHE_SECONDS so repeat logins with the same token skip the
+  network entirely, on any worker.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Optional
+
+from cache import get_cache
+
+GOOGLE_USERINFO_URL = os.getenv("GOOGLE_USERINFO_URL", "https://www.googleapis.com/oauth2/v3/userinfo")
+GOOGLE_CERTS_URL = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+GOOGLE_HTTP_TIMEOUT = (
+    float(os.getenv("GOOGLE_CONNECT_TIMEOUT_SECONDS", "3")),
+    float(os.getenv("GOOGLE_READ_TIMEOUT_SECONDS", "5")),
+)
+GOOGLE_TOKEN_CACHE_SECONDS = float(os.getenv("GOOGLE_TOKEN_CACHE_SECONDS", "300"))
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class GoogleAuthError(Exception):
+    """The token is not a valid Google access token or ID token."""
+
+
+@lru_cache(maxsize=None)
+def _session():
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class _CertCachingRequest:
+    """google-auth transport that serves the certs URL from cache while it is fresh."""
+
+    def __init__(self):
+        from google.auth.transport import requests as google_requests
+
+        self._request = google_requests.Request(session=_session())
+        self._lock = threading.Lock()
+        self._certs = None
+        self._certs_expire = 0.0
+
+    def __call__(self, url, method="GET", body=None, headers=None, timeout=None, **kwargs):
+        timeout = timeout or GOOGLE_HTTP_TIMEOUT
+        if url != GOOGLE_CERTS_URL or method != "GET":
+            return self._request(url, method=method, body=body, headers=headers, timeout=timeout, **kwargs)
+
+        with self._lock:
+            if self._certs is not None and time.monotonic() < self._certs_expire:
+                return self._certs
+        response = self._request(url, method=method, body=body, headers=headers, timeout=timeout, **kwargs)
+        if response.status == 200:
+            match = _MAX_AGE.search(response.headers.get("cache-control", ""))
+            if match:
+                with self._lock:
+                    self._certs = response
+                    self._certs_expire = time.monotonic() + int(match.group(1))
+        return response
+
+
+@lru_cache(maxsize=None)
+def _transport() -> _CertCachingRequest:
+    return _CertCachingRequest()
+
+
+NAMESPACE = "google_tokens"
+
+
+def _remember(key: str, profile: dict, token_exp: Optional[float] = None):
+    ttl = GOOGLE_TOKEN_CACHE_SECONDS
+    if token_exp is not None:
+        ttl = min(ttl, token_exp - time.time())
+    get_cache().set(NAMESPACE, key, profile, ttl=ttl)
+
+
+def _profile(info: dict) -> dict:
+    email = info.get("email", "").lower()
+    return {
+        "google_id": info.get("sub", ""),
+        "email": email,
+        "name": info.get("name", email.split("@")[0]),
+    }
+
+
+def _from_access_token(token: str):
+    response = _session().get(
+        GOOGLE_USERINFO_URL,
+        headers={"Authorization": f"Bearer {token}"},
+        timeout=GOOGLE_HTTP_TIMEOUT,
+    )
+    if response.status_code != 200:
+        return None
+    return _profile(response.json())
+
+
+def _from_id_token(token: str):
+    from google.oauth2 import id_token
+
+    try:
+        info = id_token.verify_token(
+            token, _transport(), audience=os.getenv("GOOGLE_CLIENT_ID", ""), certs_url=GOOGLE_CERTS_URL
+        )
+    except ValueError:
+        return None, None
+    if info.get("iss") not in GOOGLE_ISSUERS:
+        return None, None
+    return _profile(info), info.get("exp")
+
+
+def _looks_like_jwt(token: str) -> bool:
+    return token.count(".") == 2 and token.startswith("eyJ")
+
+
+def verify_token(token: str) -> dict:
+    """Resolve a Google access token or ID token to {google_id, email, name}.
+
+    Raises GoogleAuthError when Google rejects the token.
+    """
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    cached = get_cache().get(NAMESPACE, key)
+    if cached is not None:
+        return cached
+
+    # ID tokens are JWTs; check them locally first instead of a userinfo round trip
+    if _looks_like_jwt(token):
+        profile, exp = _from_id_token(token)
+        if profile is None:
+            profile, exp = _from_access_token(token), None
+    else:
+        profile, exp = _from_access_token(token), None
+        if profile is None:
+            profile, exp = _from_id_token(token)
+
+    if profile is None:
+        raise GoogleAuthError("Invalid Google token.")
+    _remember(key, profile, exp)
+    return dict(profile)
@@ -0,0 +1,145 @@
+"""Log inserts, optionally group-committed across concurrent requests.
+
+`insert_log` inserts a log row with RETURNING (no refresh SELECT), runs
+the caller's side effects (goal progress, counters, ...), records the
+change for sync and bumps the user's data version, all in one
+transaction.
+
+By default that transaction is the request's own. With GROUP_COMMIT=1,
+the work is queued instead: a single writer thread runs queued inserts
+from concurrent requests in one transaction, committing every
+GROUP_COMMIT_WINDOW_MS or GROUP_COMMIT_MAX_ROWS inserts, so one fsync
+covers the whole batch. Each request blocks until its batch is durable.
+If a batch fails to commit, its inserts are retried one transaction
+each so only the failing request sees the error. With SHARD_COUNT > 1
+there is one writer per shard, since a commit only covers one database.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from database import SHARD_COUNT, SessionLocal, mark_sticky, shard_for, use_shard
+from etag_utils import bump_data_version_by_id
+from services import changes
+
+GROUP_COMMIT = os.getenv("GROUP_COMMIT", "0") == "1"
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "5"))
+GROUP_COMMIT_MAX_ROWS = int(os.getenv("GROUP_COMMIT_MAX_ROWS", "64"))
+
+Work = Callable[[Session], dict]
+
+
+class _GroupWriter:
+    def __init__(self, shard: int, window_seconds: float, max_rows: int):
+        self.shard = shard
+        self.window_seconds = window_seconds
+        self.max_rows = max_rows
+        self._queue: "queue.Queue[tuple[Work, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, work: Work) -> dict:
+        """Queue `work` for the next batch and wait until that batch has committed."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"group-commit-{self.shard}", daemon=True)
+                self._thread.start()
+        future: Future = Future()
+        self._queue.put((work, future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window_seconds
+            while len(batch) < self.max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _session(self) -> Session:
+        db = SessionLocal()
+        use_shard(db, self.shard)
+        return db
+
+    def _flush(self, batch: list):
+        db = self._session()
+        try:
+            results = [work(db) for work, _ in batch]
+            db.commit()
+        except Exception:
+            db.rollback()
+            db.close()
+            self._flush_one_by_one(batch)
+            return
+        db.close()
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _flush_one_by_one(self, batch: list):
+        for work, future in batch:
+            db = self._session()
+            try:
+                result = work(db)
+                db.commit()
+            except Exception as exc:
+                db.rollback()
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+            finally:
+                db.close()
+
+
+writers = [_GroupWriter(shard, GROUP_COMMIT_WINDOW_MS / 1000, GROUP_COMMIT_MAX_ROWS) for shard in range(SHARD_COUNT)]
+
+
+def insert_log(
+    db: Session,
+    user_id: int,
+    model,
+    values: dict,
+    after: Optional[Callable[[Session, dict], None]] = None,
+) -> dict:
+    """Insert and commit one log row for `user_id`; returns the stored row as a dict.
+
+    `after(session, row)` runs in the same transaction. It may run on the
+    group-commit writer's thread and session, so it must only use the session
+    and row it is given, not ORM objects loaded by the request. That session
+    is shared by the whole batch and does not autoflush, so `after` must not
+    create rows by adding pending ORM objects: two of them for the same key
+    would fail the batch's commit. Create rows with an upsert instead.
+    """
+    entity = next(name for name, synced in changes.SYNCED.items() if synced is model)
+
+    def work(session: Session) -> dict:
+        stmt = insert(model).values(user_id=user_id, **values).returning(*model.__table__.columns)
+        row = session.execute(stmt).one()._asdict()
+        if after is not None:
+            after(session, row)
+        changes.record(session, user_id, entity, row["id"])
+        bump_data_version_by_id(session, user_id)
+        return row
+
+    if not GROUP_COMMIT:
+        row = work(db)
+        db.commit()
+        return row
+
+    # End the request session's read transaction so waiting requests don't
+    # hold pool connections the writer needs
+    db.rollback()
+    row = writers[shard_for(user_id)].submit(work)
+    mark_sticky(db)
+    return row
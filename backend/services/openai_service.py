@@ -1,29 +1,181 @@
+import json
+import math
 import os
-from openai import OpenAI
-from dotenv import load_dotenv
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Optional
 
-load_dotenv()
-
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 MODEL = "gpt-4o-mini"
 
+# ── Concurrency governor ─────────────────────────────
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "16"))
+LLM_MAX_QUEUED_PER_USER = int(os.getenv("LLM_MAX_QUEUED_PER_USER", "2"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "10"))
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "300"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "150000"))
+
+
+class LLMBusyError(Exception):
+    """Raised instead of waiting when the governor's queue is full; maps to 429 + Retry-After."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"AI service is busy, retry after {retry_after:.0f}s")
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class _TokenBucket:
+    """Refills `per_minute` units per minute. Takes are reservations: the level may go negative."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def take(self, amount: float) -> float:
+        """Reserve `amount` and return how long to wait before using it."""
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        self.level -= amount
+        return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def refund(self, amount: float) -> None:
+        self.level = min(self.capacity, self.level + amount)
+
+
+class _Governor:
+    """Bounded concurrency with a short wait queue served round-robin across users,
+    in front of request and token rate limits. Callers that can't be queued, or
+    that would wait longer than the queue timeout, get LLMBusyError immediately.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._active = 0
+        self._queued = 0
+        self._waiting: dict[object, deque] = {}  # user -> tickets, oldest first
+        self._rotation: deque = deque()  # users with waiting tickets, next to serve first
+        self._requests = _TokenBucket(LLM_REQUESTS_PER_MINUTE)
+        self._tokens = _TokenBucket(LLM_TOKENS_PER_MINUTE)
+
+    def _grant_next(self):
+        while self._active < LLM_MAX_CONCURRENCY and self._rotation:
+            user = self._rotation.popleft()
+            ticket = self._waiting[user].popleft()
+            if self._waiting[user]:
+                self._rotation.append(user)
+            else:
+                del self._waiting[user]
+            ticket["granted"] = True
+            self._active += 1
+            self._queued -= 1
+        self._cond.notify_all()
+
+    def _acquire_slot(self, user):
+        with self._cond:
+            if self._active < LLM_MAX_CONCURRENCY and not self._rotation:
+                self._active += 1
+                return
+            if self._queued >= LLM_MAX_QUEUE or len(self._waiting.get(user, ())) >= LLM_MAX_QUEUED_PER_USER:
+                raise LLMBusyError(LLM_QUEUE_TIMEOUT_SECONDS)
+
+            ticket = {"granted": False}
+            if user not in self._waiting:
+                self._waiting[user] = deque()
+                self._rotation.append(user)
+            self._waiting[user].append(ticket)
+            self._queued += 1
+
+            deadline = time.monotonic() + LLM_QUEUE_TIMEOUT_SECONDS
+            while not ticket["granted"]:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiting[user].remove(ticket)
+                    if not self._waiting[user]:
+                        del self._waiting[user]
+                        self._rotation.remove(user)
+                    self._queued -= 1
+                    raise LLMBusyError(LLM_QUEUE_TIMEOUT_SECONDS)
+                self._cond.wait(remaining)
+
+    def _release_slot(self):
+        with self._cond:
+            self._active -= 1
+            self._grant_next()
+
+    @contextmanager
+    def slot(self, user, estimated_tokens: int):
+        """Hold a completion slot; yields a callback to report the tokens actually used."""
+        self._acquire_slot(user)
+        try:
+            with self._cond:
+                wait = max(self._requests.take(1), self._tokens.take(estimated_tokens))
+                if wait > LLM_QUEUE_TIMEOUT_SECONDS:
+                    self._requests.refund(1)
+                    self._tokens.refund(estimated_tokens)
+                    raise LLMBusyError(wait)
+            if wait:
+                time.sleep(wait)
+
+            def report_usage(actual_tokens: int):
+                with self._cond:
+                    self._tokens.refund(estimated_tokens - actual_tokens)
+
+            yield report_usage
+        finally:
+            self._release_slot()
+
+
+_governor = _Governor()
+
+
+@lru_cache(maxsize=None)
+def get_client():
+    """Build the OpenAI client on first use; importing openai is slow."""
+    from openai import OpenAI
+
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+
+def complete(messages: list[dict], max_tokens: int, temperature: float = 0.7,
+             user_id: Optional[int] = None, response_format: Optional[dict] = None) -> str:
+    """Run a chat completion through the governor and return the content."""
+    extra = {"response_format": response_format} if response_format else {}
+    # ~4 characters per token for the prompt, plus the full completion budget
+    estimated = sum(len(m["content"]) for m in messages) // 4 + max_tokens
+    with _governor.slot(user_id, estimated) as report_usage:
+        response = get_client().chat.completions.create(
+            model=MODEL,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **extra,
+        )
+        if response.usage is not None:
+            report_usage(response.usage.total_tokens)
+    return response.choices[0].message.content
 
-def _chat(system_prompt: str, user_prompt: str) -> str:
+
+def _chat(system_prompt: str, user_prompt: str, user_id: Optional[int] = None) -> str:
     """Send a chat completion request and return the content."""
-    response = client.chat.completions.create(
-        model=MODEL,
-        messages=[
+    return complete(
+        [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt},
         ],
-        temperature=0.7,
         max_tokens=800,
+        user_id=user_id,
     )
-    return response.choices[0].message.content
 
 
 def analyze_sleep(bmi: float, bmi_category: str, weight_kg: float,
-                  sleep_time: str, wake_time: str, duration_hours: float) -> str:
+                  sleep_time: str, wake_time: str, duration_hours: float,
+                  user_id: Optional[int] = None) -> str:
     """Analyze sleep quality based on BMI and sleep data."""
     system_prompt = (
         "You are a certified sleep health expert and fitness consultant. "
@@ -45,12 +197,13 @@ def analyze_sleep(bmi: float, bmi_category: str, weight_kg: float,
         f"4. Personalized suggestions for better sleep tonight\n"
         f"5. Recommended ideal sleep schedule for their body type"
     )
-    return _chat(system_prompt, user_prompt)
+    return _chat(system_prompt, user_prompt, user_id)
 
 
 def analyze_workout(bmi: float, bmi_category: str, weight_kg: float,
                     workout_type: str, duration_min: float,
-                    intensity: str, calories: float) -> str:
+                    intensity: str, calories: float,
+                    user_id: Optional[int] = None) -> str:
     """Analyze workout effectiveness based on BMI and workout data."""
     system_prompt = (
         "You are a certified personal trainer and fitness expert. "
@@ -73,11 +226,12 @@ def analyze_workout(bmi: float, bmi_category: str, weight_kg: float,
         f"4. Suggested next workout\n"
         f"5. Recovery tips"
     )
-    return _chat(system_prompt, user_prompt)
+    return _chat(system_prompt, user_prompt, user_id)
 
 
 def get_fitness_suggestions(bmi: float, bmi_category: str, weight_kg: float,
-                            water_glasses: int, recent_activities: str) -> str:
+                            water_glasses: int, recent_activities: str,
+                            user_id: Optional[int] = None) -> str:
     """Generate hydration and fitness suggestions."""
     system_prompt = (
         "You are a certified nutritionist and fitness expert. "
@@ -98,4 +252,115 @@ def get_fitness_suggestions(bmi: float, bmi_category: str, weight_kg: float,
         f"4. Nutrition tips based on their BMI\n"
         f"5. Miscellaneous wellness suggestions"
     )
-    return _chat(system_prompt, user_prompt)
+    return _chat(system_prompt, user_prompt, user_id)
+
+
+# ── Batched analysis ─────────────────────────────────
+BATCH_MAX_ITEMS = 14
+BATCH_TOKENS_PER_ITEM = 450
+BATCH_INSTRUCTIONS = (
+    "You will receive several entries, each with an id. Analyze each entry on its own. "
+    "Reply with a JSON object only, of the form "
+    '{"analyses": [{"id": <entry id>, "analysis": "<markdown analysis>"}]}, '
+    "with exactly one item per entry id. Keep each analysis under 250 words."
+)
+
+
+def _parse_batch(content: str, ids: list[int]) -> dict[int, str]:
+    """Pull {id: analysis} out of a batch reply, keeping only well-formed items for requested ids."""
+    try:
+        items = json.loads(content).get("analyses", [])
+    except (ValueError, AttributeError):
+        return {}
+    parsed = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        try:
+            log_id = int(item.get("id"))
+        except (TypeError, ValueError):
+            continue
+        analysis = item.get("analysis")
+        if log_id in ids and isinstance(analysis, str) and analysis.strip():
+            parsed[log_id] = analysis
+    return parsed
+
+
+def _analyze_batch(system_prompt: str, profile: str, entries: dict[int, str],
+                   single, user_id: Optional[int]) -> tuple[dict[int, str], list[int]]:
+    """One structured completion for all entries, then individual calls for any it didn't cover.
+
+    Returns ({id: analysis}, [ids that still failed]). A busy governor fails
+    the whole batch only if the combined call can't run; fallback calls that
+    hit it are reported as failed instead.
+    """
+    ids = list(entries)
+    user_prompt = profile + "\n\nEntries:\n" + "\n".join(f"- id {i}: {text}" for i, text in entries.items())
+    content = complete(
+        [
+            {"role": "system", "content": f"{system_prompt} {BATCH_INSTRUCTIONS}"},
+            {"role": "user", "content": user_prompt},
+        ],
+        max_tokens=min(BATCH_TOKENS_PER_ITEM * len(ids), 4096),
+        user_id=user_id,
+        response_format={"type": "json_object"},
+    )
+    results = _parse_batch(content or "", ids)
+
+    failed = []
+    for log_id in ids:
+        if log_id in results:
+            continue
+        try:
+            results[log_id] = single(log_id)
+        except Exception:
+            failed.append(log_id)
+    return results, failed
+
+
+def analyze_sleep_batch(bmi: float, bmi_category: str, weight_kg: float,
+                        logs: list[dict], user_id: Optional[int] = None) -> tuple[dict[int, str], list[int]]:
+    """Analyze several sleep logs ({id, sleep_time, wake_time, duration_hours}) in one completion."""
+    system_prompt = (
+        "You are a certified sleep health expert and fitness consultant. "
+        "Provide concise, personalized sleep quality analyses with actionable suggestions, "
+        "including a quality rating out of 10. Use markdown with bullet points and emojis."
+    )
+    profile = f"Person: BMI {bmi:.1f} ({bmi_category}), weight {weight_kg} kg."
+    by_id = {log["id"]: log for log in logs}
+    entries = {
+        log["id"]: (f"went to sleep at {log['sleep_time']}, woke up at {log['wake_time']}, "
+                    f"{log['duration_hours']:.1f} hours")
+        for log in logs
+    }
+
+    def single(log_id: int) -> str:
+        log = by_id[log_id]
+        return analyze_sleep(bmi, bmi_category, weight_kg, log["sleep_time"], log["wake_time"],
+                             log["duration_hours"], user_id=user_id)
+
+    return _analyze_batch(system_prompt, profile, entries, single, user_id)
+
+
+def analyze_workout_batch(bmi: float, bmi_category: str, weight_kg: float,
+                          logs: list[dict], user_id: Optional[int] = None) -> tuple[dict[int, str], list[int]]:
+    """Analyze several workouts ({id, workout_type, duration_min, intensity, calories}) in one completion."""
+    system_prompt = (
+        "You are a certified personal trainer and fitness expert. "
+        "Provide concise, personalized workout analyses with actionable suggestions, "
+        "including an effectiveness rating out of 10. Use markdown with bullet points and emojis."
+    )
+    profile = f"Person: BMI {bmi:.1f} ({bmi_category}), weight {weight_kg} kg."
+    by_id = {log["id"]: log for log in logs}
+    entries = {
+        log["id"]: (f"{log['workout_type']}, {log['duration_min']} minutes, {log['intensity']} intensity, "
+                    f"~{log['calories']:.0f} kcal")
+        for log in logs
+    }
+
+    def single(log_id: int) -> str:
+        log = by_id[log_id]
+        return analyze_workout(bmi, bmi_category, weight_kg, log["workout_type"], log["duration_min"],
+                               log["intensity"], log["calories"], user_id=user_id)
+
+    return _analyze_batch(system_prompt, profile, entries, single, user_id)
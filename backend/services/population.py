@@ -0,0 +1,213 @@
+"""Where a user's days fall among everyone's, from per-day quantile sketches.
+
+For each metric (steps, sleep hours, workout minutes) and day, every shard
+keeps a MetricSketch of its users' daily totals. A log POST moves its
+user's total for that day from the old value to the new one in the same
+transaction (`record`), so sketches stay current without scanning anyone
+else's logs. `compare` merges a window of days across shards (cached for
+POPULATION_TTL_SECONDS) and ranks the user's average logged day in it;
+the work is bounded by the number of buckets, not by users or logs.
+`rebuild` recomputes a shard's sketches from the log tables, and
+`python -m scripts.rebuild_sketches` uses it to verify or repair.
+"""
+import json
+import math
+import os
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from cache import get_cache
+from database import SHARD_COUNT, use_shard
+from models import MetricSketch, SleepLog, StepsLog, WorkoutLog
+from services import archive
+
+# A value's rank is exact up to this relative error in the value
+RELATIVE_ACCURACY = 0.01
+# Totals below this share the lowest bucket
+MIN_VALUE = 0.01
+POPULATION_TTL_SECONDS = int(os.getenv("POPULATION_TTL_SECONDS", "60"))
+NAMESPACE = "population"
+
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+# metric -> (model, value column, day column, is the day column a timestamp)
+METRICS = {
+    "steps": (StepsLog, "steps", "date", False),
+    "sleep": (SleepLog, "duration_hours", "day", False),
+    "workout": (WorkoutLog, "duration_min", "created_at", True),
+}
+
+
+class Sketch:
+    """Counts per logarithmic bucket (DDSketch): bucket i holds values in (gamma^(i-1), gamma^i].
+
+    Sketches merge by adding counts, and a value can be taken out again,
+    which daily totals need as a user's later logs raise them (t-digest
+    and KLL can't remove values).
+    """
+
+    def __init__(self, buckets: Optional[dict] = None):
+        self.buckets: dict[int, int] = {int(i): n for i, n in (buckets or {}).items() if n > 0}
+
+    @property
+    def count(self) -> int:
+        return sum(self.buckets.values())
+
+    @staticmethod
+    def index(value: float) -> int:
+        return math.ceil(math.log(max(value, MIN_VALUE)) / _LOG_GAMMA)
+
+    def add(self, value: float, n: int = 1) -> None:
+        """Add `n` occurrences of `value`; a negative `n` removes them."""
+        i = self.index(value)
+        total = self.buckets.get(i, 0) + n
+        if total > 0:
+            self.buckets[i] = total
+        else:
+            self.buckets.pop(i, None)
+
+    def merge(self, other: "Sketch") -> None:
+        for i, n in other.buckets.items():
+            self.buckets[i] = self.buckets.get(i, 0) + n
+
+    def rank(self, value: float) -> Optional[float]:
+        """Share of values below `value`, counting half of those in its bucket; None when empty."""
+        total = self.count
+        if not total:
+            return None
+        i = self.index(value)
+        below = sum(n for j, n in self.buckets.items() if j < i)
+        return (below + self.buckets.get(i, 0) / 2) / total
+
+    def quantile(self, q: float) -> Optional[float]:
+        total = self.count
+        if not total:
+            return None
+        seen = 0
+        for i in sorted(self.buckets):
+            seen += self.buckets[i]
+            if seen > q * (total - 1):
+                return 2 * _GAMMA ** i / (_GAMMA + 1)  # the bucket's midpoint in relative terms
+        return None
+
+
+def _day_criteria(rows, metric: str, first: date, last: date) -> tuple:
+    _, _, day_name, is_timestamp = METRICS[metric]
+    column = getattr(rows, day_name)
+    if is_timestamp:
+        return (
+            column >= datetime.combine(first, datetime.min.time()),
+            column < datetime.combine(last + timedelta(days=1), datetime.min.time()),
+        )
+    return column >= first.isoformat(), column <= last.isoformat()
+
+
+def _day_expr(rows, metric: str):
+    _, _, day_name, is_timestamp = METRICS[metric]
+    column = getattr(rows, day_name)
+    return func.date(column) if is_timestamp else column
+
+
+def _totals(db: Session, user_id: int, metric: str, first: date, last: date) -> tuple[float, int]:
+    """(sum, distinct days logged) of the user's metric over days first..last."""
+    model, value_name, _, _ = METRICS[metric]
+    rows = archive.source(db, model, first)
+    total, days = db.query(
+        func.coalesce(func.sum(getattr(rows, value_name)), 0), func.count(func.distinct(_day_expr(rows, metric)))
+    ).filter(rows.user_id == user_id, *_day_criteria(rows, metric, first, last)).one()
+    return float(total), days
+
+
+def record(db: Session, user_id: int, metric: str, day: date, amount: float) -> None:
+    """Move the user's `day` total in that day's sketch to include a just-inserted log of `amount`.
+
+    Call in the inserting transaction, after the insert. Uses Core statements only, so
+    several calls in one group-commit session never leave conflicting pending rows.
+    """
+    if not amount:
+        return
+    new, _ = _totals(db, user_id, metric, day, day)
+    old = round(new - amount, 6)
+    key = (MetricSketch.metric == metric, MetricSketch.day == day.isoformat())
+    db.execute(
+        insert(MetricSketch).values(metric=metric, day=day.isoformat(), buckets="{}", updated_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=[MetricSketch.metric, MetricSketch.day])
+    )
+    sketch = Sketch(json.loads(db.execute(select(MetricSketch.buckets).where(*key)).scalar_one()))
+    if old > 0:
+        sketch.add(old, -1)
+    sketch.add(new)
+    db.execute(update(MetricSketch).where(*key).values(buckets=json.dumps(sketch.buckets), updated_at=datetime.utcnow()))
+
+
+def save(db: Session, metric: str, day: str, sketch: Sketch) -> None:
+    """Insert or replace one sketch row, in the caller's transaction."""
+    stmt = insert(MetricSketch).values(
+        metric=metric, day=day, buckets=json.dumps(sketch.buckets), updated_at=datetime.utcnow()
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[MetricSketch.metric, MetricSketch.day],
+        set_={"buckets": stmt.excluded.buckets, "updated_at": stmt.excluded.updated_at},
+    ))
+
+
+def rebuild(db: Session) -> dict[tuple[str, str], Sketch]:
+    """Every (metric, day) sketch of the session's shard, from the log tables (archived rows included)."""
+    sketches: dict[tuple[str, str], Sketch] = {}
+    for metric, (model, value_name, _, _) in METRICS.items():
+        rows = archive.source(db, model, None)
+        day = _day_expr(rows, metric)
+        totals = db.query(day, func.sum(getattr(rows, value_name))).group_by(rows.user_id, day)
+        for day_value, total in totals:
+            if day_value is not None and total and total > 0:
+                sketches.setdefault((metric, day_value), Sketch()).add(float(total))
+    return sketches
+
+
+def population(db: Session, first: date, last: date) -> dict[str, Sketch]:
+    """Per metric, all users' daily totals over days first..last, merged across shards."""
+    key = f"{first.isoformat()}:{last.isoformat()}"
+    cached = get_cache().get(NAMESPACE, key)
+    if cached is not None:
+        return {metric: Sketch(buckets) for metric, buckets in cached.items()}
+
+    merged = {metric: Sketch() for metric in METRICS}
+    own_shard = db.shard
+    for shard in range(SHARD_COUNT):
+        use_shard(db, shard)
+        rows = db.query(MetricSketch.metric, MetricSketch.buckets).filter(
+            MetricSketch.day >= first.isoformat(), MetricSketch.day <= last.isoformat()
+        )
+        for metric, buckets in rows:
+            if metric in merged:
+                merged[metric].merge(Sketch(json.loads(buckets)))
+    if own_shard is not None:
+        use_shard(db, own_shard)
+    get_cache().set(NAMESPACE, key, {m: s.buckets for m, s in merged.items()}, ttl=POPULATION_TTL_SECONDS)
+    return merged
+
+
+def compare(db: Session, user_id: int, days: int, today: date) -> dict:
+    """The user's average logged day per metric over the last `days` days, ranked among all users' days."""
+    first = today - timedelta(days=days - 1)
+    sketches = population(db, first, today)
+    metrics = {}
+    for metric in METRICS:
+        total, logged = _totals(db, user_id, metric, first, today)
+        sketch = sketches[metric]
+        average = total / logged if logged else None
+        rank = sketch.rank(average) if average is not None else None
+        median = sketch.quantile(0.5)
+        metrics[metric] = {
+            "average": round(average, 1) if average is not None else None,
+            "days_logged": logged,
+            "percentile": round(rank * 100, 1) if rank is not None else None,
+            "population_median": round(median, 1) if median is not None else None,
+            "population_days": sketch.count,
+        }
+    return {"from": first.isoformat(), "to": today.isoformat(), "days": days, "metrics": metrics}
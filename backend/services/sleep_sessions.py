@@ -0,0 +1,97 @@
+"""Sleep sessions as timestamped intervals.
+
+Besides the clock times the user entered, each sleep log stores
+`started_at`/`ended_at` in UTC and the `day` it counts toward: the user's
+local date when it ended (the morning they woke up), so day and week
+aggregates line up with steps and water. Sessions are shorter than
+MAX_SESSION, which bounds the overlap lookup to a range on the
+(user_id, ended_at, started_at) index.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from models import SleepLog
+
+CLOCK_FORMATS = ("%I:%M %p", "%H:%M")
+MAX_SESSION = timedelta(hours=24)
+# A wake time may be this far in the future (client clocks drift)
+FUTURE_SLACK = timedelta(minutes=5)
+# Widest UTC offset in use (UTC+14); the future check allows this much when the client's offset is unknown
+MAX_UTC_OFFSET = timedelta(hours=14)
+
+
+def parse_clock(value: str) -> Optional[time]:
+    """A "10:30 PM" or "22:30" clock time, or None when it is neither."""
+    for fmt in CLOCK_FORMATS:
+        try:
+            return datetime.strptime(value.strip().upper(), fmt).time()
+        except ValueError:
+            continue
+    return None
+
+
+def session_bounds(
+    sleep_time: str, wake_time: str, night: Optional[date], now: datetime, utc_offset: Optional[timedelta] = None,
+) -> tuple[datetime, datetime]:
+    """UTC start and end of a session from the user's local clock times.
+
+    `now` is UTC and `utc_offset` the client's offset from it; None means
+    unknown, and the clock times are taken as UTC. With `night`, the
+    session is the one that began on that local evening (or after the
+    following midnight, for sleep times before noon). Without it, the
+    session ends at the latest local occurrence of the wake time up to now.
+    Raises ValueError with a user-facing message for unusable input.
+    """
+    sleep_clock, wake_clock = parse_clock(sleep_time), parse_clock(wake_time)
+    if sleep_clock is None or wake_clock is None:
+        raise ValueError('Sleep and wake times must look like "10:30 PM" or "22:30".')
+    if sleep_clock == wake_clock:
+        raise ValueError("Sleep and wake times must differ.")
+
+    duration = datetime.combine(date.min, wake_clock) - datetime.combine(date.min, sleep_clock)
+    if duration < timedelta(0):
+        duration += timedelta(days=1)
+
+    offset = utc_offset or timedelta(0)
+    local_now = now + offset
+    if night is not None:
+        start_day = night if sleep_clock >= time(12) else night + timedelta(days=1)
+        start = datetime.combine(start_day, sleep_clock)
+        end = start + duration
+    else:
+        end = datetime.combine(local_now.date(), wake_clock)
+        if end > local_now + FUTURE_SLACK:
+            end -= timedelta(days=1)
+        start = end - duration
+
+    if end > local_now + (FUTURE_SLACK if utc_offset is not None else MAX_UTC_OFFSET):
+        raise ValueError("Sleep can't end in the future.")
+    return start - offset, end - offset
+
+
+def duration_hours(start: datetime, end: datetime) -> float:
+    return round((end - start).total_seconds() / 3600, 1)
+
+
+def find_overlap(db: Session, user_id: int, start: datetime, end: datetime, exclude_id: Optional[int] = None):
+    """(id, started_at, ended_at) of a stored session overlapping [start, end), or None.
+
+    An overlapping session ends after `start` and, being shorter than
+    MAX_SESSION, before `end + MAX_SESSION`: one index range per lookup.
+    """
+    query = db.query(SleepLog.id, SleepLog.started_at, SleepLog.ended_at).filter(
+        SleepLog.user_id == user_id,
+        SleepLog.ended_at > start,
+        SleepLog.ended_at < end + MAX_SESSION,
+        SleepLog.started_at < end,
+    )
+    if exclude_id is not None:
+        query = query.filter(SleepLog.id != exclude_id)
+    return query.first()
+
+
+def local_day(ended_at: datetime, utc_offset: Optional[timedelta] = None) -> date:
+    """The day a session ending at `ended_at` (UTC) counts toward; UTC's when the offset is unknown."""
+    return (ended_at + (utc_offset or timedelta(0))).date()
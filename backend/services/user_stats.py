@@ -0,0 +1,66 @@
+"""Per-user activity counters backing the profile stats.
+
+The log routers call `adjust` in the same transaction as the insert or
+delete it counts, so the counters commit or roll back with the rows.
+`recount` derives the true values from the log tables for the
+reconciliation job (`python -m scripts.reconcile_user_stats`).
+"""
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from models import UserStats, SleepLog, StepsLog, WorkoutLog, WaterLog
+from services import archive
+
+# counter column -> log model it counts
+COUNTED = {
+    "sleep_count": SleepLog,
+    "steps_count": StepsLog,
+    "workout_count": WorkoutLog,
+    "water_count": WaterLog,
+}
+
+
+def _count(db: Session, user_id: int) -> dict:
+    """One user's counters straight from the log tables (archived rows included)."""
+    counts = {}
+    for column, hot_model in COUNTED.items():
+        model = archive.source(db, hot_model, None)
+        counts[column] = db.query(func.count(model.id)).filter(model.user_id == user_id).scalar()
+    return counts
+
+
+def adjust(db: Session, user_id: int, **deltas: int) -> None:
+    """Atomically add to counters, e.g. adjust(db, uid, sleep_count=1); negative deltas for deletes.
+
+    Call after the insert or delete it counts. A user's first call creates
+    the row from their logs, which already include that change, so logs
+    made before the counters existed are not lost.
+    """
+    key = UserStats.user_id == user_id
+    if db.execute(select(UserStats.user_id).where(key)).first() is None:
+        seeded = db.execute(
+            insert(UserStats).values(user_id=user_id, **_count(db, user_id))
+            .on_conflict_do_nothing(index_elements=[UserStats.user_id])
+        )
+        if seeded.rowcount:
+            return
+    db.execute(update(UserStats).where(key).values({k: getattr(UserStats, k) + v for k, v in deltas.items()}))
+
+
+def get_stats(db: Session, user_id: int) -> dict:
+    """Counters for one user by primary key. Users with no counters row yet are counted directly."""
+    stats = db.get(UserStats, user_id)
+    if stats is None:
+        return _count(db, user_id)
+    return {column: getattr(stats, column) for column in COUNTED}
+
+
+def recount(db: Session) -> dict[int, dict]:
+    """True counts per user from the log tables (archived rows included), one grouped query per table."""
+    counts: dict[int, dict] = {}
+    for column, hot_model in COUNTED.items():
+        model = archive.source(db, hot_model, None)
+        for user_id, count in db.query(model.user_id, func.count(model.id)).group_by(model.user_id):
+            counts.setdefault(user_id, dict.fromkeys(COUNTED, 0))[column] = count
+    return counts
@@ -0,0 +1,336 @@
+"""Weekly report stats stored in typed columns so they can be queried across weeks.
+
+`aggregate` computes a week's stats from the log tables as a nested dict;
+`save` flattens it into a WeeklyStats row and `as_stats` turns a row back
+into the same dict.
+
+Weeks that have ended never change except through late logs, so the
+week-close scheduler freezes them into closed snapshots (`close_due_weeks`).
+Reads of a closed week use the snapshot; only the open week, and closed
+weeks a late log has marked dirty (`mark_dirty`), are computed live.
+"""
+import json
+import logging
+import os
+import threading
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from database import SHARD_COUNT, use_shard, users_by_shard
+from models import User, SleepLog, StepsLog, WorkoutLog, WaterLog, WeeklyStats
+from services import archive
+
+logger = logging.getLogger(__name__)
+
+# How often the scheduler looks for ended weeks; 0 disables it (use scripts/close_weeks.py from cron instead)
+WEEK_CLOSE_INTERVAL_SECONDS = float(os.getenv("WEEK_CLOSE_INTERVAL_SECONDS", "3600"))
+# How many ended weeks back the scheduler makes sure are closed
+WEEK_CLOSE_BACKFILL_WEEKS = int(os.getenv("WEEK_CLOSE_BACKFILL_WEEKS", "12"))
+CLOSE_CHUNK_USERS = 500
+
+# (section, key in the aggregated dict) -> column
+COLUMNS = {
+    ("sleep", "total_hours"): "sleep_total_hours",
+    ("sleep", "avg_hours"): "sleep_avg_hours",
+    ("sleep", "nights_logged"): "sleep_nights",
+    ("steps", "total"): "steps_total",
+    ("steps", "calories"): "steps_calories",
+    ("steps", "days_logged"): "steps_days",
+    ("workouts", "total_minutes"): "workout_minutes",
+    ("workouts", "calories"): "workout_calories",
+    ("workouts", "sessions"): "workout_sessions",
+    ("water", "total_glasses"): "water_glasses",
+    ("water", "days_logged"): "water_days",
+}
+
+# Columns reported by the trends view
+TREND_METRICS = (
+    "sleep_avg_hours", "sleep_nights", "steps_total", "steps_calories",
+    "workout_minutes", "workout_calories", "workout_sessions", "water_glasses",
+)
+
+
+def week_of(day: date) -> tuple[date, date]:
+    """(Monday, Sunday) of the week containing `day`."""
+    start = day - timedelta(days=day.weekday())
+    return start, start + timedelta(days=6)
+
+
+def aggregate(db: Session, user_id: int, week_start: str, week_end: str) -> dict:
+    """Aggregate all fitness data for the given week (from the archive too for old weeks)."""
+    since = date.fromisoformat(week_start)
+    sleep_rows, steps_rows, workout_rows, water_rows = (
+        archive.source(db, model, since) for model in (SleepLog, StepsLog, WorkoutLog, WaterLog)
+    )
+
+    # Sleep, by the day each session ended
+    sleep_logs = (
+        db.query(sleep_rows)
+        .filter(sleep_rows.user_id == user_id, sleep_rows.day >= week_start, sleep_rows.day <= week_end)
+        .all()
+    )
+    total_sleep = sum(l.duration_hours for l in sleep_logs)
+    avg_sleep = round(total_sleep / len(sleep_logs), 1) if sleep_logs else 0
+
+    # Steps
+    step_logs = (
+        db.query(steps_rows)
+        .filter(steps_rows.user_id == user_id, steps_rows.date >= week_start, steps_rows.date <= week_end)
+        .all()
+    )
+    total_steps = sum(l.steps for l in step_logs)
+    total_step_cal = sum(l.calories_burnt for l in step_logs)
+
+    # Workouts
+    workout_logs = (
+        db.query(workout_rows)
+        .filter(
+            workout_rows.user_id == user_id,
+            func.date(workout_rows.created_at) >= week_start,
+            func.date(workout_rows.created_at) <= week_end,
+        )
+        .all()
+    )
+    total_workout_min = sum(l.duration_min for l in workout_logs)
+    total_workout_cal = sum(l.calories_burnt or 0 for l in workout_logs)
+    workout_types = {}
+    for w in workout_logs:
+        workout_types[w.workout_type] = workout_types.get(w.workout_type, 0) + 1
+
+    # Water
+    water_logs = (
+        db.query(water_rows)
+        .filter(water_rows.user_id == user_id, water_rows.date >= week_start, water_rows.date <= week_end)
+        .all()
+    )
+    total_water = sum(l.glasses for l in water_logs)
+
+    return {
+        "week_start": week_start,
+        "week_end": week_end,
+        "sleep": {
+            "total_hours": round(total_sleep, 1),
+            "avg_hours": avg_sleep,
+            "nights_logged": len(sleep_logs),
+        },
+        "steps": {
+            "total": total_steps,
+            "calories": round(total_step_cal, 0),
+            "days_logged": len(step_logs),
+        },
+        "workouts": {
+            "total_minutes": round(total_workout_min, 0),
+            "calories": round(total_workout_cal, 0),
+            "sessions": len(workout_logs),
+            "types": workout_types,
+        },
+        "water": {
+            "total_glasses": total_water,
+            "days_logged": len(water_logs),
+        },
+    }
+
+
+def _flatten(stats: dict) -> dict:
+    return {column: stats[section][key] for (section, key), column in COLUMNS.items()}
+
+
+def save(db: Session, user_id: int, stats: dict, closed: bool = False) -> None:
+    """Insert or replace the stats row for stats['week_start'], in the caller's transaction.
+
+    With closed=True the row becomes a clean snapshot; otherwise its closed/dirty flags are kept.
+    """
+    values = _flatten(stats)
+    values["workout_types"] = json.dumps(stats["workouts"]["types"])
+    values["week_end"] = stats["week_end"]
+    values["updated_at"] = datetime.utcnow()
+    if closed:
+        values.update(closed=True, dirty=False)
+    stmt = insert(WeeklyStats).values(user_id=user_id, week_start=stats["week_start"], **values)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[WeeklyStats.user_id, WeeklyStats.week_start],
+        set_={column: stmt.excluded[column] for column in values},
+    ))
+
+
+def as_stats(row: WeeklyStats) -> dict:
+    """The nested dict `aggregate` would return for this week."""
+    stats = {"week_start": row.week_start, "week_end": row.week_end}
+    for (section, key), column in COLUMNS.items():
+        stats.setdefault(section, {})[key] = getattr(row, column)
+    stats["workouts"]["types"] = json.loads(row.workout_types)
+    return stats
+
+
+def for_week(db: Session, user_id: int, week_start: str, week_end: str) -> dict:
+    """Stats for one week: the snapshot when the week is closed and clean, computed live otherwise."""
+    row = (
+        db.query(WeeklyStats)
+        .filter(
+            WeeklyStats.user_id == user_id,
+            WeeklyStats.week_start == week_start,
+            WeeklyStats.closed.is_(True),
+            WeeklyStats.dirty.is_(False),
+        )
+        .first()
+    )
+    if row is not None:
+        return as_stats(row)
+    return aggregate(db, user_id, week_start, week_end)
+
+
+def mark_dirty(db: Session, user_id: int, day: date) -> None:
+    """Flag the closed snapshot of the week containing `day` (if any) for recomputation."""
+    week_start, _ = week_of(day)
+    db.query(WeeklyStats).filter(
+        WeeklyStats.user_id == user_id,
+        WeeklyStats.week_start == week_start.isoformat(),
+        WeeklyStats.closed.is_(True),
+    ).update({WeeklyStats.dirty: True}, synchronize_session=False)
+
+
+def trends(db: Session, user_id: int, weeks: int, current_week_start: date) -> list[dict]:
+    """The last `weeks` weeks up to and including the current one, oldest first, with deltas.
+
+    Closed weeks come from their snapshots in one range query on the (user_id, week_start)
+    index; the open week and dirty weeks are aggregated live. Weeks without stats are None.
+    """
+    first = current_week_start - timedelta(weeks=weeks - 1)
+    # One extra week so the oldest returned week also has a delta
+    rows = {
+        row.week_start: row
+        for row in db.query(
+            WeeklyStats.week_start, WeeklyStats.closed, WeeklyStats.dirty,
+            *(getattr(WeeklyStats, m) for m in TREND_METRICS),
+        ).filter(
+            WeeklyStats.user_id == user_id,
+            WeeklyStats.week_start >= (first - timedelta(weeks=1)).isoformat(),
+            WeeklyStats.week_start < current_week_start.isoformat(),
+        )
+    }
+
+    def values(start: date) -> dict:
+        row = rows.get(start.isoformat())
+        if start == current_week_start or (row is not None and row.dirty):
+            live = _flatten(aggregate(db, user_id, start.isoformat(), (start + timedelta(days=6)).isoformat()))
+            return {m: float(live[m]) for m in TREND_METRICS}
+        return {m: (float(getattr(row, m)) if row is not None else None) for m in TREND_METRICS}
+
+    trend = []
+    previous = values(first - timedelta(weeks=1))
+    for i in range(weeks):
+        start = first + timedelta(weeks=i)
+        current = values(start)
+        trend.append({
+            "week_start": start.isoformat(),
+            "week_end": (start + timedelta(days=6)).isoformat(),
+            "values": current,
+            "deltas": {
+                m: round(current[m] - previous[m], 1) if current[m] is not None and previous[m] is not None else None
+                for m in TREND_METRICS
+            },
+        })
+        previous = current
+    return trend
+
+
+def close_week(db: Session, week_start: date) -> int:
+    """Snapshot an ended week for every user who existed by then and has no snapshot yet."""
+    week_end = week_start + timedelta(days=6)
+    candidates = [
+        user_id for (user_id,) in db.query(User.id).filter(
+            User.created_at < datetime.combine(week_end + timedelta(days=1), datetime.min.time())
+        )
+    ]
+    closed = 0
+    # users live in the main database and snapshots on each user's shard, so match them up per shard
+    for shard, user_ids in users_by_shard(candidates).items():
+        use_shard(db, shard)
+        for start in range(0, len(user_ids), CLOSE_CHUNK_USERS):
+            chunk = user_ids[start:start + CLOSE_CHUNK_USERS]
+            already = {
+                user_id for (user_id,) in db.query(WeeklyStats.user_id).filter(
+                    WeeklyStats.week_start == week_start.isoformat(),
+                    WeeklyStats.closed.is_(True),
+                    WeeklyStats.user_id.in_(chunk),
+                )
+            }
+            for user_id in chunk:
+                if user_id not in already:
+                    save(db, user_id, aggregate(db, user_id, week_start.isoformat(), week_end.isoformat()), closed=True)
+                    closed += 1
+    return closed
+
+
+def refresh_dirty(db: Session) -> int:
+    """Recompute every closed snapshot a late log has marked dirty, on every shard."""
+    refreshed = 0
+    for shard in range(SHARD_COUNT):
+        use_shard(db, shard)
+        dirty = db.query(WeeklyStats.user_id, WeeklyStats.week_start, WeeklyStats.week_end).filter(
+            WeeklyStats.closed.is_(True), WeeklyStats.dirty.is_(True)
+        ).all()
+        for user_id, week_start, week_end in dirty:
+            save(db, user_id, aggregate(db, user_id, week_start, week_end), closed=True)
+        refreshed += len(dirty)
+    return refreshed
+
+
+def close_due_weeks(db: Session, today: Optional[date] = None, backfill_weeks: int = WEEK_CLOSE_BACKFILL_WEEKS) -> dict:
+    """Close the last `backfill_weeks` ended weeks and refresh dirty snapshots, committing per week."""
+    current_start, _ = week_of(today or datetime.utcnow().date())
+    closed = 0
+    for weeks_back in range(backfill_weeks, 0, -1):
+        closed += close_week(db, current_start - timedelta(weeks=weeks_back))
+        db.commit()
+    refreshed = refresh_dirty(db)
+    db.commit()
+    return {"closed": closed, "refreshed": refreshed}
+
+
+class _Scheduler:
+    """Background thread that runs `close_due_weeks` every WEEK_CLOSE_INTERVAL_SECONDS.
+
+    Closing is idempotent, so several worker processes running it only repeat cheap checks.
+    """
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if WEEK_CLOSE_INTERVAL_SECONDS <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="week-close", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    def _run(self):
+        from database import SessionLocal
+
+        while not self._stop.is_set():
+            db = SessionLocal()
+            try:
+                result = close_due_weeks(db)
+                if result["closed"] or result["refreshed"]:
+                    logger.info("week close: %(closed)d snapshots closed, %(refreshed)d refreshed", result)
+            except Exception:
+                db.rollback()
+                logger.exception("week close failed")
+            finally:
+                db.close()
+            self._stop.wait(WEEK_CLOSE_INTERVAL_SECONDS)
+
+
+scheduler = _Scheduler()
@@ -0,0 +1,220 @@
+"""Slow-query log: statements slower than SLOW_QUERY_MS, with their query plans.
+
+`install` hooks before/after_cursor_execute on every engine (main,
+replica and shards). A statement over the threshold is recorded with
+- its normalized SQL (literals and IN lists folded, so variants group),
+- the shape of its bound parameters (types, not values),
+- the route of the request that ran it ("(background)" for jobs),
+- SQLite's EXPLAIN QUERY PLAN, taken once per normalized statement.
+Plans containing a full table SCAN are flagged.
+
+Each occurrence is appended as a JSON line to SLOW_QUERY_LOG (rotated at
+SLOW_QUERY_LOG_BYTES, SLOW_QUERY_LOG_BACKUPS files kept), and folded
+into per-process aggregates served by GET /api/admin/slow-queries.
+SLOW_QUERY_MS=0 (the default) installs nothing.
+"""
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import re
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Optional
+
+from fastapi import FastAPI
+from sqlalchemy import event
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "./slow_queries.log")
+SLOW_QUERY_LOG_BYTES = int(os.getenv("SLOW_QUERY_LOG_BYTES", str(5 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.getenv("SLOW_QUERY_LOG_BACKUPS", "3"))
+# Distinct normalized statements kept in memory; past this, new ones are only logged to disk
+SLOW_QUERY_MAX_STATEMENTS = 500
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+# The ASGI scope of the request being served, for naming the route
+_scope: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("slow_query_scope", default=None)
+
+_lock = threading.Lock()
+_stats: dict[str, dict] = {}  # normalized sql -> aggregate
+_plans: dict[str, list[str]] = {}  # normalized sql -> plan lines
+
+_log = logging.getLogger("slow_queries")
+
+
+def normalize(statement: str) -> str:
+    """Fold literals and IN lists so the same query with different values groups together."""
+    sql = _STRING.sub("?", statement)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("(?...)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+def parameter_shape(parameters, executemany: bool) -> str:
+    """Type names of the bound parameters, runs collapsed: 'int, str*3'; 'N x (...)' for executemany."""
+    if executemany:
+        rows = list(parameters)
+        return f"{len(rows)} x ({parameter_shape(rows[0], False)})" if rows else "0 x ()"
+    values = parameters.values() if isinstance(parameters, dict) else (parameters or ())
+    runs: list[list] = []
+    for value in values:
+        name = type(value).__name__
+        if runs and runs[-1][0] == name:
+            runs[-1][1] += 1
+        else:
+            runs.append([name, 1])
+    return ", ".join(name if count == 1 else f"{name}*{count}" for name, count in runs)
+
+
+def _route() -> str:
+    scope = _scope.get()
+    if scope is None:
+        return "(background)"
+    route = scope.get("route")
+    return f"{scope['method']} {getattr(route, 'path', scope['path'])}"
+
+
+def _explain(cursor, statement: str, parameters, executemany: bool) -> list[str]:
+    if not statement.lstrip().upper().startswith(_EXPLAINABLE):
+        return []
+    if executemany:
+        parameters = next(iter(parameters), ())
+    try:
+        # A separate cursor on the same connection sees the same schema and transaction
+        rows = cursor.connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    except Exception as exc:  # the plan is best effort; never fail the query over it
+        return [f"(no plan: {exc})"]
+    return [row[-1] for row in rows]
+
+
+def is_full_scan(plan: list[str]) -> bool:
+    """A plan step reads a whole table rather than searching an index."""
+    return any(
+        step.startswith("SCAN ") and " USING " not in step and step != "SCAN CONSTANT ROW" for step in plan
+    )
+
+
+def _before(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.slow_query_started = time.perf_counter()
+
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "slow_query_started", None)
+    if started is None:
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if elapsed_ms < SLOW_QUERY_MS:
+        return
+    record(conn, cursor, statement, parameters, executemany, elapsed_ms)
+
+
+def record(conn, cursor, statement: str, parameters, executemany: bool, elapsed_ms: float) -> None:
+    sql = normalize(statement)
+    with _lock:
+        plan = _plans.get(sql)
+    if plan is None:
+        plan = _explain(cursor, statement, parameters, executemany) if conn.dialect.name == "sqlite" else []
+        with _lock:
+            if len(_plans) < SLOW_QUERY_MAX_STATEMENTS:
+                _plans[sql] = plan
+
+    route = _route()
+    shape = parameter_shape(parameters, executemany)
+    entry = {
+        "at": datetime.utcnow().isoformat(),
+        "id": f"{zlib.crc32(sql.encode()):08x}",
+        "ms": round(elapsed_ms, 2),
+        "route": route,
+        "database": conn.engine.url.database,
+        "sql": sql,
+        "params": shape,
+        "plan": plan,
+        "full_scan": is_full_scan(plan),
+    }
+    _log.warning(json.dumps(entry))
+
+    with _lock:
+        stats = _stats.get(sql)
+        if stats is None:
+            if len(_stats) >= SLOW_QUERY_MAX_STATEMENTS:
+                return
+            stats = _stats[sql] = {
+                "id": entry["id"], "sql": sql, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                "routes": {}, "params": {}, "plan": plan, "full_scan": entry["full_scan"],
+            }
+        stats["count"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        stats["last_at"] = entry["at"]
+        stats["routes"][route] = stats["routes"].get(route, 0) + 1
+        stats["params"][shape] = stats["params"].get(shape, 0) + 1
+
+
+def top(limit: int, order: str = "total_ms") -> list[dict]:
+    """The `limit` worst statements seen by this process, by total_ms, max_ms or count."""
+    with _lock:
+        rows = [
+            {**stats, "routes": dict(stats["routes"]), "params": dict(stats["params"])}
+            for stats in _stats.values()
+        ]
+    rows.sort(key=lambda row: row[order], reverse=True)
+    for row in rows:
+        row["avg_ms"] = round(row["total_ms"] / row["count"], 2)
+        row["total_ms"] = round(row["total_ms"], 2)
+        row["max_ms"] = round(row["max_ms"], 2)
+    return rows[:limit]
+
+
+def reset() -> None:
+    """Forget the aggregates and cached plans (the on-disk log is kept)."""
+    with _lock:
+        _stats.clear()
+        _plans.clear()
+
+
+class RouteContextMiddleware:
+    """Makes the current request's scope visible to the cursor hooks (worker threads copy the context)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _scope.reset(token)
+
+
+def install(app: Optional[FastAPI] = None) -> None:
+    """Hook every engine and, given the app, name routes. Does nothing while SLOW_QUERY_MS is 0."""
+    if SLOW_QUERY_MS <= 0:
+        return
+    from database import engine, replica_engine, shard_engines, replica_shard_engines
+
+    if not _log.handlers:
+        handler = logging.handlers.RotatingFileHandler(
+            SLOW_QUERY_LOG, maxBytes=SLOW_QUERY_LOG_BYTES, backupCount=SLOW_QUERY_LOG_BACKUPS
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        _log.addHandler(handler)
+        _log.propagate = False
+    for hooked in {engine, replica_engine, *shard_engines, *replica_shard_engines}:
+        if not event.contains(hooked, "before_cursor_execute", _before):
+            event.listen(hooked, "before_cursor_execute", _before)
+            event.listen(hooked, "after_cursor_execute", _after)
+    if app is not None:
+        app.add_middleware(RouteContextMiddleware)
@@ -52,9 +52,14 @@ export const api = {
   calculateBMI: (data) => request('/bmi/', { method: 'POST', body: JSON.stringify(data) }),
 
   // ── Sleep ─────────────────────────────────────
-  logSleep: (data) => request('/sleep/', { method: 'POST', body: JSON.stringify(data) }),
+  logSleep: (data) => request('/sleep/', {
+    method: 'POST',
+    // Sleep times are local clock times; the offset lets the server place them in UTC
+    body: JSON.stringify({ utc_offset_minutes: -new Date().getTimezoneOffset(), ...data }),
+  }),
   getSleepLogs: () => request('/sleep/'),
   analyzeSleep: (data) => request('/sleep/analyze', { method: 'POST', body: JSON.stringify(data) }),
+  analyzeSleepBatch: (data) => request('/sleep/analyze/batch', { method: 'POST', body: JSON.stringify(data) }),
 
   // ── Steps ─────────────────────────────────────
   logSteps: (data) => request('/steps/', { method: 'POST', body: JSON.stringify(data) }),
@@ -64,6 +69,7 @@ export const api = {
   logWorkout: (data) => request('/workout/', { method: 'POST', body: JSON.stringify(data) }),
   getWorkoutLogs: () => request('/workout/'),
   analyzeWorkout: (data) => request('/workout/analyze', { method: 'POST', body: JSON.stringify(data) }),
+  analyzeWorkoutBatch: (data) => request('/workout/analyze/batch', { method: 'POST', body: JSON.stringify(data) }),
 
   // ── Water ─────────────────────────────────────
   logWater: (data) => request('/water/', { method: 'POST', body: JSON.stringify(data) }),
@@ -77,13 +83,22 @@ export const api = {
 
   // ── Dashboard ─────────────────────────────────────
   getDashboardToday: () => request('/dashboard/today'),
+  getBootstrap: () => request('/bootstrap/'),
+
+  // ── Chart series ──────────────────────────────────
+  getSeries: (metric, bucket = 'day', params = {}) =>
+    request(`/series/${metric}?${new URLSearchParams({ bucket, ...params })}`),
 
   // ── Reports ───────────────────────────────────────
   generateWeeklyReport: () => request('/reports/weekly', { method: 'POST' }),
   getReports: () => request('/reports/'),
   getReport: (id) => request(`/reports/${id}`),
+  getReportTrends: (weeks = 12) => request(`/reports/trends?weeks=${weeks}`),
 
   // ── Goals ─────────────────────────────────────────
   getGoals: () => request('/goals/'),
   updateGoals: (data) => request('/goals/', { method: 'PUT', body: JSON.stringify(data) }),
+
+  // ── Delta sync ────────────────────────────────────
+  sync: (since) => request(since == null ? '/sync/' : `/sync/?since=${encodeURIComponent(since)}`),
 };